@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# Local stand-in for AUR: answers RPC v5 info queries, serves snapshot tarballs of generated packages
+# and metadata dump (packages-meta-ext-v1.json.gz), with configurable latency and error rate. Used by run_benchmark.py, can run alone:
+#
+#   python benchmarks/fake_aur.py --shape tree --count 200 --port 8080
+
+import argparse, gzip, hashlib, io, json, random, tarfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+SHAPES = ("flat", "chain", "tree")
+SNAPSHOT_PATH = "/cgit/aur.git/snapshot/"
+DUMP_PATH = "/packages-meta-ext-v1.json.gz"
+
+
+class FakePackage(object):
+    def __init__(self, name: str, version: str, depends: List[str], makedepends: List[str]) -> None:
+        self.name = name
+        self.version = version
+        self.depends = depends
+        self.makedepends = makedepends
+
+    def rpc_info(self) -> Dict:
+        return {"Name": self.name, "PackageBase": self.name, "Version": self.version,
+                "URLPath": SNAPSHOT_PATH + self.name + ".tar.gz",
+                "Depends": self.depends, "MakeDepends": self.makedepends}
+
+    def pkgbuild(self) -> str:
+        pkgver, pkgrel = self.version.rsplit("-", 1)
+        return ("pkgname={}\npkgver={}\npkgrel={}\narch=('any')\ndepends=({})\nmakedepends=({})\n"
+                "package() {{\n  true\n}}\n").format(self.name, pkgver, pkgrel, " ".join(self.depends),
+                                                    " ".join(self.makedepends))
+
+
+def make_packages(shape: str, count: int, seed: int = 0, version: str = "1.0-1") -> Tuple[List[str], Dict[str, FakePackage]]:
+    """
+    Generates dependency graph of count packages
+      flat: all packages are in config, no dependencies
+      chain: one package in config, each package depends on the next one
+      tree: tenth of packages in config, every package depends on up to 3 packages generated after it
+    :return: names for [packages] section of config, all packages by name
+    """
+    if shape not in SHAPES:
+        raise ValueError("Unknown shape: {}".format(shape))
+    rnd = random.Random(seed)
+    names = ["bench-pkg-{:05d}".format(i) for i in range(count)]
+    packages: Dict[str, FakePackage] = {}
+    for i, name in enumerate(names):
+        if shape == "chain":
+            deps = names[i + 1:i + 2]
+        elif shape == "tree":
+            deps = sorted(set(rnd.sample(names[i + 1:], min(rnd.randint(0, 3), count - i - 1))))
+        else:
+            deps = []
+        # every package needs something from official repos too, those are not looked for in AUR
+        split = len(deps) // 2
+        packages[name] = FakePackage(name, version, deps[split:] + ["glibc"], deps[:split])
+    if shape == "flat":
+        in_config = names
+    elif shape == "chain":
+        in_config = names[:1]
+    else:
+        in_config = names[:max(1, count // 10)]
+    return in_config, packages
+
+
+class FakeAur(object):
+    """
+    AUR stand-in running in background thread
+    :param latency: seconds every answer is delayed
+    :param error_rate: fraction of requests answered by 503 (with Retry-After: 0)
+    """
+
+    def __init__(self, packages: Dict[str, FakePackage], latency: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 0, port: int = 0) -> None:
+        self.packages = packages
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, bytes] = {}
+        self._dump: Optional[Tuple[str, bytes]] = None
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def _handler_class(self):
+        aur = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are sent separately, without this delayed ACK would add 40 ms to every answer
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                status, headers, body = aur.answer(self.path, dict(self.headers))
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def answer(self, path: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            return 503, {"Retry-After": "0"}, b"Service Unavailable"
+
+        parts = urlsplit(path)
+        if parts.path.rstrip("/") == "/rpc":
+            names = parse_qs(parts.query).get("arg[]", [])
+            results = [self.packages[name].rpc_info() for name in names if name in self.packages]
+            body = json.dumps({"version": 5, "type": "multiinfo", "resultcount": len(results),
+                               "results": results}).encode()
+            return 200, {"Content-Type": "application/json"}, body
+        if parts.path == DUMP_PATH:
+            etag, body = self.dump()
+            if (headers or {}).get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            return 200, {"Content-Type": "application/gzip", "ETag": etag}, body
+        if parts.path.startswith(SNAPSHOT_PATH) and parts.path.endswith(".tar.gz"):
+            name = parts.path[len(SNAPSHOT_PATH):-len(".tar.gz")]
+            if name in self.packages:
+                return 200, {"Content-Type": "application/x-gzip"}, self.snapshot(name)
+        return 404, {}, b"Not Found"
+
+    def snapshot(self, name: str) -> bytes:
+        with self._lock:
+            if name not in self._snapshots:
+                buf = io.BytesIO()
+                with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+                    for filename, content in (("PKGBUILD", self.packages[name].pkgbuild()), (".SRCINFO", "")):
+                        info = tarfile.TarInfo("{}/{}".format(name, filename))
+                        info.size = len(content)
+                        tar.addfile(info, io.BytesIO(content.encode()))
+                self._snapshots[name] = buf.getvalue()
+            return self._snapshots[name]
+
+    def dump(self) -> Tuple[str, bytes]:
+        """ETag and content of metadata dump, JSON array of all packages (each on its own line, as AUR has it)"""
+        with self._lock:
+            if self._dump is None:
+                lines = ",\n".join(json.dumps(pkg.rpc_info()) for pkg in self.packages.values())
+                body = gzip.compress("[\n{}\n]\n".format(lines).encode())
+                self._dump = ('"{}"'.format(hashlib.sha1(body).hexdigest()), body)
+            return self._dump
+
+    def start(self) -> "FakeAur":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local AUR stand-in")
+    parser.add_argument("--shape", choices=SHAPES, default="tree")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    in_config, packages = make_packages(args.shape, args.count)
+    aur = FakeAur(packages, args.latency, args.error_rate, port=args.port)
+    print("serving {} packages at {}, packages for config:\n{}".format(len(packages), aur.url, "\n".join(in_config)))
+    try:
+        aur.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
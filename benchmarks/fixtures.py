@@ -0,0 +1,108 @@
+# Synthetic repo dirs and fake makepkg/repo-add/repo-remove for benchmarks
+
+import io, os, re, subprocess, sys, tarfile
+from typing import Dict, List, Sequence
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # zstd binary is used instead
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def compress_zstd(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=1).compress(data)
+    return subprocess.run(["zstd", "-q", "-1", "-c"], input=data, stdout=subprocess.PIPE, check=True).stdout
+
+
+def write_archive(path: str, pkgname: str, full_version: str, depends: Sequence[str] = ()) -> None:
+    """Writes small but valid package archive (.PKGINFO, .MTREE and one file)"""
+    pkginfo = "pkgname = {}\npkgbase = {}\npkgver = {}\npkgdesc = benchmark package\narch = any\n" \
+              "builddate = 1700000000\nsize = 100\n{}".format(pkgname, pkgname, full_version,
+                                                              "".join("depend = {}\n".format(d) for d in depends))
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for name, content in ((".PKGINFO", pkginfo), (".MTREE", ""),
+                              ("usr/share/{}/README".format(pkgname), "x" * 100)):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mtime = 1700000000
+            tar.addfile(info, io.BytesIO(content.encode()))
+    with open(path, "wb") as fh:
+        fh.write(compress_zstd(buf.getvalue()))
+
+
+def generate_repo(repodir: str, count: int, versions: int = 2, prefix: str = "repo-pkg") -> List[str]:
+    """
+    Fills repodir with count packages, each in given number of versions
+    :return: names of the packages
+    """
+    os.makedirs(repodir, exist_ok=True)
+    names = ["{}-{:05d}".format(prefix, i) for i in range(count)]
+    for name in names:
+        for version in range(1, versions + 1):
+            full_version = "{}.0-1".format(version)
+            write_archive(os.path.join(repodir, "{}-{}-any.pkg.tar.zst".format(name, full_version)), name, full_version)
+    return names
+
+
+def read_pkgbuild(path: str) -> Dict[str, List[str]]:
+    """Variables of simple PKGBUILD (as written by fake AUR), arrays as lists"""
+    res: Dict[str, List[str]] = {}
+    with open(path) as fh:
+        for match in re.finditer(r"^(\w+)=(\(([^)]*)\)|(\S*))", fh.read(), re.M):
+            res[match.group(1)] = match.group(3).split() if match.group(3) is not None else [match.group(4)]
+    return res
+
+
+def fake_makepkg() -> int:
+    """Builds package archive of PKGBUILD in current directory, after BENCH_BUILD_TIME seconds"""
+    import time
+    time.sleep(float(os.environ.get("BENCH_BUILD_TIME", "0")))
+    pkgbuild = read_pkgbuild("PKGBUILD")
+    full_version = "{}-{}".format(pkgbuild["pkgver"][0], pkgbuild["pkgrel"][0])
+    write_archive("{}-{}-any.pkg.tar.zst".format(pkgbuild["pkgname"][0], full_version), pkgbuild["pkgname"][0],
+                  full_version, pkgbuild.get("depends", []))
+    print("==> Finished making: {} {}".format(pkgbuild["pkgname"][0], full_version))
+    return 0
+
+
+def fake_repo_add(remove: bool, db_file: str, args: List[str]) -> int:
+    """repo-add (archives) / repo-remove (names) writing just %FILENAME% and %NAME% of entries"""
+    entries: Dict[str, str] = {}
+    if os.path.isfile(db_file):
+        with tarfile.open(db_file) as tar:
+            for member in tar:
+                if member.name.endswith("/desc"):
+                    desc = tar.extractfile(member).read().decode().split("\n")
+                    entries[desc[desc.index("%NAME%") + 1]] = desc[desc.index("%FILENAME%") + 1]
+    for arg in args:
+        if remove:
+            entries.pop(arg, None)
+        else:
+            filename = os.path.basename(arg)
+            entries["-".join(filename.split("-")[:-3])] = filename
+    with tarfile.open(db_file + ".tmp", "w:gz") as tar:
+        for name, filename in sorted(entries.items()):
+            desc = "%FILENAME%\n{}\n\n%NAME%\n{}\n\n".format(filename, name).encode()
+            info = tarfile.TarInfo("{}-{}/desc".format(name, "-".join(filename.split("-")[-3:-1])))
+            info.size = len(desc)
+            tar.addfile(info, io.BytesIO(desc))
+    os.replace(db_file + ".tmp", db_file)
+    return 0
+
+
+def install_fake_tools(bindir: str) -> None:
+    """Puts makepkg, repo-add and repo-remove scripts into bindir (to be prepended to PATH)"""
+    os.makedirs(bindir, exist_ok=True)
+    calls = {"makepkg": "fake_makepkg()",
+             "repo-add": "fake_repo_add(False, sys.argv[1], sys.argv[2:])",
+             "repo-remove": "fake_repo_add(True, sys.argv[1], sys.argv[2:])"}
+    for tool, call in calls.items():
+        path = os.path.join(bindir, tool)
+        with open(path, "w") as fh:
+            fh.write("#!{}\nimport sys\nsys.path.insert(0, {!r})\nfrom fixtures import *\nsys.exit({})\n".format(
+                sys.executable, BENCHMARKS_DIR, call))
+        os.chmod(path, 0o755)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# Measures how fast repokeeper starts: time to import its main module (per python -X importtime)
+# and wall time of cheap commands, compared to bare python interpreter start.
+#
+#   python benchmarks/import_time.py [-n RUNS] [--top N]
+#
+# repokeeper -l is measured only when /etc/repokeeper.conf exists.
+
+import argparse, os, statistics, subprocess, sys, time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "repokeeper.repokeeper"
+
+
+def run_python(args, env=None):
+    return subprocess.run([sys.executable] + args, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def get_import_times(runs):
+    """:return: cumulative import times (us) of main module per run, self+nested times of modules of last run"""
+    totals = []
+    modules = {}
+    for _ in range(runs):
+        stderr = run_python(["-X", "importtime", "-c", "import " + MODULE]).stderr
+        modules = {}
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            modules[name.strip()] = int(cumulative)
+        totals.append(modules[MODULE])
+    return totals, modules
+
+
+def get_wall_times(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_python(args)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of repokeeper")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="Show N slowest imports")
+    args = parser.parse_args()
+
+    # byte code is compiled once, so that it is not part of the measurement
+    subprocess.check_call([sys.executable, "-m", "compileall", "-q", os.path.join(REPO_ROOT, "repokeeper")])
+
+    totals, modules = get_import_times(args.runs)
+    print("import {:<28} min {:7.1f} ms  median {:7.1f} ms".format(
+        MODULE, min(totals) / 1000, statistics.median(totals) / 1000))
+    print("\nslowest imports (cumulative, last run):")
+    for name, cumulative in sorted(modules.items(), key=lambda x: -x[1])[1:args.top + 1]:
+        print("  {:<36} {:7.1f} ms".format(name, cumulative / 1000))
+
+    commands = [("python -c pass", ["-c", "pass"]),
+                ("repokeeper --version", ["-m", MODULE, "--version"])]
+    if os.path.isfile("/etc/repokeeper.conf"):
+        commands.append(("repokeeper -l", ["-m", MODULE, "-l"]))
+    print("\nwall time:")
+    for label, cmd in commands:
+        times = get_wall_times(cmd, args.runs)
+        print("  {:<36} min {:7.1f} ms  median {:7.1f} ms".format(label, min(times), statistics.median(times)))
+
+
+if __name__ == "__main__":
+    main()
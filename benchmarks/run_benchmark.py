@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# End to end benchmark of repokeeper against local AUR stand-in (fake_aur.py), with synthetic
+# repo dir and fake makepkg/repo-add/repo-remove on PATH, so that it runs offline and fast:
+#
+#   python benchmarks/run_benchmark.py --shape tree --aur-packages 200 --repo-packages 2000 --latency 0.05
+#
+# check_aur_web, parse_repo, building and update_repo_file are timed in a cold run (empty caches,
+# everything to be built) and a warm run (caches filled, nothing to build).
+
+import argparse, contextlib, json, os, sys, tempfile, time
+from typing import Callable, Dict, List
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_aur import SHAPES, FakeAur, make_packages
+from fixtures import generate_repo, install_fake_tools
+
+CONFIG = """[packages]
+{packages}
+
+[options]
+repodir={workdir}/repo
+builddir={workdir}/build
+cachedir={workdir}/cache
+logfile={workdir}/repokeeper.log
+aur_url={aur_url}
+aur_rate=0
+source_cache=snapshot
+build_jobs={build_jobs}
+build_memory_per_job=1
+db_writer={db_writer}
+metadata_source={metadata_source}
+"""
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="End to end benchmark of repokeeper with local AUR stand-in")
+    parser.add_argument("--shape", choices=SHAPES, default="tree", help="Shape of dependency graph in AUR")
+    parser.add_argument("--aur-packages", type=int, default=100, help="Number of packages in fake AUR")
+    parser.add_argument("--repo-packages", type=int, default=1000, help="Packages already in repo dir")
+    parser.add_argument("--versions", type=int, default=2, help="Versions of every package in repo dir")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds every AUR answer is delayed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of AUR requests failing with 503")
+    parser.add_argument("--build-time", type=float, default=0.0, help="Seconds every fake makepkg takes")
+    parser.add_argument("--build-jobs", type=int, default=1)
+    parser.add_argument("--db-writer", choices=("native", "repo-add"), default="native")
+    parser.add_argument("--metadata-source", choices=("rpc", "dump"), default="rpc",
+                        help="Query AUR RPC or look packages up in AUR metadata dump")
+    parser.add_argument("--report", metavar="PATH", help="Write results as JSON into PATH")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show repokeeper's output")
+    return parser.parse_args()
+
+
+def timed(results: Dict[str, float], name: str, func: Callable):
+    start = time.perf_counter()
+    res = func()
+    results[name] = time.perf_counter() - start
+    return res
+
+
+def run(args, workdir: str) -> Dict:
+    from repokeeper.repokeeper import Repo_Base
+    from repokeeper.syncdb import SyncDbIndex
+
+    results: Dict[str, Dict] = {"setup": {}, "cold": {}, "warm": {}}
+    install_fake_tools(os.path.join(workdir, "bin"))
+    os.environ["PATH"] = os.path.join(workdir, "bin") + os.pathsep + os.environ["PATH"]
+    os.environ["BENCH_BUILD_TIME"] = str(args.build_time)
+    os.makedirs(os.path.join(workdir, "build"))
+    timed(results["setup"], "generate_repo",
+          lambda: generate_repo(os.path.join(workdir, "repo"), args.repo_packages, args.versions))
+
+    in_config, packages = make_packages(args.shape, args.aur_packages)
+    aur = FakeAur(packages, args.latency, args.error_rate).start()
+    try:
+        conffile = os.path.join(workdir, "repokeeper.conf")
+        with open(conffile, "w") as fh:
+            fh.write(CONFIG.format(packages="\n".join(in_config), workdir=workdir, aur_url=aur.url,
+                                   build_jobs=args.build_jobs, db_writer=args.db_writer,
+                                   metadata_source=args.metadata_source))
+
+        for stage in ("cold", "warm"):
+            res = results[stage]
+            rp = timed(res, "init", lambda: Repo_Base(conffile=conffile))
+            rp.sync_index = SyncDbIndex({"glibc"})
+            pkgs: List = timed(res, "check_aur_web", rp.check_aur_web)
+            timed(res, "parse_repo", rp.parse_repo)
+            failed = timed(res, "building", lambda: rp.building(pkgs))
+            timed(res, "update_repo_file", rp.update_repo_file)
+            res["built"] = len(pkgs) - len(failed)
+            res["failed"] = len(failed)
+            res["counters"] = dict(rp.report.counters, http_requests=rp.http.requests)
+            res["aur_requests"] = aur.requests
+            aur.requests = 0
+    finally:
+        aur.stop()
+    return results
+
+
+def main():
+    args = get_args()
+    with tempfile.TemporaryDirectory(prefix="repokeeper-bench-") as workdir:
+        if args.verbose:
+            results = run(args, workdir)
+        else:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results = run(args, workdir)
+
+    print("shape {}, {} AUR packages, {} x {} archives in repo, latency {} s, error rate {}".format(
+        args.shape, args.aur_packages, args.repo_packages, args.versions, args.latency, args.error_rate))
+    print("{:<20} {:>10} {:>10}".format("", "cold", "warm"))
+    for name in ("init", "check_aur_web", "parse_repo", "building", "update_repo_file"):
+        print("{:<20} {:>9.3f}s {:>9.3f}s".format(name, results["cold"][name], results["warm"][name]))
+    for name in ("built", "failed", "aur_requests"):
+        print("{:<20} {:>10} {:>10}".format(name, results["cold"][name], results["warm"][name]))
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump({"args": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
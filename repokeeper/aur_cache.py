@@ -0,0 +1,62 @@
+import json, os, sqlite3, threading, time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class AurCache(object):
+    """
+    Persistent store of AUR RPC results, one row per package. Names not found in AUR are
+    stored too (with empty info), so they are not queried again until they expire.
+    Least recently used rows are dropped once there is more than max_entries of them.
+    """
+
+    def __init__(self, db_file: str, ttl: int, negative_ttl: int, max_entries: int) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS packages (name TEXT PRIMARY KEY, info TEXT, "
+                         "expires REAL NOT NULL, accessed REAL NOT NULL)")
+        self._db.commit()
+
+    def get_many(self, names: Iterable[str], allow_expired: bool = False) -> Tuple[Dict[str, Optional[Dict]], List[str]]:
+        """
+        :param allow_expired: return also expired entries (offline mode)
+        :return: Dictionary of name: info (None if not in AUR) for cached names, list of names not in cache
+        """
+        names = list(names)
+        now = time.time()
+        cached: Dict[str, Optional[Dict]] = {}
+        with self._lock:
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                rows = self._db.execute(f"SELECT name, info, expires FROM packages WHERE name IN "
+                                        f"({','.join('?' * len(chunk))})", chunk).fetchall()
+                for name, info, expires in rows:
+                    if allow_expired or expires > now:
+                        cached[name] = json.loads(info) if info else None
+            self._db.executemany("UPDATE packages SET accessed = ? WHERE name = ?",
+                                 [(now, name) for name in cached])
+            self._db.commit()
+        self.hits += len(cached)
+        self.misses += len(names) - len(cached)
+        return cached, [name for name in names if name not in cached]
+
+    def put_many(self, infos: Dict[str, Optional[Dict]]) -> None:
+        """:param infos: Dictionary of name: info, None for names not found in AUR"""
+        now = time.time()
+        rows = [(name, json.dumps(info) if info else None,
+                 now + (self.ttl if info else self.negative_ttl), now) for name, info in infos.items()]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO packages (name, info, expires, accessed) VALUES (?, ?, ?, ?)",
+                                 rows)
+            self._db.execute("DELETE FROM packages WHERE name IN (SELECT name FROM packages "
+                             "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,137 @@
+import gzip, io, json, os, sqlite3, threading, time
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+from urllib.parse import urlsplit
+
+DUMP_PATH = "/packages-meta-ext-v1.json.gz"
+# fields of dump entries needed for planning builds and retention (as in RPC info answer), the rest
+# is not stored; index built with other fields is rebuilt
+FIELDS = ("Name", "PackageBase", "Version", "URLPath", "Depends", "MakeDepends", "CheckDepends", "OptDepends")
+
+
+def iter_json_array(fh: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Yields items of JSON array read from text stream, only the item being parsed is held in memory"""
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("unexpected end of JSON array")
+            chunk = fh.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("JSON array expected")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # item continues in next chunk
+            chunk = fh.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        yield item
+
+
+def open_dump(path: str) -> TextIO:
+    """Dump as text, gunzipped unless it was stored gunzipped already (Content-Encoding: gzip)"""
+    with open(path, "rb") as fh:
+        gzipped = fh.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+class AurDumpIndex(object):
+    """
+    On-disk index of AUR metadata dump (name: version, dependencies, URLPath...), so that packages
+    are looked up locally, without AUR RPC and without loading the whole dump into memory
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS packages (name TEXT PRIMARY KEY, info TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM packages").fetchone()[0]
+
+    def rebuild(self, entries: Iterable[Dict], source: str) -> int:
+        """
+        Replaces content of index by entries (in one transaction, old content stays if reading fails)
+        :param source: identification of the dump file entries come from
+        :return: number of packages
+        """
+        rows = ((entry["Name"], json.dumps({k: entry[k] for k in FIELDS if entry.get(k) is not None},
+                                           separators=(",", ":"))) for entry in entries)
+        with self._lock:
+            try:
+                self._db.execute("DELETE FROM packages")
+                self._db.executemany("INSERT OR REPLACE INTO packages (name, info) VALUES (?, ?)", rows)
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (source,))
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fields', ?)",
+                                 (",".join(FIELDS),))
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            return self._db.execute("SELECT COUNT(*) FROM packages").fetchone()[0]
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, Dict]:
+        """:return: Dictionary of name: info (as in RPC info answer), names not in AUR are missing"""
+        names = list(names)
+        res: Dict[str, Dict] = {}
+        with self._lock:
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                rows = self._db.execute(f"SELECT name, info FROM packages WHERE name IN "
+                                        f"({','.join('?' * len(chunk))})", chunk).fetchall()
+                res.update((name, json.loads(info)) for name, info in rows)
+        return res
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def update_dump_index(index: AurDumpIndex, http, url: str, cache_dir: str, max_age: float, offline: bool = False) -> bool:
+    """
+    Downloads the dump (conditional GET) if it was not checked within max_age seconds and rebuilds
+    index if the dump (or FIELDS) changed since the index was built
+    :param http: HttpClient
+    :return: True if index was rebuilt
+    """
+    checked = float(index.get_meta("checked") or 0)
+    if not offline and time.time() - checked >= max_age:
+        http.download(url, cache_dir)
+        index.set_meta("checked", str(time.time()))
+    dump_file = os.path.join(cache_dir, os.path.basename(urlsplit(url).path))
+    st = os.stat(dump_file)
+    source = "{}:{}".format(st.st_size, st.st_mtime_ns)
+    if index.get_meta("source") == source and index.get_meta("fields") == ",".join(FIELDS):
+        return False
+    with open_dump(dump_file) as fh:
+        index.rebuild(iter_json_array(fh), source)
+    return True
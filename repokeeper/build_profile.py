@@ -0,0 +1,119 @@
+import json, os, shlex, threading, time
+from typing import Dict, List, Optional
+
+from repokeeper.config_parser import get_option, get_path_option
+
+MAKEPKG_CONF = "/etc/makepkg.conf"
+COMPILER_CACHES = ("", "ccache", "sccache")
+
+
+class BuildProfile(object):
+    """
+    Build environment of makepkg: makepkg.conf generated for every build sources the system one, its
+    drop-ins and the user's one (as makepkg does without --config) and sets MAKEFLAGS, ccache/sccache,
+    zstd level and threads for the archive and BUILDDIR in tmpfs
+    """
+
+    def __init__(self, name: str, makeflags: str = "", compiler_cache: str = "", compress_level: int = 0,
+                 compress_threads: int = -1, tmpfs_dir: str = "", tmpfs_min_memory: int = 0,
+                 packages: Optional[List[str]] = None, base_conf: str = MAKEPKG_CONF) -> None:
+        """
+        :param makeflags: MAKEFLAGS, "auto" is -j<CPUs per concurrent build>, empty keeps makepkg.conf's
+        :param compress_level: zstd level of archive, 0 keeps makepkg.conf's compression
+        :param compress_threads: zstd threads, 0 = all CPUs, -1 keeps makepkg.conf's compression
+        :param tmpfs_min_memory: MB of available memory needed for building in tmpfs_dir
+        :param packages: packages this profile is used for
+        """
+        if compiler_cache not in COMPILER_CACHES:
+            raise ValueError("Invalid compiler_cache of build profile {}: '{}'".format(name, compiler_cache))
+        self.name = name
+        self.makeflags = makeflags
+        self.compiler_cache = compiler_cache
+        self.compress_level = compress_level
+        self.compress_threads = compress_threads
+        self.tmpfs_dir = tmpfs_dir
+        self.tmpfs_min_memory = tmpfs_min_memory
+        self.packages = packages or []
+        self.base_conf = base_conf
+
+    @classmethod
+    def from_options(cls, name: str, options: Dict[str, str]) -> "BuildProfile":
+        """:param options: content of [profile:<name>] section of config"""
+        return cls(name, get_option(options, "makeflags", ""), get_option(options, "compiler_cache", ""),
+                   get_option(options, "compress_level", 0), get_option(options, "compress_threads", -1),
+                   get_path_option(options, "tmpfs_dir", ""), get_option(options, "tmpfs_min_memory", 0),
+                   get_option(options, "packages", "").split(), get_path_option(options, "makepkg_conf", MAKEPKG_CONF))
+
+    def get_makeflags(self, jobs: int = 1) -> str:
+        """:param jobs: number of builds running at once"""
+        if self.makeflags == "auto":
+            return "-j{}".format(max(1, (os.cpu_count() or 1) // max(1, jobs)))
+        return self.makeflags
+
+    def use_tmpfs(self, mem_available: Optional[int]) -> bool:
+        """:param mem_available: bytes, build goes to tmpfs only if it is known to be enough"""
+        return bool(self.tmpfs_dir) and os.path.isdir(self.tmpfs_dir) and mem_available is not None and \
+            mem_available >= self.tmpfs_min_memory * 1024 * 1024
+
+    def makepkg_conf(self, jobs: int = 1, builddir: Optional[str] = None) -> str:
+        """Content of makepkg.conf for makepkg --config, builddir is BUILDDIR in tmpfs"""
+        # makepkg --config reads just the given file, so drop-ins and the user's config (PACKAGER, GPGKEY,
+        # signing...) are sourced here, in makepkg's order
+        lines = ["# build profile {}, generated by repokeeper".format(self.name),
+                 "source " + shlex.quote(self.base_conf),
+                 "for conf in {}/*.conf; do if [[ -r $conf ]]; then source \"$conf\"; fi; done".format(
+                     shlex.quote(self.base_conf + ".d")),
+                 'if [[ -r "${XDG_CONFIG_HOME:-$HOME/.config}/pacman/makepkg.conf" ]]; then '
+                 'source "${XDG_CONFIG_HOME:-$HOME/.config}/pacman/makepkg.conf"; '
+                 'elif [[ -r "$HOME/.makepkg.conf" ]]; then source "$HOME/.makepkg.conf"; fi']
+        makeflags = self.get_makeflags(jobs)
+        if makeflags:
+            lines.append("MAKEFLAGS=" + shlex.quote(makeflags))
+        if self.compiler_cache == "ccache":
+            lines.append("BUILDENV+=(ccache)")  # the last occurrence of option wins
+        elif self.compiler_cache == "sccache":
+            lines.append("command -v sccache >/dev/null && export RUSTC_WRAPPER=sccache")
+        if self.compress_level or self.compress_threads >= 0:
+            cmd = ["zstd", "-c", "-z", "-q"]
+            if self.compress_threads >= 0:
+                cmd.append("-T{}".format(self.compress_threads))
+            if self.compress_level > 19:
+                cmd.append("--ultra")
+            if self.compress_level:
+                cmd.append("-{}".format(self.compress_level))
+            lines.append("COMPRESSZST=({} -)".format(" ".join(cmd)))
+        if builddir:
+            lines.append("BUILDDIR=" + shlex.quote(builddir))
+        return "\n".join(lines) + "\n"
+
+
+class ProfileStats(object):
+    """
+    Persistent per package and build profile record of successful builds (count, makepkg seconds,
+    archive size), so that profiles can be compared across runs
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Dict]] = {}
+        try:
+            with open(path) as fh:
+                self.entries = json.load(fh)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w") as fh:
+            json.dump(self.entries, fh, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+    def record(self, package: str, profile: str, seconds: float, archive_bytes: int, tmpfs: bool) -> None:
+        with self._lock:
+            entry = self.entries.setdefault(package, {}).get(profile, {"builds": 0, "seconds_total": 0.0})
+            self.entries[package][profile] = {
+                "builds": entry["builds"] + 1, "seconds_total": round(entry["seconds_total"] + seconds, 3),
+                "seconds_last": round(seconds, 3), "archive_bytes": archive_bytes, "tmpfs": tmpfs,
+                "last_build": time.time()}
+            self._save()
@@ -1,5 +1,7 @@
-import configparser
-from typing import List, Tuple
+import configparser, os
+from typing import Dict, List, Tuple, TypeVar
+
+T = TypeVar("T", int, float, bool, str)
 
 def get_conf_content(conffile: str, reponame: str) -> Tuple[List[str], str, str, str]:
     try:
@@ -12,11 +14,63 @@ def get_conf_content(conffile: str, reponame: str) -> Tuple[List[str], str, str,
                 raise ValueError("packages {} is missing in conf file".format(sect))
 
         packages = [k.split()[0] for k,v in config["packages"].items()]
-        repo_dir = str(config["options"]["repodir"])
-        build_dir = str(config["options"]["builddir"])
+        repo_dir = os.path.expanduser(str(config["options"]["repodir"]))
+        build_dir = os.path.expanduser(str(config["options"]["builddir"]))
         repo_name = str(config["options"].get("reponame", reponame))
 
         return packages, repo_dir, build_dir, repo_name
     except KeyError as ke:
         raise ValueError(f"{str(ke)} not found in config file: {conffile}. Make sure config file is properly configured")
 
+def get_conf_priorities(conffile: str) -> Dict[str, str]:
+    """
+    Poll priority of every package in [packages] section, given as second word on its line
+    (high, normal or low), normal if not given
+    """
+    config = configparser.ConfigParser(allow_no_value=True)
+    config.read(conffile)
+    if "packages" not in config.sections():
+        raise ValueError("packages section is missing in conf file")
+    priorities = {}
+    for k, v in config["packages"].items():
+        words = (k + " " + (v or "")).split()
+        priority = words[1] if len(words) > 1 else "normal"
+        if priority not in ("high", "normal", "low"):
+            raise ValueError(f"Invalid poll priority of {words[0]}: '{priority}'")
+        priorities[words[0]] = priority
+    return priorities
+
+def get_conf_options(conffile: str) -> Dict[str, str]:
+    """Returns raw content of [options] section, empty dict if there is no such section"""
+    config = configparser.ConfigParser(allow_no_value=True)
+    config.read(conffile)
+    if "options" not in config.sections():
+        return {}
+    return {k: v for k, v in config["options"].items() if v is not None}
+
+def get_conf_profiles(conffile: str) -> Dict[str, Dict[str, str]]:
+    """Raw content of [profile:<name>] sections by name"""
+    config = configparser.ConfigParser(allow_no_value=True)
+    config.read(conffile)
+    return {sect.split(":", 1)[1].strip(): {k: v for k, v in config[sect].items() if v is not None}
+            for sect in config.sections() if sect.startswith("profile:")}
+
+def get_option(options: Dict[str, str], key: str, default: T) -> T:
+    """Returns options[key] converted to the type of default, or default if key is not set"""
+    if key not in options:
+        return default
+    value = options[key].strip()
+    try:
+        if isinstance(default, bool):
+            if value.lower() in ("yes", "true", "on", "1"):
+                return True
+            if value.lower() in ("no", "false", "off", "0"):
+                return False
+            raise ValueError(value)
+        return type(default)(value)
+    except ValueError:
+        raise ValueError(f"Invalid value for option {key}: '{value}'")
+
+def get_path_option(options: Dict[str, str], key: str, default: str) -> str:
+    """Path from options[key] (or default) with ~ expanded to home directory"""
+    return os.path.expanduser(get_option(options, key, default))
@@ -0,0 +1,176 @@
+import ctypes, ctypes.util, json, os, select, socket, struct, threading, time
+from typing import Callable, Dict, Iterable, List, Optional
+
+PRIORITIES = ("high", "normal", "low")
+
+# inotify events meaning that file in watched directory was written or replaced
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_DELETE = 0x00000200
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len, followed by len bytes of name
+
+
+def _inotify_watch(directory: str) -> int:
+    """inotify descriptor watching directory, raises OSError where inotify is not available"""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    try:
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except AttributeError:
+        raise OSError("inotify not supported")
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_MASK) < 0:
+        errno = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(errno, "inotify_add_watch failed on {}".format(directory))
+    return fd
+
+
+class FileWatcher(object):
+    """
+    Waits for changes of a file. Its directory is watched by inotify, so that editors replacing
+    the file are noticed too, mtime of the file is polled where inotify is not available
+    """
+
+    def __init__(self, path: str, poll_interval: float = 5.0, use_inotify: bool = True) -> None:
+        self.path = os.path.abspath(path)
+        self.poll_interval = poll_interval
+        self._name = os.fsencode(os.path.basename(self.path))
+        self._stat = self._get_stat()
+        self._fd: Optional[int] = None
+        if use_inotify:
+            try:
+                self._fd = _inotify_watch(os.path.dirname(self.path))
+            except OSError:
+                pass
+
+    @property
+    def method(self) -> str:
+        return "inotify" if self._fd is not None else "polling"
+
+    def _get_stat(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+            return st.st_ino, st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_names(self) -> List[bytes]:
+        names = []
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                length = _EVENT.unpack_from(data, offset)[3]
+                offset += _EVENT.size
+                names.append(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+    def wait(self, timeout: float) -> bool:
+        """Sleeps up to timeout seconds, returns True as soon as the file changed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            left = max(0.0, deadline - time.monotonic())
+            if self._fd is not None:
+                if select.select([self._fd], [], [], left)[0] and self._name in self._read_names():
+                    self._stat = self._get_stat()
+                    return True
+            else:
+                time.sleep(min(left, self.poll_interval))
+                stat = self._get_stat()
+                if stat != self._stat:
+                    self._stat = stat
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class PollSchedule(object):
+    """When is each package due to be checked in AUR, per interval of its priority"""
+
+    def __init__(self, intervals: Dict[str, float]) -> None:
+        """:param intervals: seconds between checks for each of PRIORITIES"""
+        self.intervals = intervals
+        self.priorities: Dict[str, str] = {}
+        self.next_check: Dict[str, float] = {}
+        self.last_check: Dict[str, float] = {}
+
+    def update(self, priorities: Dict[str, str], now: float) -> None:
+        """Sets packages to be checked: new ones are due right away, dropped ones are forgotten"""
+        self.priorities = dict(priorities)
+        self.next_check = {name: min(self.next_check.get(name, now), now + self.intervals[priority])
+                           for name, priority in priorities.items()}
+        self.last_check = {name: ts for name, ts in self.last_check.items() if name in priorities}
+
+    def due(self, now: float) -> List[str]:
+        """Packages due at now, high priority ones first"""
+        return sorted((name for name, ts in self.next_check.items() if ts <= now),
+                      key=lambda name: (PRIORITIES.index(self.priorities[name]), name))
+
+    def checked(self, names: Iterable[str], now: float) -> None:
+        for name in names:
+            if name in self.priorities:
+                self.last_check[name] = now
+                self.next_check[name] = now + self.intervals[self.priorities[name]]
+
+    def next_due(self) -> Optional[float]:
+        return min(self.next_check.values(), default=None)
+
+
+class StatusServer(object):
+    """Unix socket, every client gets status of daemon as one line of JSON and is disconnected"""
+
+    def __init__(self, path: str, get_status: Callable[[], Dict]) -> None:
+        self.path = path
+        self.get_status = get_status
+        if os.path.exists(path):
+            try:
+                query_status(path, timeout=1.0)
+            except (OSError, ValueError):
+                os.remove(path)  # left behind by daemon that is not running any more
+            else:
+                raise OSError("daemon is already running, its status socket: {}".format(path))
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(path)
+        self._sock.listen(8)
+
+    def start(self) -> "StatusServer":
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # socket closed
+            with conn:
+                try:
+                    conn.sendall(json.dumps(self.get_status(), sort_keys=True).encode() + b"\n")
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        self._sock.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def query_status(path: str, timeout: float = 5.0) -> Dict:
+    """Status of daemon listening on socket path"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        with sock.makefile("rb") as fh:
+            return json.loads(fh.readline().decode())
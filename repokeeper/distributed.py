@@ -0,0 +1,352 @@
+import hmac, json, os, shutil, socket, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from repokeeper.publish import publish_file
+
+DEFAULT_PORT = 7755
+# seconds between worker's pings, worker silent for 3 times as long is considered dead
+HEARTBEAT = 10.0
+
+
+class WorkerLost(Exception):
+    pass
+
+
+def parse_address(address: str, default_host: str = "127.0.0.1") -> Tuple[str, int]:
+    """'host:port', 'host' or 'port' -> (host, port), coordinator listens on all interfaces only if asked to (0.0.0.0)"""
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        return host or default_host, int(port)
+    if address.isdigit():
+        return default_host, int(address)
+    return address, DEFAULT_PORT
+
+
+def is_package_file(name: str) -> bool:
+    """Only package archives and their signatures are accepted from the other side, nothing else may land in repodir"""
+    return name == os.path.basename(name) and not name.startswith(".") and \
+        name.endswith((".pkg.tar.zst", ".pkg.tar.zst.sig"))
+
+
+class _Channel(object):
+    """
+    JSON messages over socket, one per line. Message can be followed by raw content of files,
+    their names and sizes are then listed in its "files"
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._rfile: BinaryIO = sock.makefile("rb")
+        self._lock = threading.Lock()
+
+    def send(self, message: Dict, files: List[str] = ()) -> None:
+        if files:
+            message = dict(message, files=[{"name": os.path.basename(f), "size": os.path.getsize(f)} for f in files])
+        with self._lock:
+            self.sock.sendall(json.dumps(message).encode() + b"\n")
+            for path in files:
+                with open(path, "rb") as fh:
+                    self.sock.sendfile(fh)
+
+    def receive(self) -> Dict:
+        line = self._rfile.readline()
+        if not line:
+            raise EOFError("connection closed")
+        return json.loads(line.decode())
+
+    def receive_file(self, size: int, path: str) -> None:
+        with open(path, "wb") as fh:
+            while size > 0:
+                data = self._rfile.read(min(size, 1 << 20))
+                if not data:
+                    raise EOFError("connection closed")
+                fh.write(data)
+                size -= len(data)
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._rfile.close()
+        self.sock.close()
+
+
+class _Worker(object):
+    def __init__(self, name: str, slots: int, channel: _Channel) -> None:
+        self.name = name
+        self.slots = max(1, slots)
+        self.channel = channel
+        self.jobs: Dict[int, Future] = {}
+
+    @property
+    def free(self) -> int:
+        return self.slots - len(self.jobs)
+
+
+class Coordinator(object):
+    """
+    Hands out build jobs to workers connected over TCP, every job goes to the live worker with
+    most free slots. Archives built by worker are streamed back and published into repodir.
+    Jobs of worker that disconnected (or stopped sending heartbeats) are given to another one.
+    Workers have to know the shared secret.
+    """
+
+    def __init__(self, address: Tuple[str, int], repodir: str, secret: str, retries: int = 2,
+                 worker_timeout: float = 300, heartbeat: float = HEARTBEAT,
+                 log: Optional[Callable[[str], None]] = None) -> None:
+        """
+        :param secret: workers have to send it in their hello
+        :param retries: how many times job of lost worker is tried again
+        :param worker_timeout: seconds to wait for a worker when none is connected
+        """
+        if not secret:
+            raise ValueError("secret shared with workers is needed")
+        self.repodir = repodir
+        self.secret = secret
+        self.incoming = os.path.join(repodir, ".incoming")
+        self.retries = retries
+        self.worker_timeout = worker_timeout
+        self.heartbeat = heartbeat
+        self.log = log or (lambda text: None)
+        self._workers: List[_Worker] = []
+        self._cond = threading.Condition()
+        self._next_id = 0
+        self._stopped = False
+        self._server = socket.create_server(address, reuse_port=False)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.getsockname()[:2]
+
+    @property
+    def capacity(self) -> int:
+        with self._cond:
+            return sum(w.slots for w in self._workers)
+
+    def start(self) -> "Coordinator":
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, addr = self._server.accept()
+            except OSError:
+                return  # server socket closed
+            threading.Thread(target=self._serve_worker, args=(sock, addr), daemon=True).start()
+
+    def _serve_worker(self, sock: socket.socket, addr) -> None:
+        sock.settimeout(3 * self.heartbeat)
+        channel = _Channel(sock)
+        try:
+            hello = channel.receive()
+            worker = _Worker("{}@{}".format(hello["name"], addr[0]), int(hello["slots"]), channel)
+            if not hmac.compare_digest(str(hello.get("secret", "")).encode(), self.secret.encode()):
+                self.log("worker {} rejected, wrong secret".format(worker.name))
+                channel.send({"type": "rejected", "reason": "wrong secret"})
+                channel.close()
+                return
+        except (OSError, ValueError, KeyError, EOFError):
+            channel.close()
+            return
+        with self._cond:
+            if self._stopped:
+                channel.close()
+                return
+            self._workers.append(worker)
+            self._cond.notify_all()
+        self.log("worker {} connected, {} slots".format(worker.name, worker.slots))
+
+        try:
+            while True:
+                message = channel.receive()
+                if message.get("type") != "result":
+                    continue  # ping
+                with self._cond:
+                    # id becomes directory name, only ids of jobs given to this worker are accepted
+                    known = type(message["id"]) is int and message["id"] in worker.jobs
+                if not known:
+                    raise ValueError("result of unknown job: {!r}".format(message["id"]))
+                jobdir = os.path.join(self.incoming, str(message["id"]))
+                os.makedirs(jobdir, exist_ok=True)
+                files = []
+                for entry in message.get("files", []):
+                    if not is_package_file(entry["name"]):
+                        raise ValueError("not a package file: {!r}".format(entry["name"]))
+                    files.append(os.path.join(jobdir, os.path.basename(entry["name"])))
+                    channel.receive_file(int(entry["size"]), files[-1])
+                with self._cond:
+                    future = worker.jobs.pop(message["id"], None)
+                    self._cond.notify_all()
+                if future is not None:
+                    future.set_result((message.get("reason"), files))
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            self._drop(worker, str(e) or e.__class__.__name__)
+
+    def _drop(self, worker: _Worker, reason: str) -> None:
+        with self._cond:
+            if worker not in self._workers:
+                return
+            self._workers.remove(worker)
+            jobs, worker.jobs = worker.jobs, {}
+            self._cond.notify_all()
+        worker.channel.close()
+        if not self._stopped:
+            self.log("worker {} lost ({}), {} jobs to be rescheduled".format(worker.name, reason, len(jobs)))
+        for future in jobs.values():
+            future.set_exception(WorkerLost("worker {} lost: {}".format(worker.name, reason)))
+
+    def _assign(self) -> Optional[Tuple[_Worker, int, Future]]:
+        """Waits for free slot, None if no worker connected within worker_timeout"""
+        deadline = None
+        with self._cond:
+            while not self._stopped:
+                free = [w for w in self._workers if w.free > 0]
+                if free:
+                    worker = max(free, key=lambda w: (w.free, w.slots))
+                    self._next_id += 1
+                    future: Future = Future()
+                    worker.jobs[self._next_id] = future
+                    return worker, self._next_id, future
+                if self._workers:
+                    deadline = None
+                    self._cond.wait()
+                else:
+                    deadline = deadline or time.monotonic() + self.worker_timeout
+                    if time.monotonic() >= deadline:
+                        return None
+                    self._cond.wait(deadline - time.monotonic())
+        return None
+
+    def build(self, job: Dict, files: List[str] = ()) -> Optional[str]:
+        """
+        Builds package on some worker and publishes its archives into repodir
+        :param job: attributes of PackageToBuild
+        :param files: archives of its dependencies built earlier in this run, worker installs them
+        :return: None on success, reason of failure otherwise
+        """
+        for attempt in range(self.retries + 1):
+            assigned = self._assign()
+            if assigned is None:
+                return "no build worker available"
+            worker, job_id, future = assigned
+            self.log("{} sent to worker {}".format(job["name"], worker.name))
+            try:
+                worker.channel.send({"type": "job", "id": job_id, "package": job}, files)
+            except OSError as e:
+                self._drop(worker, str(e))
+            try:
+                reason, files = future.result()
+            except WorkerLost as e:
+                self.log("{}: {}".format(job["name"], str(e)))
+                continue
+            try:
+                if reason is None and not files:
+                    reason = "No built archives found"
+                # signatures go first, so that they are there once pacman can see the archive
+                for path in sorted(files, key=lambda f: not f.endswith(".sig")) if reason is None else ():
+                    if is_package_file(os.path.basename(path)):
+                        publish_file(path, self.repodir)
+            finally:
+                shutil.rmtree(os.path.join(self.incoming, str(job_id)), ignore_errors=True)
+            return reason
+        return "build workers lost {} times".format(self.retries + 1)
+
+    def stop(self) -> None:
+        """Tells workers to quit and closes all connections"""
+        with self._cond:
+            self._stopped = True
+            workers = list(self._workers)
+            self._cond.notify_all()
+        self._server.close()
+        for worker in workers:
+            try:
+                worker.channel.send({"type": "bye"})
+            except OSError:
+                pass
+            self._drop(worker, "coordinator stopped")
+        shutil.rmtree(self.incoming, ignore_errors=True)
+
+
+def run_worker(address: Tuple[str, int], slots: int, build: Callable[[Dict, str], Tuple[Optional[str], List[str]]],
+               workdir: str, secret: str, name: Optional[str] = None, heartbeat: float = HEARTBEAT,
+               connect_timeout: float = 60) -> None:
+    """
+    Connects to coordinator and builds what it sends, up to slots packages at once, until coordinator
+    says bye or disconnects. Raises PermissionError if coordinator does not accept the secret
+    :param build: builds package (job sent by coordinator) putting archives into given directory,
+                  returns None on success or reason of failure and list of archives. Archives of
+                  dependencies sent with the job are listed in its "dependency_files"
+    :param connect_timeout: for how long connecting is retried when coordinator is not up yet
+    """
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            sock = socket.create_connection(address)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+    channel = _Channel(sock)
+    channel.send({"type": "hello", "name": name or socket.gethostname(), "slots": slots, "secret": secret})
+    stopped = threading.Event()
+
+    def ping() -> None:
+        while not stopped.wait(heartbeat):
+            try:
+                channel.send({"type": "ping"})
+            except OSError:
+                return
+
+    def do_job(message: Dict) -> None:
+        outbox = os.path.join(workdir, "job-{}".format(message["id"]))
+        shutil.rmtree(outbox, ignore_errors=True)
+        os.makedirs(outbox)
+        try:
+            try:
+                reason, files = build(message["package"], outbox)
+            except Exception as e:
+                reason, files = str(e), []
+            channel.send({"type": "result", "id": message["id"], "reason": reason}, files if reason is None else [])
+        except OSError:
+            pass  # coordinator is gone
+        finally:
+            shutil.rmtree(outbox, ignore_errors=True)
+            shutil.rmtree(os.path.join(workdir, "deps-{}".format(message["id"])), ignore_errors=True)
+
+    def receive_dependencies(message: Dict) -> None:
+        """Files follow the job message right away, so they are read before next message"""
+        depdir = os.path.join(workdir, "deps-{}".format(message["id"]))
+        paths = []
+        for entry in message.get("files", []):
+            if not is_package_file(entry["name"]):
+                raise ValueError("not a package file: {!r}".format(entry["name"]))
+            os.makedirs(depdir, exist_ok=True)
+            paths.append(os.path.join(depdir, entry["name"]))
+            channel.receive_file(int(entry["size"]), paths[-1])
+        message["package"]["dependency_files"] = paths
+
+    rejected = None
+    threading.Thread(target=ping, daemon=True).start()
+    with ThreadPoolExecutor(max_workers=max(1, slots)) as executor:
+        try:
+            while True:
+                message = channel.receive()
+                if message.get("type") == "job":
+                    receive_dependencies(message)
+                    executor.submit(do_job, message)
+                elif message.get("type") == "bye":
+                    break
+                elif message.get("type") == "rejected":
+                    rejected = message.get("reason", "rejected")
+                    break
+        except (OSError, ValueError, EOFError):
+            pass
+        finally:
+            stopped.set()
+    channel.close()
+    if rejected:
+        raise PermissionError("coordinator refused the worker: {}".format(rejected))
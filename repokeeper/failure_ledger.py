@@ -0,0 +1,63 @@
+import json, os, threading, time
+from typing import Dict, Optional
+
+
+def get_file_hash(path: str) -> str:
+    import hashlib  # needed only when building
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+class FailureLedger(object):
+    """
+    Persistent record of failed builds keyed by package name, AUR version and PKGBUILD hash.
+    Build of the very same package is not attempted again until its backoff expires
+    (backoff_base seconds after first failure, doubled with every further failure).
+    """
+
+    def __init__(self, path: str, backoff_base: float, backoff_max: float) -> None:
+        self.path = path
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(path) as fh:
+                self.entries = json.load(fh)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w") as fh:
+            json.dump(self.entries, fh, indent=1, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+    def next_retry(self, name: str) -> float:
+        entry = self.entries[name]
+        return entry["last_attempt"] + min(self.backoff_max, self.backoff_base * 2 ** (entry["failures"] - 1))
+
+    def should_skip(self, name: str, version: Optional[str], pkgbuild_hash: str) -> Optional[str]:
+        """:return: reason for skipping the build, None if it should be built"""
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is None or entry["version"] != version or entry["pkgbuild_hash"] != pkgbuild_hash:
+                return None
+            next_retry = self.next_retry(name)
+            if time.time() >= next_retry:
+                return None
+            return "failed {} time(s) before ({}), next retry after {}".format(
+                entry["failures"], entry["reason"], time.strftime("%d %b %Y %H:%M", time.localtime(next_retry)))
+
+    def record_failure(self, name: str, version: Optional[str], pkgbuild_hash: str, reason: str) -> None:
+        with self._lock:
+            entry = self.entries.get(name)
+            same = entry is not None and entry["version"] == version and entry["pkgbuild_hash"] == pkgbuild_hash
+            self.entries[name] = {"version": version, "pkgbuild_hash": pkgbuild_hash, "reason": reason,
+                                  "failures": entry["failures"] + 1 if same else 1, "last_attempt": time.time()}
+            self._save()
+
+    def record_success(self, name: str) -> None:
+        with self._lock:
+            if self.entries.pop(name, None) is not None:
+                self._save()
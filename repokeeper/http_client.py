@@ -0,0 +1,222 @@
+import http.client, json, os, threading, time, zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from repokeeper.ratelimit import RateLimiter, get_retry_delay
+
+USER_AGENT = "repokeeper"
+# statuses after which the request is repeated (after Retry-After delay or backoff)
+RETRY_STATUSES = (429, 502, 503, 504)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class HttpResponse(object):
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict:
+        return json.loads(self.body.decode('utf-8'))
+
+
+class _TeeReader(object):
+    """File-like reader of response body (gunzipped if needed), everything read is also written into fh"""
+
+    def __init__(self, response: http.client.HTTPResponse, decoder, fh: BinaryIO) -> None:
+        self._response = response
+        self._decoder = decoder
+        self._fh = fh
+        self._buffer = bytearray()
+        self.size = 0  # bytes transferred
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            raw = self._response.read(1 << 16)
+            if not raw:
+                if self._decoder:
+                    self._append(self._decoder.flush())
+                    self._decoder = None
+                break
+            self.size += len(raw)
+            self._append(self._decoder.decompress(raw) if self._decoder else raw)
+        size = len(self._buffer) if size < 0 else min(size, len(self._buffer))
+        res = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return res
+
+    def _append(self, data: bytes) -> None:
+        self._fh.write(data)
+        self._buffer += data
+
+
+class HttpClient(object):
+    """
+    HTTP client keeping one persistent (keep-alive) connection per host and thread, so TLS
+    handshake is paid once per run instead of once per request. Every request goes through
+    the rate limiter; failed connections, 429 and 5xx answers are retried.
+    """
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, timeout: float = 30, retries: int = 3) -> None:
+        self.limiter = limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.requests = 0
+        self.bytes_downloaded = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        pool = self._local.__dict__.setdefault("pool", {})
+        conn = pool.get((scheme, netloc))
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = pool[(scheme, netloc)] = conn_class(netloc, timeout=self.timeout)
+        return conn
+
+    def _drop_connection(self, scheme: str, netloc: str) -> None:
+        conn = self._local.__dict__.get("pool", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def _count(self, size: int) -> None:
+        with self._stats_lock:
+            self.requests += 1
+            self.bytes_downloaded += size
+
+    def _open(self, url: str, headers: Dict[str, str]) -> Tuple[str, http.client.HTTPResponse]:
+        """
+        Sends GET request (following redirects, retrying), returns final url and response with
+        body not read yet. Raises HTTPError for error statuses.
+        """
+        attempt = 0
+        redirects = 0
+        while True:
+            parts = urlsplit(url)
+            path = parts.path + ("?" + parts.query if parts.query else "")
+            if self.limiter is not None:
+                self.limiter.acquire()
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path or "/", headers=dict(headers, **{"User-Agent": USER_AGENT,
+                                                                           "Accept-Encoding": "gzip"}))
+                response = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                # server closed kept-alive connection or network hiccup, new connection is tried
+                self._drop_connection(parts.scheme, parts.netloc)
+                if attempt >= self.retries:
+                    raise
+                if attempt > 0:
+                    time.sleep(get_retry_delay(None, attempt - 1))
+                attempt += 1
+                continue
+
+            if response.status in REDIRECT_STATUSES and redirects < 5:
+                response.read()
+                self._count(0)
+                url = urljoin(url, response.getheader("Location"))
+                redirects += 1
+                continue
+            if response.status in RETRY_STATUSES and attempt < self.retries:
+                response.read()
+                self._count(0)
+                delay = get_retry_delay(response.getheader("Retry-After"), attempt)
+                if self.limiter is not None:
+                    self.limiter.block(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            if response.status >= 400:
+                body = response.read()
+                self._count(len(body))
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+            return url, response
+
+    @staticmethod
+    def _decoder(response: http.client.HTTPResponse):
+        if (response.getheader("Content-Encoding") or "").lower() == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return None
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        url, response = self._open(url, headers or {})
+        body = response.read()
+        self._count(len(body))
+        decoder = self._decoder(response)
+        if decoder:
+            body = decoder.decompress(body) + decoder.flush()
+        return HttpResponse(url, response.status, dict(response.getheaders()), body)
+
+    def get_json(self, url: str) -> Dict:
+        return self.get(url).json()
+
+    @contextmanager
+    def download_stream(self, url: str, cache_dir: str) -> Iterator[BinaryIO]:
+        """
+        Yields readable stream of url's content. Unless the copy in cache_dir is still current
+        (conditional GET with ETag/Last-Modified of the previous download) content comes straight
+        from the network and is stored into cache_dir as it is read.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        target = os.path.join(cache_dir, os.path.basename(urlsplit(url).path) or "index")
+        meta_file = target + ".meta"
+        headers: Dict[str, str] = {}
+        if os.path.isfile(target):
+            try:
+                with open(meta_file) as mf:
+                    meta = json.load(mf)
+                if meta.get("url") == url:
+                    if meta.get("etag"):
+                        headers["If-None-Match"] = meta["etag"]
+                    if meta.get("last_modified"):
+                        headers["If-Modified-Since"] = meta["last_modified"]
+            except (OSError, ValueError):
+                pass
+
+        final_url, response = self._open(url, headers)
+        if response.status == 304:
+            response.read()
+            self._count(0)
+            with open(target, "rb") as fh:
+                yield fh
+            return
+
+        tmp = "{}.{}.part".format(target, threading.get_ident())
+        reader = None
+        try:
+            with open(tmp, "wb") as fh:
+                reader = _TeeReader(response, self._decoder(response), fh)
+                yield reader
+                # rest of the stream, so that cached copy is complete, in chunks not to hold it in memory
+                while reader.read(1 << 16):
+                    pass
+        except BaseException:
+            # response was not read to the end, connection can not be reused
+            self._drop_connection(*urlsplit(final_url)[:2])
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            self._count(reader.size if reader else 0)
+        os.replace(tmp, target)
+        with open(meta_file, "w") as mf:
+            json.dump({"url": url, "etag": response.getheader("ETag"),
+                       "last_modified": response.getheader("Last-Modified")}, mf)
+
+    def download(self, url: str, cache_dir: str) -> str:
+        """
+        Downloads url into cache_dir, unless the copy there is still current
+        :return: path of local copy
+        """
+        with self.download_stream(url, cache_dir):
+            pass
+        return os.path.join(cache_dir, os.path.basename(urlsplit(url).path) or "index")
+
+    def close(self) -> None:
+        for conn in self._local.__dict__.get("pool", {}).values():
+            conn.close()
+        self._local.__dict__["pool"] = {}
@@ -0,0 +1,160 @@
+import atexit, json, os, subprocess, sys, threading, time
+from enum import Enum
+from typing import IO, List, Optional
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+class LogType(Enum):
+    NORMAL = 0
+    BOLD = 1
+    WARNING = 2
+    ERROR = 3
+    CUSTOM = 4
+    HIGHLIGHT = 5
+
+
+class Logger(object):
+    """
+    Process-wide logger, Logger() always returns the same instance. Log file is opened once
+    (buffered, flushed on errors and at exit), lines below configured level are not written,
+    and the file is rotated when it grows over max_size.
+    """
+    _BOLD = "\033[1m"
+    _WARNING = "\033[91m"
+    _HIGHLIGHT = "\033[92m"
+    _UNCOLOR = "\033[0m"
+    _instance: Optional["Logger"] = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls) -> "Logger":
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance._lock = threading.RLock()
+                instance._fh = None
+                instance.configure()
+                atexit.register(instance.close)
+                cls._instance = instance
+        return cls._instance
+
+    def configure(self, logfile: str = "/tmp/repokeeper.log", level: str = "info", max_size: int = 0,
+                  backups: int = 3, json_lines: bool = False) -> None:
+        """
+        :param max_size: log file is rotated (<logfile>.1 ... <logfile>.<backups>) when bigger, 0 = never
+        :param json_lines: every record is written as JSON object on its own line
+        """
+        if level not in LOG_LEVELS:
+            raise ValueError("Invalid log level: '{}', use one of: {}".format(level, ", ".join(LOG_LEVELS)))
+        with self._lock:
+            self.close()
+            self._logfile = logfile
+            self._level = LOG_LEVELS[level]
+            self._max_size = max_size
+            self._backups = backups
+            self._json_lines = json_lines
+
+    @property
+    def logfile(self) -> str:
+        return self._logfile
+
+    def _open(self) -> IO[str]:
+        if self._fh is None:
+            self._fh = open(self._logfile, "a", buffering=1 << 16)
+            self._size = self._fh.tell()
+        return self._fh
+
+    def _rotate(self) -> None:
+        self.close()
+        for i in range(self._backups - 1, 0, -1):
+            if os.path.exists("{}.{}".format(self._logfile, i)):
+                os.replace("{}.{}".format(self._logfile, i), "{}.{}".format(self._logfile, i + 1))
+        if self._backups > 0:
+            os.replace(self._logfile, self._logfile + ".1")
+        else:
+            os.remove(self._logfile)
+
+    def write(self, text: str, level: str = "info", log_eof: str = "\n") -> None:
+        """Writes record into log file (console is not touched)"""
+        if LOG_LEVELS[level] < self._level:
+            return
+        if self._json_lines:
+            text = json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime()),
+                               "level": level, "message": text})
+            log_eof = "\n"
+        with self._lock:
+            fh = self._open()
+            fh.write(text + log_eof)
+            self._size += len(text) + len(log_eof)
+            if LOG_LEVELS[level] >= LOG_LEVELS["error"]:
+                fh.flush()
+            if 0 < self._max_size < self._size:
+                self._rotate()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def log(self, logtype: LogType = LogType.NORMAL, console_txt: Optional[str] = None, log_txt: Optional[str] = None,
+            err_code: int = -1, log_eof: str = "\n", level: Optional[str] = None):
+        """:param level: level of log_txt, derived from logtype if not given"""
+
+        if logtype == LogType.WARNING:
+            open_col = self._WARNING
+        elif logtype == LogType.ERROR:
+            open_col = Logger._WARNING + Logger._BOLD
+        elif logtype == LogType.HIGHLIGHT:
+            open_col = Logger._HIGHLIGHT
+        elif logtype == LogType.BOLD:
+            open_col = Logger._BOLD
+        else:
+            open_col = ""
+
+        if isinstance(console_txt, str):
+            print(open_col + console_txt + Logger._UNCOLOR)
+        if isinstance(log_txt, str):
+            if level is None:
+                level = {LogType.WARNING: "warning", LogType.ERROR: "error"}.get(logtype, "info")
+            self.write(log_txt, level, log_eof)
+        if err_code >= 0:
+            self.flush()
+            sys.exit(err_code)
+
+
+def run_logged(cmd, log_file: str, echo: bool = False, **popen_args) -> int:
+    """
+    Runs command with its stdout and stderr read through a pipe into log_file (and
+    onto console if echo is set, so that output of parallel commands does not mix)
+    :return: return code of the command
+    """
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    with open(log_file, "wb") as lf:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **popen_args)
+        with proc.stdout:
+            for chunk in iter(lambda: proc.stdout.read1(1 << 16), b""):
+                lf.write(chunk)
+                if echo:
+                    sys.stdout.flush()
+                    if hasattr(sys.stdout, "buffer"):
+                        sys.stdout.buffer.write(chunk)
+                    else:
+                        sys.stdout.write(chunk.decode("utf-8", errors="replace"))
+                    sys.stdout.flush()
+        return proc.wait()
+
+
+def get_log_tail(log_file: str, lines: int = 20) -> List[str]:
+    """Last lines of log file, for a summary of failed command"""
+    try:
+        with open(log_file, "rb") as lf:
+            lf.seek(max(0, os.path.getsize(log_file) - 64 * 1024))
+            return lf.read().decode("utf-8", errors="replace").splitlines()[-lines:]
+    except OSError:
+        return []
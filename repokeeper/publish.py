@@ -0,0 +1,51 @@
+import errno, os, shutil
+from typing import Optional
+
+# ioctl of Linux (btrfs, xfs...) making copy-on-write clone of whole file, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> None:
+    import fcntl
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def publish_file(src: str, target_dir: str, keep_source: bool = False) -> str:
+    """
+    Puts src into target_dir under the same name without copying data when possible: by rename
+    (or hardlink with keep_source), reflink, plain copy is the last resort. File is written under
+    temporary name first and renamed at the end, so nobody sees half-written file in target_dir.
+    :return: method used (rename, hardlink, reflink or copy)
+    """
+    target = os.path.join(target_dir, os.path.basename(src))
+    tmp = os.path.join(target_dir, ".{}.{}.tmp".format(os.path.basename(src), os.getpid()))
+    method: Optional[str] = None
+    try:
+        try:
+            if keep_source:
+                os.link(src, tmp)
+                method = "hardlink"
+            else:
+                os.rename(src, tmp)
+                method = "rename"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                raise
+        if method is None:
+            try:
+                _reflink(src, tmp)
+                method = "reflink"
+            except (OSError, ImportError):
+                method = "copy"
+                shutil.copyfile(src, tmp)
+            shutil.copymode(src, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.lexists(tmp):
+            if method == "rename":
+                os.rename(tmp, src)  # given back
+            else:
+                os.remove(tmp)
+        raise
+    return method
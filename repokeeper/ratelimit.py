@@ -0,0 +1,59 @@
+import threading, time
+from typing import Optional
+
+
+class RateLimiter(object):
+    """
+    Token bucket: up to burst requests can go at once, then rate requests per second.
+    Shared by all threads talking to AUR.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a request can be sent, rate 0 means no limit except the block after HTTP 429"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate <= 0:
+                    if now >= self._blocked_until:
+                        return
+                    delay = self._blocked_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if now >= self._blocked_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+
+    def block(self, seconds: float) -> None:
+        """Server asked to slow down (HTTP 429), nobody sends anything for given time"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+def get_retry_delay(retry_after: Optional[str], attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Seconds to wait before next attempt, per Retry-After header (seconds or HTTP date)
+    if present, exponential backoff otherwise
+    """
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                import email.utils  # rarely needed, not imported with the module
+                when = email.utils.parsedate_to_datetime(retry_after)
+                return min(cap, max(0.0, when.timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    return min(cap, base * 2 ** attempt)
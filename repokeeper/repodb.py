@@ -0,0 +1,208 @@
+import base64, gzip, hashlib, io, json, os, sqlite3, subprocess, tarfile, threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # zstd binary is used instead
+
+# .PKGINFO key: desc section, in the order repo-add writes them at the end of desc
+PKGINFO_RELATION_FIELDS = {"replaces": "%REPLACES%", "conflict": "%CONFLICTS%", "provides": "%PROVIDES%",
+                           "depend": "%DEPENDS%", "optdepend": "%OPTDEPENDS%", "makedepend": "%MAKEDEPENDS%",
+                           "checkdepend": "%CHECKDEPENDS%"}
+# files in root of package archive that are metadata, not content
+PACKAGE_META_FILES = (".PKGINFO", ".BUILDINFO", ".MTREE", ".INSTALL", ".CHANGELOG")
+
+
+@contextmanager
+def open_package(path: str, to_end: bool = True) -> Iterator[tarfile.TarFile]:
+    """
+    Opens package archive as tar stream, zstd compressed ones included
+    :param to_end: False if reading can stop early, zstd's failure on closed pipe is not an error then
+    """
+    if not path.endswith(".zst"):
+        with tarfile.open(path, "r|*") as tar:
+            yield tar
+        return
+    if zstandard is not None:
+        with open(path, "rb") as fh, zstandard.ZstdDecompressor().stream_reader(fh) as reader, \
+                tarfile.open(fileobj=reader, mode="r|") as tar:
+            yield tar
+        return
+    proc = subprocess.Popen(["zstd", "-dcq", path], stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+            yield tar
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0 and to_end:
+            raise tarfile.ReadError(f"zstd failed to decompress {path}")
+
+
+def parse_pkginfo(content: str) -> Dict[str, List[str]]:
+    res: Dict[str, List[str]] = {}
+    for line in content.splitlines():
+        if not line or line.startswith("#") or " = " not in line:
+            continue
+        key, value = line.split(" = ", 1)
+        res.setdefault(key.strip(), []).append(value)
+    return res
+
+
+def file_checksums(path: str) -> Dict[str, str]:
+    md5, sha256 = hashlib.md5(), hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            md5.update(block)
+            sha256.update(block)
+    return {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
+
+
+def read_package(path: str) -> Dict:
+    """
+    Parses package archive once, returns its .PKGINFO, list of files, checksums and size
+    """
+    pkginfo: Optional[Dict[str, List[str]]] = None
+    files: List[str] = []
+    with open_package(path) as tar:
+        for member in tar:
+            if member.name in PACKAGE_META_FILES:
+                if member.name == ".PKGINFO":
+                    pkginfo = parse_pkginfo(tar.extractfile(member).read().decode('utf-8', 'replace'))
+                continue
+            files.append(member.name + "/" if member.isdir() else member.name)
+    if pkginfo is None or "pkgname" not in pkginfo or "pkgver" not in pkginfo:
+        raise ValueError(f"No valid .PKGINFO in {path}")
+    res = {"pkginfo": pkginfo, "files": sorted(files), "csize": os.path.getsize(path)}
+    res.update(file_checksums(path))
+    return res
+
+
+def read_pkginfo(path: str) -> Dict[str, List[str]]:
+    """.PKGINFO of package archive alone, the archive is read only up to it (it is the first member)"""
+    with open_package(path, to_end=False) as tar:
+        for member in tar:
+            if member.name == ".PKGINFO":
+                return parse_pkginfo(tar.extractfile(member).read().decode('utf-8', 'replace'))
+    raise ValueError(f"No .PKGINFO in {path}")
+
+
+class PackageIndex(object):
+    """
+    Persistent metadata of package archives keyed by path, size and mtime, so every archive
+    is decompressed and parsed only once in its lifetime
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.hits = 0
+        self.parsed = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS archives (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                         "mtime REAL NOT NULL, info TEXT NOT NULL)")
+        self._db.commit()
+
+    def get_cached(self, path: str) -> Optional[Dict]:
+        """Returns metadata of archive if it is indexed and unchanged, never parses the archive"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT info FROM archives WHERE path = ? AND size = ? AND mtime = ?",
+                                   (os.path.abspath(path), st.st_size, st.st_mtime)).fetchone()
+            if row:
+                self.hits += 1
+        return json.loads(row[0]) if row else None
+
+    def get(self, path: str) -> Dict:
+        """Returns metadata of archive, parsing it if not indexed yet (or changed since)"""
+        info = self.get_cached(path)
+        if info is not None:
+            return info
+        st = os.stat(path)
+        info = read_package(path)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO archives (path, size, mtime, info) VALUES (?, ?, ?, ?)",
+                             (os.path.abspath(path), st.st_size, st.st_mtime, json.dumps(info)))
+            self._db.commit()
+            self.parsed += 1
+        return info
+
+    def forget_missing(self, directory: str) -> None:
+        """Drops entries of archives in directory that do not exist anymore"""
+        directory = os.path.join(os.path.abspath(directory), "")
+        with self._lock:
+            paths = [row[0] for row in self._db.execute("SELECT path FROM archives WHERE substr(path, 1, ?) = ?",
+                                                         (len(directory), directory))]
+            self._db.executemany("DELETE FROM archives WHERE path = ?", [(p,) for p in paths if not os.path.exists(p)])
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def get_desc(path: str, info: Dict) -> str:
+    """Content of desc file of repo db entry, same as repo-add writes it"""
+    pkginfo = info["pkginfo"]
+
+    def single(key: str) -> List[str]:
+        return pkginfo.get(key, [])[:1]
+
+    sections = [("%FILENAME%", [os.path.basename(path)]), ("%NAME%", single("pkgname")),
+                ("%BASE%", single("pkgbase")), ("%VERSION%", single("pkgver")), ("%DESC%", single("pkgdesc")),
+                ("%GROUPS%", pkginfo.get("group", [])), ("%CSIZE%", [str(info["csize"])]),
+                ("%ISIZE%", single("size")), ("%MD5SUM%", [info["md5"]]), ("%SHA256SUM%", [info["sha256"]])]
+    if os.path.isfile(path + ".sig"):
+        with open(path + ".sig", "rb") as sig:
+            sections.append(("%PGPSIG%", [base64.b64encode(sig.read()).decode('ascii')]))
+    sections += [("%URL%", single("url")), ("%LICENSE%", pkginfo.get("license", [])), ("%ARCH%", single("arch")),
+                 ("%BUILDDATE%", single("builddate")), ("%PACKAGER%", single("packager"))]
+    sections += [(section, pkginfo.get(key, [])) for key, section in PKGINFO_RELATION_FIELDS.items()]
+    return "".join(f"{section}\n" + "".join(v + "\n" for v in values) + "\n"
+                   for section, values in sections if values)
+
+
+def _add_tar_file(tar: tarfile.TarFile, name: str, content: bytes, mtime: float) -> None:
+    member = tarfile.TarInfo(name)
+    member.size = len(content)
+    member.mtime = int(mtime)
+    member.mode = 0o644
+    tar.addfile(member, io.BytesIO(content))
+
+
+def _write_db_archive(target: str, entries: Dict[str, Dict], with_files: bool) -> None:
+    tmp = target + ".tmp"
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz, \
+            tarfile.open(fileobj=gz, mode="w|") as tar:
+        for path, info in sorted(entries.items(), key=lambda x: x[1]["pkginfo"]["pkgname"][0]):
+            entry_dir = f"{info['pkginfo']['pkgname'][0]}-{info['pkginfo']['pkgver'][0]}"
+            mtime = float(info["pkginfo"].get("builddate", ["0"])[0])
+            dir_member = tarfile.TarInfo(entry_dir)
+            dir_member.type = tarfile.DIRTYPE
+            dir_member.mode = 0o755
+            dir_member.mtime = int(mtime)
+            tar.addfile(dir_member)
+            _add_tar_file(tar, entry_dir + "/desc", get_desc(path, info).encode('utf-8'), mtime)
+            if with_files:
+                files = "%FILES%\n" + "".join(f + "\n" for f in info["files"]) + "\n"
+                _add_tar_file(tar, entry_dir + "/files", files.encode('utf-8'), mtime)
+    os.replace(tmp, target)
+
+
+def write_repo_db(repodir: str, reponame: str, entries: Dict[str, Dict]) -> None:
+    """
+    Writes <reponame>.db.tar.gz and <reponame>.files.tar.gz (plus the .db/.files symlinks)
+    :param entries: archive path: metadata from PackageIndex, for every package the db should contain
+    """
+    for suffix, with_files in ((".db", False), (".files", True)):
+        archive = reponame + suffix + ".tar.gz"
+        _write_db_archive(os.path.join(repodir, archive), entries, with_files)
+        link = os.path.join(repodir, reponame + suffix)
+        if not os.path.islink(link) or os.readlink(link) != archive:
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(archive, link)
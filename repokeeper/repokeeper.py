@@ -3,27 +3,37 @@
 # Repokeeper - creates and maintain local repository from AUR packages
 
 # IMPORTING MODULES
-try:
-    from urllib import urlopen
-    from urllib import urlretrieve
-    from urllib.error import HTTPError
-except:
-    try:
-        from urllib.request import urlopen
-        from urllib.request import urlretrieve
-        from urllib.error import HTTPError
-    except:
-        print("ERROR: You need urllib package for python2")
-        print(" or urllib.request package for python3 installed")
-        exit()
-
-import json, os, tarfile, shutil, subprocess, time, glob, sys, signal, argparse
-from packaging import version
-from repokeeper.config_parser import get_conf_content
+# only what --version and --list need is imported here, modules for talking to AUR, building
+# and writing repo db (http.client, ssl, sqlite3, tarfile, concurrent.futures...) are imported
+# where they are used, so that cheap commands start fast (see benchmarks/import_time.py)
+import os, re, shutil, subprocess, time, glob, signal, argparse, threading
+from repokeeper.build_profile import BuildProfile, ProfileStats
+from repokeeper.config_parser import get_conf_content, get_conf_options, get_conf_priorities, get_conf_profiles, \
+    get_option, get_path_option
+from repokeeper.vercmp import vercmp, version_key
+from repokeeper.failure_ledger import FailureLedger, get_file_hash
+from repokeeper.logger import LOG_LEVELS, Logger, LogType, get_log_tail, run_logged
+from repokeeper.ratelimit import RateLimiter
+from repokeeper.report import RunReport
 
 import getpass
-from typing import List, Tuple, Optional, Dict, Set
-from enum import Enum
+from typing import List, Tuple, Optional, Dict, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from repokeeper.aur_cache import AurCache
+    from repokeeper.aur_dump import AurDumpIndex
+    from repokeeper.http_client import HttpClient
+    from repokeeper.repodb import PackageIndex
+    from repokeeper.syncdb import SyncDbIndex
+
+AUR_URL = "https://aur.archlinux.org"
+AUR_RPC_PATH = "/rpc/?v=5&type=info"
+AUR_RPC_URL = AUR_URL + AUR_RPC_PATH
+# how many times AUR request is retried when connection fails or AUR answers 429/5xx
+AUR_RETRIES = 3
+# aurweb refuses request URIs longer than 4443 characters
+AUR_RPC_MAX_URL_LEN = 4400
 
 class FailedPackage(object):
     def __init__(self, name: str, reason:str) -> None:
@@ -31,17 +41,22 @@ class FailedPackage(object):
         self.reason = str(reason)
 
 class PackageToBuild(object):
-    def __init__(self, name: str, url: str, dependencies: List[str], build_dependencies: List[str]) -> None:
+    def __init__(self, name: str, url: str, dependencies: List[str], build_dependencies: List[str],
+                 pkgbase: Optional[str] = None, version: Optional[str] = None) -> None:
         self.name = name
         self.url = url
         self.dependencies = dependencies
         self.build_dependencies = build_dependencies
+        self.pkgbase = pkgbase or name
+        self.version = version
 
 class pkg_identification(object):
-    def __init__(self, file: str, file_basename: str, ver: str):
+    def __init__(self, file: str, file_basename: str, ver: str, full_version: Optional[str] = None):
         self.file = file
         self.file_basename = file_basename
         self.version = ver
+        self.full_version = full_version or ver  # pkgver-pkgrel as pacman knows it
+        self.sort_key = version_key(self.full_version)
         if not self.file_basename in self.file:
             Logger().log(LogType.ERROR, console_txt="pkg_identification failed", err_code=7)
         
@@ -50,53 +65,96 @@ class pkg_identification(object):
 
 class RepoContent(object):
     
-    def __init__(self, path_regexp, in_config: List[str]) -> None:
-        self._content: List[pkg_identification, bool, bool] = [] #Tuple(pkg_identification, in config(bool), newest)
+    def __init__(self, path_regexp, in_config: List[str], pkg_index: Optional["PackageIndex"] = None) -> None:
+        """:param pkg_index: names and versions are taken from here for already indexed archives"""
+        # package name: all its files sorted by version, newest last (same version by file name)
+        self._index: Dict[str, List[pkg_identification]] = {}
+        self._in_config: Set[str] = set(in_config)
         for pck_file in glob.glob(path_regexp):
-            pck_ident = get_pkg_identification(pck_file)
-            self._content.append([pck_ident, pck_ident.file_basename in in_config])
-        for item in self._content:
-            item.append(item[0].version == self.get_highest_version(item[0].file_basename))
-        self._content.sort(key=lambda x: f"{x[0].file_basename}___{x[0].version}")
+            pck_ident = get_pkg_identification(pck_file, pkg_index.get_cached(pck_file) if pkg_index else None)
+            self._index.setdefault(pck_ident.file_basename, []).append(pck_ident)
+        self._index = {name: sorted(idents, key=lambda x: (x.sort_key, x.file))
+                       for name, idents in sorted(self._index.items())}
+        self._count_newest()
+
+    def _count_newest(self) -> None:
+        # number of newest files per package, usually 1 (more if same version is there for more archs)
+        self._newest_count: Dict[str, int] = {}
+        for name, idents in self._index.items():
+            count = 1
+            while count < len(idents) and idents[-count - 1].sort_key == idents[-1].sort_key:
+                count += 1
+            self._newest_count[name] = count
     
     def list(self) -> List[str]:
         res = []
-        for item in self._content:
-            res.append(f"{item[0].file_basename:<22}  {item[0].version:<12}  {'newest ver. in repo' if item[2] else ''}")
+        for name, idents in self._index.items():
+            for pos, item in enumerate(idents):
+                newest = pos >= len(idents) - self._newest_count[name]
+                res.append(f"{item.file_basename:<22}  {item.version:<12}  {'newest ver. in repo' if newest else ''}")
         return res
+
+    def get_newest(self, pck_name: str) -> Optional[pkg_identification]:
+        idents = self._index.get(pck_name)
+        return idents[-1] if idents else None
     
-    def get_highest_version(self, pck_name):
-        res = None
-        for item in self._content:
-            if item[0].file_basename != pck_name:
-                continue
-            if res is None or res < item[0].version:
-                res = item[0].version
-        return res
+    def get_highest_version(self, pck_name: str) -> Optional[str]:
+        newest = self.get_newest(pck_name)
+        return newest.version if newest else None
 
     @property
     def new_versions(self) -> List[pkg_identification]:
-        return [item[0] for item in self._content if item[2] is True]
+        return [item for name, idents in self._index.items() for item in idents[-self._newest_count[name]:]]
     
+    @property
+    def db_versions(self) -> List[pkg_identification]:
+        """
+        One archive per package for repo db, the same as get_newest: of the newest version there can
+        be more archives (x86_64 and any), the one with the highest file name is taken
+        """
+        return [idents[-1] for idents in self._index.values()]
+
     @property
     def old_versions(self) -> List[pkg_identification]:
-        return [item[0] for item in self._content if not item[2]]
+        return [item for name, idents in self._index.items() for item in idents[:-self._newest_count[name]]]
 
     @property
     def new_but_not_in_config(self) -> List[pkg_identification]:
-        return [item[0] for item in self._content if not item[1] and item[2]]
+        return [item for name, idents in self._index.items() if name not in self._in_config
+                for item in idents[-self._newest_count[name]:]]
     
     @property
     def list_pck_names(self) -> Set[str]:
-        return set([item[0].file_basename for item in self._content])
+        return set(self._index)
+
+    def __contains__(self, pck_name: str) -> bool:
+        return pck_name in self._index
+
+    def get_versions(self, pck_name: str) -> List[List[pkg_identification]]:
+        """Files of package grouped by version, oldest version first"""
+        res: List[List[pkg_identification]] = []
+        for ident in self._index.get(pck_name, []):
+            if res and res[-1][0].sort_key == ident.sort_key:
+                res[-1].append(ident)
+            else:
+                res.append([ident])
+        return res
 
-class LogType(Enum):
-    NORMAL = 0
-    BOLD = 1
-    WARNING = 2
-    ERROR = 3
-    CUSTOM = 4
-    HIGHLIGHT = 5
+    def remove(self, files: List[str]) -> None:
+        """Forgets given files, they are about to be deleted"""
+        files_set = set(files)
+        self._index = {name: [item for item in idents if item.file not in files_set]
+                       for name, idents in self._index.items()}
+        self._index = {name: idents for name, idents in self._index.items() if idents}
+        self._count_newest()
+
+def get_default_cachedir() -> str:
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "repokeeper")
+
+
+def get_status_socket(options: Dict[str, str]) -> str:
+    return get_path_option(options, "status_socket",
+                           os.path.join(get_path_option(options, "cachedir", get_default_cachedir()), "repokeeper.sock"))
 
 
 def get_version():
@@ -110,11 +168,26 @@ def get_args():
     parser.add_argument("-n", "--nodeps", action="store_true", default=False, help="Disable checking and building dependencies from AUR")
     parser.add_argument("--dryrun", action="store_true", default=False, help="Do not build nor recreate repo index")
     parser.add_argument("-l", "--list", action="store_true", default=False, help="Print content of repo and exit")
-
-
-    args = parser.parse_args()
-
-    return args.version, args.dryrun, args.nodeps, args.list
+    parser.add_argument("--retry-failed", action="store_true", default=False,
+                        help="Build also packages that failed before in the same version")
+    parser.add_argument("--offline", action="store_true", default=False,
+                        help="Use only cached AUR data, no network access (with --dryrun or --list)")
+    parser.add_argument("--report", metavar="PATH", default=None,
+                        help="Write JSON report with timings of run phases and counters into PATH")
+    parser.add_argument("-c", "--config", metavar="PATH", default="/etc/repokeeper.conf", help="Configuration file")
+    parser.add_argument("--coordinator", metavar="[HOST:]PORT", default=None,
+                        help="Build packages on workers connecting to this address instead of locally")
+    parser.add_argument("--worker", metavar="HOST[:PORT]", default=None,
+                        help="Build packages sent by coordinator at this address, then quit")
+    parser.add_argument("--slots", type=int, default=None,
+                        help="How many packages worker builds at once (per build_jobs option by default)")
+    parser.add_argument("--profile", metavar="NAME", default=None,
+                        help="Build profile ([profile:NAME] in config) for packages not listed in any profile")
+    parser.add_argument("--daemon", action="store_true", default=False,
+                        help="Keep running, check AUR per poll priorities of packages and build what changed")
+    parser.add_argument("--status", action="store_true", default=False, help="Print status of running daemon and exit")
+
+    return parser.parse_args()
 
 
 def signal_handler(signal, frame):
@@ -124,61 +197,6 @@ def signal_handler(signal, frame):
 signal.signal(signal.SIGINT, signal_handler)
 
 
-def parse_version(vers_str: str) -> version.Version:
-    try:
-        return version.Version(vers_str)
-    except:
-        raise ValueError("Failed to parse version from string: '{}'".format(vers_str))
-
-
-class Logger(object):
-    # Could be singleton once
-    _BOLD = "\033[1m"
-    _WARNING = "\033[91m"
-    _HIGHLIGHT = "\033[92m"
-    _UNCOLOR = "\033[0m"
-    __logfile = "/tmp/repokeeper.log"
-
-    @property
-    def logfile(self):
-        return Logger.__logfile
-
-    def log(self, logtype: LogType = LogType.NORMAL, console_txt: Optional[str] = None, log_txt: Optional[str] = None,
-            err_code: int = -1, log_eof: str = "\n"):
-
-        if logtype == LogType.WARNING:
-            open_col = self._WARNING
-        elif logtype == LogType.ERROR:
-            open_col = Logger._WARNING + Logger._BOLD
-        elif logtype == LogType.HIGHLIGHT:
-            open_col = Logger._HIGHLIGHT
-        elif logtype == LogType.BOLD:
-            open_col = Logger._BOLD
-        else:
-            open_col = ""
-
-        if isinstance(console_txt, str):
-            print(open_col + console_txt + Logger._UNCOLOR)
-        if isinstance(log_txt, str):
-            with open(Logger.__logfile, 'a', 1) as lf:
-                lf.write(log_txt + log_eof)
-        if err_code >= 0:
-            sys.exit(err_code)
-
-
-
-
-
-def empty_dir(directory: str) -> None:  # recursivelly deletes content of given dir
-    lo = Logger()
-    cmd = "rm -rf " + directory + "/*"
-    if subprocess.call(cmd, shell=True) > 0:
-        lo.log(LogType.WARNING, console_txt="Failed to clean up directory {}".format(directory))
-        lo.log(LogType.WARNING, console_txt="HINT: try manually: rm -rf " + directory + "*")
-        lo.log(LogType.WARNING, console_txt="Re-run when problem is resolved...")
-        lo.log(LogType.ERROR, log_txt="Failed to clean up the directory: " + directory + ", quitting...", err_code=1)
-
-
 def get_version_from_basename(filename: str) -> str:
     try:
         return str(filename.split("-")[-3] + "." + filename.split("-")[-2])
@@ -192,33 +210,197 @@ def get_basename_from_filename(fullname: str) -> str:
     return str(os.path.basename('-'.join(fullname.split("-")[:-3])))
 
 
-def get_pkg_identification(filename: str) -> pkg_identification:
+def get_pkg_identification(filename: str, index_info: Optional[Dict] = None) -> pkg_identification:
+    if index_info is not None:
+        full_version = index_info["pkginfo"]["pkgver"][0]
+        return pkg_identification(filename, index_info["pkginfo"]["pkgname"][0],
+                                  '.'.join(full_version.rsplit("-", 1)), full_version)
     file_basename = str(os.path.basename('-'.join(filename.split("-")[:-3])))
     ver = get_version_from_basename(filename)
-    return pkg_identification(filename, file_basename, ver)
+    full_version = '-'.join(filename.split("-")[-3:-1])
+    return pkg_identification(filename, file_basename, ver, full_version)
+
+
+def split_rpc_args(pcks: List[str], base_url: str = AUR_RPC_URL, max_len: int = AUR_RPC_MAX_URL_LEN) -> List[List[str]]:
+    """
+    Splits package names into as few chunks as possible, so that multi-info url of each chunk is under max_len
+    """
+    from urllib.parse import quote
+    chunks: List[List[str]] = []
+    url_len = len(base_url)
+    for pck in pcks:
+        arg_len = len("&arg[]=" + quote(pck, safe=''))
+        if not chunks or url_len + arg_len > max_len:
+            chunks.append([])
+            url_len = len(base_url)
+        chunks[-1].append(pck)
+        url_len += arg_len
+    return chunks
+
+
+def get_rpc_url(pcks: List[str], base_url: str = AUR_RPC_URL) -> str:
+    from urllib.parse import quote
+    return base_url + "".join("&arg[]=" + quote(pck, safe='') for pck in pcks)
 
 
 class Repo_Base(object):
 
-    def __init__(self, skip_dependencies: bool = False):
+    def __init__(self, skip_dependencies: bool = False, offline: bool = False, retry_failed: bool = False,
+                 read_only: bool = False, conffile: str = "/etc/repokeeper.conf"):
+        """:param read_only: repo dir is only listed (--list) or not used (--worker), archive index is not opened"""
         # DEFINING VARIABLES
         # defaults:
-        self.conffileloc = "/etc/repokeeper.conf"
+        self.conffileloc = conffile
         self.package_regexp = "*pkg.tar.zst"
         self.lo = Logger()
         self.lo.log(console_txt="* Parsing configuration file...")
         #self.latest_in_repo: Dict[str, pkg_identification] = {}
         self.skip_dependencies = skip_dependencies
+        self.offline = offline
+        self.retry_failed = retry_failed
+        self.report = RunReport()
         try:
-            self.pkgs_conf, self.repodir, self.builddir, self.reponame = get_conf_content(self.conffileloc, "local-rk")
+            self.load_config()
         except Exception as e:
             self.lo.log(LogType.ERROR, console_txt=str(e), log_txt=str(e), err_code=10)
         self.repo_content = None
+        self.sync_index: Optional["SyncDbIndex"] = None
+        self.aur_cache: Optional["AurCache"] = None
+        self.aur_dump: Optional["AurDumpIndex"] = None
+        # after failed download of AUR metadata dump it is not tried again until then (monotonic time)
+        self.aur_dump_retry_at = 0.0
+        self.pkg_index: Optional["PackageIndex"] = None
+        self._http: Optional["HttpClient"] = None
+        self._aur_executor: Optional["ThreadPoolExecutor"] = None
+        self._lazy_lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.repo_lock = threading.Lock()
+        # pacman holds lock of its db while running, so concurrent builds take turns in installing
+        self.pacman_lock = threading.Lock()
+        self.clone_locks: Dict[str, threading.Lock] = {}
+        self.failure_ledger = FailureLedger(os.path.join(self.cachedir, "failed_builds.json"),
+                                            self.failed_retry_hours * 3600, self.failed_retry_max_hours * 3600)
+        self.build_started = 0
+        # number of builds running at once, for MAKEFLAGS of build profiles
+        self.build_concurrency = 1
+        self.profile_stats = ProfileStats(os.path.join(self.cachedir, "build_profiles.json"))
+        # makepkg output is shown on console only when packages are built one at a time
+        self.echo_build_output = True
+        # with coordinator packages are built by remote workers
+        self.coordinator = None
+        # daemon: repo db update failed, it is tried again in next round
+        self.repo_db_pending = False
+        # latest versions seen in AUR
+        self.aur_versions: Dict[str, str] = {}
+        # names left out of the last AUR query because aur_request_budget was used up
+        self.aur_unchecked: Set[str] = set()
+        # dependencies per AUR (fields as in .PKGINFO), for packages missing in repo when pruning orphans
+        self.aur_dependencies: Dict[str, Dict[str, List[str]]] = {}
+        if self.db_writer == "native" and not read_only:
+            try:
+                from repokeeper.repodb import PackageIndex
+                self.pkg_index = PackageIndex(os.path.join(self.cachedir, "pkg_index.sqlite"))
+            except Exception as e:
+                text = 'Archive index not available, falling back to repo-add: {}'.format(str(e))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
         self.parse_repo()
 
+    def load_config(self) -> None:
+        """
+        Reads config file and options, raises on invalid content. Attributes are set only once
+        everything is read and checked, so on failure the current config stays as it is
+        """
+        from types import SimpleNamespace
+        c = SimpleNamespace()
+        with self.report.phase("config"):
+            c.pkgs_conf, c.repodir, c.builddir, c.reponame = get_conf_content(self.conffileloc, "local-rk")
+            c.options = get_conf_options(self.conffileloc)
+        c.cachedir = get_path_option(c.options, "cachedir", get_default_cachedir())
+        # number of AUR queries running at once and max number of AUR queries per run (0 = unlimited)
+        c.aur_concurrency = max(1, get_option(c.options, "aur_concurrency", 4))
+        c.aur_requests_left = get_option(c.options, "aur_request_budget", 0) or None
+        # requests per second (0 = unlimited) and how many of them can go at once
+        c.aur_limiter = RateLimiter(get_option(c.options, "aur_rate", 2.0), get_option(c.options, "aur_burst", 10))
+        c.aur_url = get_option(c.options, "aur_url", AUR_URL).rstrip("/")
+        c.http_timeout = get_option(c.options, "http_timeout", 30.0)
+        # for how long (seconds) cached AUR info is considered up to date
+        c.aur_cache_ttl = get_option(c.options, "aur_cache_ttl", 900)
+        c.aur_cache_negative_ttl = get_option(c.options, "aur_cache_negative_ttl", 3600)
+        c.aur_cache_size = get_option(c.options, "aur_cache_size", 10000)
+        # rpc (AUR is queried for packages in question) or dump (AUR metadata dump is downloaded, at most once
+        # per aur_cache_ttl, and packages are looked up in its local index)
+        c.metadata_source = get_option(c.options, "metadata_source", "rpc")
+        if c.metadata_source not in ("rpc", "dump"):
+            raise ValueError("Invalid value for option metadata_source: '{}'".format(c.metadata_source))
+        # native (written by repokeeper from its archive index) or repo-add
+        c.db_writer = get_option(c.options, "db_writer", "native")
+        # max number of concurrent builds and memory (MB) each of them might need
+        c.build_jobs = get_option(c.options, "build_jobs", 1)
+        c.build_memory_per_job = get_option(c.options, "build_memory_per_job", 2048)
+        # missing dependencies are installed before makepkg runs, freshly built ones from this repo (needs sudo)
+        c.syncdeps = get_option(c.options, "syncdeps", False)
+        # git (persistent AUR git clones, fetched incrementally) or snapshot (tarball downloaded every build)
+        c.source_cache = get_option(c.options, "source_cache", "git")
+        # makepkg's SRCDEST, so upstream sources are downloaded only once across runs
+        c.srcdest = get_path_option(c.options, "srcdest", os.path.join(c.cachedir, "sources"))
+        # failed build of unchanged package is retried after this many hours, doubled with every failure
+        c.failed_retry_hours = get_option(c.options, "failed_retry_hours", 6.0)
+        c.failed_retry_max_hours = get_option(c.options, "failed_retry_max_hours", 168.0)
+        # log file is rotated when bigger than log_max_size MB, output of every makepkg goes into build_logdir
+        log_level = get_option(c.options, "log_level", "info")
+        if log_level not in LOG_LEVELS:
+            raise ValueError("Invalid value for option log_level: '{}'".format(log_level))
+        log_config = (get_path_option(c.options, "logfile", self.lo.logfile), log_level,
+                      int(get_option(c.options, "log_max_size", 10.0) * 1024 * 1024),
+                      get_option(c.options, "log_backups", 3), get_option(c.options, "log_format", "text") == "json")
+        c.build_logdir = get_path_option(c.options, "build_logdir", os.path.join(c.cachedir, "build-logs"))
+        # retention: number of newest versions kept per package (0 = all), max age of older versions in
+        # days (0 = any) and removal of packages neither in config nor needed by packages that are
+        c.keep_versions = get_option(c.options, "keep_versions", 0)
+        c.keep_days = get_option(c.options, "keep_days", 0.0)
+        c.prune_orphans = get_option(c.options, "prune_orphans", False)
+        # distributed builds: seconds coordinator waits for a worker, how many times job of lost
+        # worker is retried, seconds between worker's heartbeats
+        c.worker_timeout = get_option(c.options, "worker_timeout", 300.0)
+        c.worker_retries = get_option(c.options, "worker_retries", 2)
+        c.worker_heartbeat = get_option(c.options, "worker_heartbeat", 10.0)
+        # workers have to know it to be accepted by coordinator
+        c.worker_secret = get_option(c.options, "worker_secret", "")
+        # daemon: seconds between AUR checks of packages with high/normal/low poll priority and its status socket
+        c.poll_intervals = {"high": get_option(c.options, "poll_interval_high", 900.0),
+                            "normal": get_option(c.options, "poll_interval", 3600.0),
+                            "low": get_option(c.options, "poll_interval_low", 86400.0)}
+        c.status_socket = get_status_socket(c.options)
+        # build profiles: [profile:<name>] sections, build_profile is used for packages not listed in any of them
+        c.build_profiles = {name: BuildProfile.from_options(name, options)
+                            for name, options in get_conf_profiles(self.conffileloc).items()}
+        c.build_profile = get_option(c.options, "build_profile", "")
+        if c.build_profile and c.build_profile not in c.build_profiles:
+            raise ValueError("Unknown build profile: {}".format(c.build_profile))
+        vars(self).update(vars(c))
+        self.lo.configure(*log_config)
+
+    @property
+    def http(self) -> "HttpClient":
+        """HTTP client for AUR, created on first use"""
+        with self._lazy_lock:
+            if self._http is None:
+                from repokeeper.http_client import HttpClient
+                self._http = HttpClient(self.aur_limiter, self.http_timeout, AUR_RETRIES)
+            return self._http
+
+    @property
+    def aur_executor(self) -> "ThreadPoolExecutor":
+        """Created on first use and kept for whole run, so its threads keep their connections to AUR alive"""
+        with self._lazy_lock:
+            if self._aur_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._aur_executor = ThreadPoolExecutor(max_workers=self.aur_concurrency)
+            return self._aur_executor
+
     def parse_repo(self):
-        self.repo_content = RepoContent(self.repodir + "/" + self.package_regexp  ,self.pkgs_conf)
-        time.sleep(1)
+        with self.report.phase("parse_repo"):
+            self.repo_content = RepoContent(self.repodir + "/" + self.package_regexp  ,self.pkgs_conf, self.pkg_index)
 
     def print_repo_summary(self):
         # printing what is in repository with latest versions
@@ -232,189 +414,715 @@ class Repo_Base(object):
                         console_txt="* View the log file {} for a list of outdated packages [{}]".format(self.lo.logfile,
                         len(self.repo_content.old_versions)))
 
-    def fetch_pck_info_from_aur_web(self, pck: str, silent_failure: bool = False) -> Optional[Dict]:
-        url = f"https://aur.archlinux.org/rpc/?v=5&type=info&arg={pck}"
-        response = urlopen(url)
-        html = response.read()
-        data = json.loads(html.decode('utf-8'))
+    def load_aur_cache(self) -> Optional["AurCache"]:
+        if self.aur_cache is None:
+            try:
+                from repokeeper.aur_cache import AurCache
+                self.aur_cache = AurCache(os.path.join(self.cachedir, "aur_cache.sqlite"), self.aur_cache_ttl,
+                                          self.aur_cache_negative_ttl, self.aur_cache_size)
+            except Exception as e:
+                text = ' AUR cache not available: {}'.format(str(e))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+        return self.aur_cache
 
-        if "error" in data:
-            text = ' {:<22s} !  Error: {}'.format(pck, data["error"])
-            self.lo.log(LogType.NORMAL, console_txt=text, log_txt=text)
+    def load_aur_dump(self) -> Optional["AurDumpIndex"]:
+        """
+        Index of AUR metadata dump, the dump is downloaded again when older than aur_cache_ttl (and
+        changed). If the download fails, the dump indexed before stays in use; without one None is
+        returned and AUR RPC is used. The download is tried again after aur_cache_ttl
+        """
+        retry_later = time.monotonic() < self.aur_dump_retry_at
+        try:
+            from repokeeper.aur_dump import DUMP_PATH, AurDumpIndex, update_dump_index
+            with self.report.phase("aur_dump"):
+                if self.aur_dump is None:
+                    self.aur_dump = AurDumpIndex(os.path.join(self.cachedir, "aur_dump.sqlite"))
+                try:
+                    if update_dump_index(self.aur_dump, self.http, self.aur_url + DUMP_PATH,
+                                         os.path.join(self.cachedir, "aur-dump"), self.aur_cache_ttl,
+                                         self.offline or retry_later):
+                        text = " AUR metadata dump indexed, {} packages".format(len(self.aur_dump))
+                        self.lo.log(console_txt=text, log_txt=text)
+                except Exception as e:
+                    if not len(self.aur_dump):
+                        raise
+                    if not retry_later:
+                        self.aur_dump_retry_at = time.monotonic() + self.aur_cache_ttl
+                        text = ' AUR metadata dump not updated ({}), the one indexed before is used'.format(str(e))
+                        self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+            return self.aur_dump
+        except Exception as e:
+            if not retry_later:
+                self.aur_dump_retry_at = time.monotonic() + self.aur_cache_ttl
+                text = ' AUR metadata dump not available ({}), querying AUR RPC'.format(str(e))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
             return None
 
-        if data['type'] == 'error' or data['resultcount'] == 0:
-            #if not silent_failure:
-            text = ' {:<22s} !  wrong name/not found in AUR'.format(pck)
-            self.lo.log(LogType.NORMAL, console_txt=None if silent_failure else text, log_txt=text)
+    def fetch_pcks_info_from_aur_web(self, pcks: List[str]) -> Dict[str, Dict]:
+        """
+        Queries AUR for many packages at once, names are packed into multi-info requests
+        that run concurrently (up to aur_concurrency of them). Answers are served from
+        the AUR cache when fresh enough (or always in offline mode). With metadata_source=dump
+        packages are looked up in local index of AUR metadata dump instead.
+        :param pcks: names of packages to look for
+        :return: Dictionary of package_name: aur_info, names not found in AUR are missing
+        """
+        names = list(dict.fromkeys(pcks))
+        self.aur_unchecked = set()
+        if self.metadata_source == "dump":
+            aur_dump = self.load_aur_dump()
+            if aur_dump is not None:
+                self.report.incr("aur_dump_lookups", len(names))
+                return aur_dump.get_many(names)
+        aur_cache = self.load_aur_cache()
+        cached: Dict[str, Optional[Dict]] = {}
+        if aur_cache is not None:
+            cached, names = aur_cache.get_many(names, allow_expired=self.offline)
+        found: Dict[str, Dict] = {name: info for name, info in cached.items() if info is not None}
+        if self.offline or not names:
+            return found
+
+        chunks = split_rpc_args(names, self.aur_url + AUR_RPC_PATH)
+        if self.aur_requests_left is not None:
+            if len(chunks) > self.aur_requests_left:
+                text = ' AUR request budget exhausted, {} queries skipped'.format(len(chunks) - self.aur_requests_left)
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+                self.aur_unchecked = set(name for chunk in chunks[self.aur_requests_left:] for name in chunk)
+                chunks = chunks[:self.aur_requests_left]
+            self.aur_requests_left -= len(chunks)
+        self.report.incr("aur_queries", len(chunks))
+
+        fetched: Dict[str, Optional[Dict]] = {}
+        for chunk, data in zip(chunks, self.aur_executor.map(self._query_aur_rpc, chunks)):
+            if data is None:
+                continue
+            results = data.get('results', [])
+            if not isinstance(results, list):
+                results = [results, ]
+            # names missing in results of successful query are not in AUR
+            fetched.update(dict.fromkeys(chunk))
+            for result in results:
+                fetched[result['Name']] = result
+
+        if aur_cache is not None:
+            aur_cache.put_many(fetched)
+        found.update({name: info for name, info in fetched.items() if info is not None})
+        return found
+
+    def _query_aur_rpc(self, pcks: List[str]) -> Optional[Dict]:
+        try:
+            data = self.http.get_json(get_rpc_url(pcks, self.aur_url + AUR_RPC_PATH))
+        except Exception as e:
+            # other chunks can still succeed, names from this one are reported as not found
+            text = ' AUR query failed: {}'.format(str(e))
+            self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
             return None
 
-        if not isinstance(data['results'], list):
-            data['results'] = [data['results'], ]
-
-        if len(data['results']) > 1:
-            text = pck + " more then one results for package, skipping.... "
+        if "error" in data or data.get('type') == 'error':
+            text = ' AUR query failed, Error: {}'.format(data.get("error"))
             self.lo.log(LogType.NORMAL, console_txt=text, log_txt=text)
             return None
+        return data
+
+    def fetch_pck_info_from_aur_web(self, pck: str, silent_failure: bool = False) -> Optional[Dict]:
+        aur_web_info = self.fetch_pcks_info_from_aur_web([pck]).get(pck)
+        if aur_web_info is None:
+            self.log_not_found(pck, silent_failure)
+        return aur_web_info
 
-        return data['results'][0]
+    def log_not_found(self, pck: str, silent_failure: bool = False) -> None:
+        if pck in self.aur_unchecked:
+            text = ' {:<22s} ?  not checked, AUR request budget exhausted'.format(pck)
+        else:
+            text = ' {:<22s} !  wrong name/not found in AUR'.format(pck)
+        self.lo.log(LogType.NORMAL, console_txt=None if silent_failure else text, log_txt=text)
 
-    def check_single_package(self, pck_name: str, silent_failure: bool = False) -> Optional[PackageToBuild]:
-        aur_web_info = self.fetch_pck_info_from_aur_web(pck_name, silent_failure)
+    def check_single_package(self, pck_name: str, silent_failure: bool = False,
+                             aur_infos: Optional[Dict[str, Dict]] = None) -> Optional[PackageToBuild]:
+        """
+        :param aur_infos: result of fetch_pcks_info_from_aur_web, AUR is queried for this package alone if None
+        """
+        if aur_infos is None:
+            aur_web_info = self.fetch_pck_info_from_aur_web(pck_name, silent_failure)
+        else:
+            aur_web_info = aur_infos.get(pck_name)
+            if aur_web_info is None:
+                self.log_not_found(pck_name, silent_failure)
         if aur_web_info is None:
             return
         
-        pck_to_build = PackageToBuild(pck_name, str("http://aur.archlinux.org" + aur_web_info['URLPath']),
-        aur_web_info.get("Depends",[]), aur_web_info.get("MakeDepends",[]))
+        pck_to_build = PackageToBuild(pck_name, str(self.aur_url + aur_web_info['URLPath']),
+        aur_web_info.get("Depends",[]), aur_web_info.get("MakeDepends",[]),
+        aur_web_info.get("PackageBase"), aur_web_info.get("Version"))
 
-        aurversion = str(aur_web_info['Version'].replace("-", "."))
+        aurversion = aur_web_info['Version']
+        newest = self.repo_content.get_newest(pck_name)
 
-        if not pck_name in self.repo_content.list_pck_names:
-            log_txt = ' {:<22s} + Building version {:}'.format(pck_name, aur_web_info['Version'])
+        if newest is None:
+            log_txt = ' {:<22s} + Building version {:}'.format(pck_name, aurversion)
             self.lo.log(console_txt=log_txt, log_txt=log_txt)
             return pck_to_build
 
         else:
-            curversion = self.repo_content.get_highest_version(pck_name)
-            try:
-                curversion_obj = parse_version(curversion)
-                aurversion_obj = parse_version(aurversion)
-            except Exception as e:
-                text = ' ERROR with {}: {}'.format(pck_name, str(e))
-                return
-            if aurversion_obj == curversion_obj:
-                text = ' {:<22s} - {:s} In latest version, no need to update'.format(pck_name, aur_web_info['Version'])
+            cmp = vercmp(aurversion, newest.full_version)
+            if cmp == 0:
+                text = ' {:<22s} - {:s} In latest version, no need to update'.format(pck_name, aurversion)
                 self.lo.log(LogType.NORMAL, console_txt=text, log_txt=text)
 
-            elif aurversion_obj < curversion_obj:
-                self.lo.log(console_txt=' {:<22s} - {:s} Local package newer({:s}), doing nothing'.format(pck_name,
-                                                                                                            aur_web_info[
-                                                                                                                'Version'],
-                                                                                                            aurversion))
+            elif cmp < 0:
+                self.lo.log(console_txt=' {:<22s} - {:s} Local package newer({:s}), doing nothing'.format(
+                    pck_name, aurversion, newest.full_version))
             else:
-                log_txt = ' {:<22s} + updating {:s} -> {:s}'.format(pck_name, curversion,
-                                                                                    aur_web_info['Version'])
+                log_txt = ' {:<22s} + updating {:s} -> {:s}'.format(pck_name, newest.full_version, aurversion)
                 self.lo.log(console_txt=log_txt, log_txt=log_txt)
                 return pck_to_build
-            
 
-    def check_aur_web(self) -> List[PackageToBuild]:
+    def load_sync_index(self) -> "SyncDbIndex":
+        """Index of packages from official repos, built once per run (and cached on disk)"""
+        if self.sync_index is None:
+            from repokeeper.syncdb import SyncDbIndex
+            self.sync_index = SyncDbIndex.load(os.path.join(self.cachedir, "syncdb_index.json"),
+                                               exclude=[self.reponame])
+        return self.sync_index
+
+    def filter_aur_dependencies(self, dependencies: List[str]) -> Set[str]:
+        """Strips version constraints and drops dependencies satisfied by official repos"""
+        from repokeeper.syncdb import strip_version_constraint
+        sync_index = self.load_sync_index()
+        return set(dep for dep in map(strip_version_constraint, dependencies) if dep and dep not in sync_index)
+
+    def check_aur_web(self, pcks: Optional[List[str]] = None) -> List[PackageToBuild]:
         """
         Returns list of PackageToBuild, ones that are explicitelly listed in config and dependencies
         if not disables by CLI switch
+        :param pcks: packages from config to check (daemon checks those due), all of them if None
         """
+        pcks = self.pkgs_conf if pcks is None else pcks
         pkgs_tobuild: List[PackageToBuild] = []  # final dictionary (name:url) of packages to be updated
-        self.lo.log(LogType.BOLD, console_txt="\n* Checking AUR for latest versions...")
+        self.lo.log(LogType.BOLD, console_txt="\n* Checking AUR for latest versions{}...".format(
+            " (offline, cached data only)" if self.offline else ""))
         self.lo.log(console_txt=" ")
         dependencies: Set[str] = set()  # both normal and build ones
-        time.sleep(1)
-
-        for pck in self.pkgs_conf:
-            to_build: Optional[PackageToBuild] = self.check_single_package(pck)
-            if to_build:
-                pkgs_tobuild.append(to_build)
-                dependencies.update(set(to_build.dependencies))
-                dependencies.update(set(to_build.build_dependencies))
-            time.sleep(0.5)
-        
-        if not self.skip_dependencies and dependencies:
-            log_txt = f"Querying AUR for normal and build dependencies: {', '.join(dependencies)}"
-            self.lo.log(console_txt="\n "+log_txt, log_txt="\n" + log_txt)
-            checked_pcks: Set[str] = set()
-
-            while dependencies:
-                dependency: str = dependencies.pop()
-                if dependency in self.pkgs_conf or dependency in checked_pcks:
-                    continue
-                checked_pcks.add(dependency)
-                to_build = self.check_single_package(dependency, True)  # Quietly ignoring if not in AUR
+
+        with self.report.phase("aur_check"):
+            aur_infos = self.fetch_pcks_info_from_aur_web(pcks)
+            self.aur_versions.update({name: info["Version"] for name, info in aur_infos.items()})
+            self.aur_dependencies.update({name: {"depend": info.get("Depends", []),
+                                                 "makedepend": info.get("MakeDepends", []),
+                                                 "checkdepend": info.get("CheckDepends", []),
+                                                 "optdepend": info.get("OptDepends", [])}
+                                          for name, info in aur_infos.items()})
+            for pck in pcks:
+                to_build: Optional[PackageToBuild] = self.check_single_package(pck, aur_infos=aur_infos)
                 if to_build:
                     pkgs_tobuild.append(to_build)
-                    for dependency in to_build.dependencies + to_build.build_dependencies:
-                        if dependency not in checked_pcks:
-                            dependencies.add(dependency)
+                    dependencies.update(set(to_build.dependencies))
+                    dependencies.update(set(to_build.build_dependencies))
+        
+        if self.skip_dependencies:
+            return pkgs_tobuild
 
+        with self.report.phase("dependency_resolution"):
+            self.resolve_dependencies(dependencies, pkgs_tobuild)
         return pkgs_tobuild
 
-    def get_compiledir(self, package: str) -> str:
-        # Looking for PKGBUILD
-        for root, dirs, files in os.walk(self.builddir):
-            for ldir in dirs:
-                for root2, dirs2, files2 in os.walk(os.path.join(self.builddir, ldir)):
-                    for lfile in files2:
-                        if lfile == "PKGBUILD":
-                            return os.path.join(root, ldir)
-        raise ValueError("No PKGBUILD within {} folder".format(self.builddir))
-
-    def building(self, pkgs: List[PackageToBuild]) -> List[FailedPackage]:
+    def resolve_dependencies(self, dependencies: Set[str], pkgs_tobuild: List[PackageToBuild]) -> None:
+        """Adds AUR (build) dependencies needing (re)build to pkgs_tobuild, level by level"""
+        dependencies = self.filter_aur_dependencies(list(dependencies))
+        if dependencies:
+            log_txt = f"Querying AUR for normal and build dependencies: {', '.join(dependencies)}"
+            self.lo.log(console_txt="\n "+log_txt, log_txt="\n" + log_txt)
+            checked_pcks: Set[str] = set(self.pkgs_conf)
+
+            # whole level of not yet seen dependencies is queried at once
+            frontier: List[str] = sorted(dependencies - checked_pcks)
+            while frontier:
+                checked_pcks.update(frontier)
+                aur_infos = self.fetch_pcks_info_from_aur_web(frontier)
+                next_level: Set[str] = set()
+                for dependency in frontier:
+                    to_build = self.check_single_package(dependency, True, aur_infos=aur_infos)  # Quietly ignoring if not in AUR
+                    if to_build:
+                        pkgs_tobuild.append(to_build)
+                        next_level.update(self.filter_aur_dependencies(to_build.dependencies + to_build.build_dependencies))
+                frontier = sorted(next_level - checked_pcks)
+
+    def get_compiledir(self, package: str, workdir: Optional[str] = None, pkgbase: Optional[str] = None) -> str:
         """
-        Actual building the application and copying package files into repo directory
-        :param pkgs: Dictionary of package_name: aur_url_of_MAKEPKG
-        :return: List of failing packages, can be empty
+        Returns directory with PKGBUILD of package. Snapshot layout (<workdir>/<pkgbase>/PKGBUILD) is tried
+        first, then subdirectories of workdir are scanned (one level only) for PKGBUILD of given package
+        :param workdir: package's build directory, <builddir>/<package> by default
         """
+        workdir = workdir or os.path.join(self.builddir, package)
+        for name in (pkgbase, package):
+            if name and os.path.isfile(os.path.join(workdir, name, "PKGBUILD")):
+                return os.path.join(workdir, name)
+
+        candidates = [workdir] if os.path.isfile(os.path.join(workdir, "PKGBUILD")) else []
+        if os.path.isdir(workdir):
+            candidates += sorted(entry.path for entry in os.scandir(workdir)
+                                 if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "PKGBUILD")))
+        if len(candidates) > 1:
+            # leftovers of other builds, the one defining the package is wanted
+            pkgname_re = re.compile(r"^\s*pkgname=\(?[^)\n]*(?<![\w@.+-]){}(?![\w@.+-])".format(re.escape(package)), re.M)
+            for candidate in candidates:
+                with open(os.path.join(candidate, "PKGBUILD"), errors="replace") as pb:
+                    if pkgname_re.search(pb.read()):
+                        return candidate
+        if candidates:
+            return candidates[0]
+        raise ValueError("No PKGBUILD for {} within {} folder".format(package, workdir))
+
+    def fetch_sources(self, pkg_to_build: PackageToBuild, workdir: str) -> Optional[str]:
+        """
+        Puts PKGBUILD & co. of package into workdir (as <workdir>/<pkgbase>/), exported from
+        cached AUR git clone, that is only fetched incrementally, or from snapshot tarball
+        :return: directory with PKGBUILD, None if it was not found
+        """
+        from repokeeper.snapshot import extract_snapshot
+        if self.source_cache == "git":
+            clonedir = os.path.join(self.cachedir, "aur-git", pkg_to_build.pkgbase)
+            with self.build_lock:
+                lock = self.clone_locks.setdefault(pkg_to_build.pkgbase, threading.Lock())
+            try:
+                with lock:
+                    if os.path.isdir(os.path.join(clonedir, ".git")):
+                        cmd = ["git", "-C", clonedir, "fetch", "--quiet", "origin"]
+                    else:
+                        cmd = ["git", "clone", "--quiet", "{}/{}.git".format(self.aur_url, pkg_to_build.pkgbase), clonedir]
+                    self.aur_limiter.acquire()
+                    if subprocess.call(cmd) != 0:
+                        raise ValueError("{} failed".format(" ".join(cmd[:4])))
+                    archive = subprocess.Popen(["git", "-C", clonedir, "archive", "--format=tar",
+                                                "--prefix=" + pkg_to_build.pkgbase + "/", "origin/HEAD"],
+                                               stdout=subprocess.PIPE)
+                    try:
+                        compiledir = extract_snapshot(archive.stdout, workdir, pkg_to_build.pkgbase)
+                    finally:
+                        archive.stdout.close()
+                        rc = archive.wait()
+                    if rc != 0:
+                        raise ValueError("git archive failed")
+                return compiledir
+            except Exception as e:
+                shutil.rmtree(clonedir, ignore_errors=True)  # cloned again next time
+                text = " Using AUR git clone of {} failed ({}), downloading snapshot".format(pkg_to_build.pkgbase, str(e))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+
+        # snapshot is extracted as it is downloaded, and downloaded again only if it changed since last download
+        with self.http.download_stream(pkg_to_build.url, os.path.join(self.cachedir, "snapshots")) as stream:
+            return extract_snapshot(stream, workdir, pkg_to_build.pkgbase)
+
+    def get_build_profile(self, pck_name: str) -> Optional[BuildProfile]:
+        """Profile listing the package, the run's one (build_profile option or --profile) otherwise"""
+        for profile in self.build_profiles.values():
+            if pck_name in profile.packages:
+                return profile
+        return self.build_profiles.get(self.build_profile)
+
+    def build_package(self, pkg_to_build: PackageToBuild, count: int, target_dir: Optional[str] = None) -> Optional[str]:
+        """
+        Builds single package in its own subdirectory of builddir and copies package files into repo directory
+        :param count: number of packages to be built in this run
+        :param target_dir: where package files go instead of repo directory
+        :return: None on success, reason of failure otherwise
+        """
+        with self.build_lock:
+            self.build_started += 1
+            text_body = pkg_to_build.name + " (" + str(self.build_started) + "/" + str(
+                count) + ") - " + time.strftime("%H:%M:%S", time.localtime())
+        self.lo.log(console_txt="\n  * * BUILDING: " + text_body, log_txt="\n Building: " + text_body)
+        workdir = os.path.join(self.builddir, pkg_to_build.name)
 
-        failed_packages: List[FailedPackage] = []
-
-        for position, pkg_to_build in enumerate(pkgs):
-            text_body = pkg_to_build.name + " (" + str(position + 1) + "/" + str(
-                len(pkgs)) + ") - " + time.strftime("%H:%M:%S", time.localtime())
-            self.lo.log(console_txt="\n  * * BUILDING: " + text_body, log_txt="\n Building: " + text_body)
-
-            # emptying builddir
-            empty_dir(self.builddir)
-
+        try:
+            # emptying package's builddir
+            if os.path.isdir(workdir):
+                shutil.rmtree(workdir)
+            os.makedirs(workdir)
+
+            # defining work directory, sources are downloaded and extracted at once
+            with self.report.phase("fetch", pkg_to_build.name):
+                compiledir = self.fetch_sources(pkg_to_build, workdir) or \
+                    self.get_compiledir(pkg_to_build.name, workdir, pkg_to_build.pkgbase)
+
+            pkgbuild_hash = get_file_hash(os.path.join(compiledir, "PKGBUILD"))
+            skip_reason = None if self.retry_failed else \
+                self.failure_ledger.should_skip(pkg_to_build.name, pkg_to_build.version, pkgbuild_hash)
+            if skip_reason:
+                text = " Skipping {}, same version {}".format(pkg_to_build.name, skip_reason)
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+                return "skipped, " + skip_reason
+
+            os.makedirs(self.srcdest, exist_ok=True)
+            build_log = os.path.join(self.build_logdir, pkg_to_build.name + ".log")
+            if self.syncdeps:
+                self.install_missing_dependencies(pkg_to_build, compiledir)
+            cmd = "makepkg"
+            profile = self.get_build_profile(pkg_to_build.name)
+            tmpfs_dir = None
+            if profile is not None:
+                from shlex import quote
+                from repokeeper.scheduler import get_mem_available
+                if profile.use_tmpfs(get_mem_available()):
+                    tmpfs_dir = os.path.join(profile.tmpfs_dir, "repokeeper-{}".format(os.getuid()), pkg_to_build.name)
+                    os.makedirs(tmpfs_dir, exist_ok=True)
+                makepkg_conf = os.path.join(workdir, "makepkg.conf")
+                with open(makepkg_conf, "w") as fh:
+                    fh.write(profile.makepkg_conf(self.build_concurrency, tmpfs_dir))
+                cmd += " --config " + quote(makepkg_conf)
+                self.lo.log(log_txt=" {} built with profile {}{}".format(pkg_to_build.name, profile.name,
+                                                                       ", in " + tmpfs_dir if tmpfs_dir else ""))
+            started = time.monotonic()
             try:
-                # downloading package into builddir, appending _tmp to name to avoid overwriting of anything
-                localarchive = os.path.join(self.builddir, pkg_to_build.name + "_tmp")
-                #print(pkg_to_build.url)
-                urlretrieve(pkg_to_build.url, localarchive)
-
-                # unpacking
-                tararchive = tarfile.open(localarchive, "r:*")
-                tararchive.extractall(self.builddir)
-
-                # defining work directory
-                compiledir = self.get_compiledir(pkg_to_build.name)
-
-                result = subprocess.call("makepkg", cwd=compiledir, shell=True)
-                text = " ( makepkg's return code: {} )".format(result)
-                self.lo.log(log_txt=text, console_txt=text)
-                if int(result) > 0:
-                    fp = FailedPackage(pkg_to_build.name, f"makepkg RC: {result}")
-                    failed_packages.append(fp)
-                    self.lo.log(console_txt=f" ERROR: Build of {fp.name} failed with: {fp.reason}")
-                    continue
+                with self.report.phase("makepkg", pkg_to_build.name):
+                    result = run_logged(cmd, build_log, self.echo_build_output, cwd=compiledir, shell=True,
+                                        env=dict(os.environ, SRCDEST=self.srcdest))
+            finally:
+                if tmpfs_dir:
+                    shutil.rmtree(tmpfs_dir, ignore_errors=True)
+            makepkg_seconds = time.monotonic() - started
+            self.report.set_package_info(pkg_to_build.name, profile=profile.name if profile else None,
+                                         tmpfs=tmpfs_dir is not None)
+            text = " ( {} makepkg's return code: {}, output in {} )".format(pkg_to_build.name, result, build_log)
+            self.lo.log(log_txt=text, console_txt=text)
+            if int(result) > 0:
+                reason = f"makepkg RC: {result}"
+                if not self.echo_build_output:
+                    self.lo.log(console_txt="\n".join(["   " + line for line in get_log_tail(build_log)]))
+                self.lo.log(console_txt=f" ERROR: Build of {pkg_to_build.name} failed with: {reason}")
+                self.failure_ledger.record_failure(pkg_to_build.name, pkg_to_build.version, pkgbuild_hash, reason)
+                return reason
 
-            except Exception as e:
-                e_txt = str(e)
-                if isinstance(e, HTTPError):
-                    down_error_text = f" Got HTTPError while retrieveing: {pkg_to_build.url}"
-                    self.lo.log(console_txt=down_error_text, log_txt=down_error_text)
-                    e_txt += f" [{pkg_to_build.url}]"
-                self.lo.log(console_txt=" ERROR: Build of {} failed with: {}".format(pkg_to_build.name, str(e)))
-                fp = FailedPackage(pkg_to_build.name, e_txt)
-                failed_packages.append(fp)
-                time.sleep(2)
-                continue
+        except Exception as e:
+            e_txt = str(e)
+            from urllib.error import HTTPError
+            if isinstance(e, HTTPError):
+                down_error_text = f" Got HTTPError while retrieveing: {pkg_to_build.url}"
+                self.lo.log(console_txt=down_error_text, log_txt=down_error_text)
+                e_txt += f" [{pkg_to_build.url}]"
+            self.lo.log(console_txt=" ERROR: Build of {} failed with: {}".format(pkg_to_build.name, str(e)))
+            return e_txt
 
-            self.lo.log(console_txt=" ")
-            copied_count = 0
+        self.lo.log(console_txt=" ")
+        from repokeeper.publish import publish_file
+        copied_count = 0
+        archive_bytes = 0
+        with self.report.phase("copy", pkg_to_build.name):
             for lfile in glob.glob(compiledir + "/*pkg.tar.zst"):
-                self.lo.log(console_txt="   Copying " + lfile + " to " + self.repodir)
+                archive_bytes += os.path.getsize(lfile)
+                self.lo.log(console_txt="   Copying " + lfile + " to " + (target_dir or self.repodir))
                 try:
-                    shutil.copy(lfile, self.repodir)
-                    self.lo.log(log_txt=" Copying final package: {}".format(lfile))
+                    # signature goes first, so that it is there once pacman can see the archive
+                    for pfile in glob.glob(glob.escape(lfile) + ".sig") + [lfile]:
+                        method = publish_file(pfile, target_dir or self.repodir)
+                        self.report.incr("publish_" + method)
+                        self.lo.log(log_txt=" Copying final package: {} ({})".format(pfile, method))
                     copied_count += 1
-                except:
-                    self.lo.log(console_txt=" Copying FAILED !?")
-                    time.sleep(4)
+                except Exception as e:
+                    self.lo.log(console_txt=" Copying FAILED: {}".format(str(e)))
                 self.lo.log(console_txt=" ")
-            if copied_count == 0:
-                text = "No package files found for {}".format(pkg_to_build.name)
-                self.lo.log(LogType.ERROR, console_txt=text, log_txt=text)
-                failed_packages.append(FailedPackage(pkg_to_build.name, "No built archives found"))
+        if copied_count == 0:
+            text = "No package files found for {}".format(pkg_to_build.name)
+            self.lo.log(LogType.ERROR, console_txt=text, log_txt=text)
+            self.failure_ledger.record_failure(pkg_to_build.name, pkg_to_build.version, pkgbuild_hash,
+                                               "No built archives found")
+            return "No built archives found"
+        self.failure_ledger.record_success(pkg_to_build.name)
+        self.report.set_package_info(pkg_to_build.name, archive_bytes=archive_bytes)
+        self.profile_stats.record(pkg_to_build.name, profile.name if profile else "none", makepkg_seconds,
+                                  archive_bytes, tmpfs_dir is not None)
+        return None
+
+    def building(self, pkgs: List[PackageToBuild]) -> List[FailedPackage]:
+        """
+        Actual building the application and copying package files into repo directory. Packages are
+        built after their (build) dependencies, independent ones concurrently (build_jobs option)
+        :param pkgs: List of packages to be built
+        :return: List of failing packages, can be empty
+        """
+        from repokeeper.scheduler import get_build_dependencies, get_build_jobs, run_build_dag
+        if self.coordinator is not None:
+            # coordinator waits for a free slot of some worker, so all ready packages can be handed to it
+            jobs = max(1, len(pkgs))
+            self.lo.log(console_txt="  building on workers, {} slots connected so far".format(self.coordinator.capacity))
+        else:
+            jobs = get_build_jobs(self.build_jobs, self.build_memory_per_job * 1024 * 1024)
+        self.echo_build_output = jobs == 1
+        self.build_concurrency = jobs
+        if jobs > 1 and self.coordinator is None:
+            self.lo.log(console_txt=f"  building up to {jobs} packages at once, makepkg output goes to {self.build_logdir}")
+        self.build_started = 0
+        # packages other packages from this run depend on, they are published before dependents start
+        build_dependencies = get_build_dependencies(pkgs)
+        needed = set().union(*build_dependencies.values())
+
+        def get_dependency_files(name: str) -> List[str]:
+            """Archives of packages from this run name (also indirectly) depends on, for workers to install"""
+            deps: Set[str] = set()
+            todo = list(build_dependencies.get(name, ()))
+            while todo:
+                dep = todo.pop()
+                if dep not in deps:
+                    deps.add(dep)
+                    todo.extend(build_dependencies.get(dep, ()))
+            newest = [self.repo_content.get_newest(dep) for dep in sorted(deps)]
+            return [item.file for item in newest if item is not None]
+
+        def build(pkg_to_build: PackageToBuild) -> Optional[str]:
+            if self.coordinator is not None:
+                with self.report.phase("remote_build", pkg_to_build.name):
+                    reason = self.coordinator.build(dict(vars(pkg_to_build), count=len(pkgs)),
+                                                    get_dependency_files(pkg_to_build.name))
+                if reason is not None:
+                    self.lo.log(console_txt=f" ERROR: Build of {pkg_to_build.name} failed with: {reason}",
+                                log_txt=f" Build of {pkg_to_build.name} failed with: {reason}")
+            else:
+                reason = self.build_package(pkg_to_build, len(pkgs))
+            if reason is None and pkg_to_build.name in needed:
+                with self.report.phase("publish", pkg_to_build.name):
+                    reason = self.publish_dependency(pkg_to_build)
+            return reason
+
+        with self.report.phase("building"):
+            failed = run_build_dag(pkgs, build, jobs)
+        for pkg_to_build in pkgs:
+            self.report.set_package_result(pkg_to_build.name, failed.get(pkg_to_build.name, "built"))
+        return [FailedPackage(name, reason) for name, reason in failed.items()]
+
+    def start_coordinator(self, address: str) -> None:
+        from repokeeper.distributed import Coordinator, parse_address
+        if not self.worker_secret:
+            self.lo.log(LogType.ERROR, console_txt="worker_secret option has to be set for distributed builds", err_code=2)
+        self.coordinator = Coordinator(parse_address(address), self.repodir, self.worker_secret, self.worker_retries,
+                                       self.worker_timeout, self.worker_heartbeat,
+                                       log=lambda text: self.lo.log(console_txt=" " + text, log_txt=text)).start()
+        text = "* Waiting for build workers at {}:{}".format(*self.coordinator.address)
+        self.lo.log(console_txt=text, log_txt=text)
+
+    def build_job(self, job: Dict, target_dir: str) -> Tuple[Optional[str], List[str]]:
+        """
+        Builds package sent by coordinator, its archives are put into target_dir. With syncdeps
+        archives of dependencies sent along are installed first
+        """
+        pkg_to_build = PackageToBuild(job["name"], job["url"], job["dependencies"], job["build_dependencies"],
+                                      job.get("pkgbase"), job.get("version"))
+        if self.syncdeps:
+            try:
+                self.install_dependencies(job.get("dependency_files", []))
+            except Exception as e:
+                return "installing dependencies failed: {}".format(str(e)), []
+        reason = self.build_package(pkg_to_build, job.get("count", 0), target_dir)
+        return reason, sorted(glob.glob(os.path.join(target_dir, "*")))
+
+    def run_worker(self, address: str, slots: Optional[int] = None) -> None:
+        from repokeeper.distributed import parse_address, run_worker
+        from repokeeper.scheduler import get_build_jobs
+        slots = slots or get_build_jobs(self.build_jobs, self.build_memory_per_job * 1024 * 1024)
+        self.echo_build_output = slots == 1
+        self.build_concurrency = slots
+        text = "* Building for coordinator at {}, {} packages at once".format(address, slots)
+        self.lo.log(console_txt=text, log_txt=text)
+        if not self.worker_secret:
+            self.lo.log(LogType.ERROR, console_txt="worker_secret option has to be set for distributed builds", err_code=2)
+        try:
+            run_worker(parse_address(address), slots, self.build_job, os.path.join(self.builddir, ".outbox"),
+                       self.worker_secret, heartbeat=self.worker_heartbeat)
+        except OSError as e:
+            self.lo.log(LogType.ERROR, console_txt=str(e), log_txt=str(e), err_code=12)
 
-        return failed_packages
+    def reload_config(self) -> Optional[Dict[str, str]]:
+        """
+        Reads changed config file, the old config stays in place if the new one is not valid
+        :return: poll priorities of packages in new config, None if it was not loaded
+        """
+        old = dict(vars(self))
+        try:
+            priorities = get_conf_priorities(self.conffileloc)
+            self.load_config()
+        except Exception as e:
+            text = "Config file {} not reloaded: {}".format(self.conffileloc, str(e))
+            self.lo.log(LogType.WARNING, console_txt="* " + text, log_txt=text)
+            return None
+        self.reset_aur_clients(old)
+        self.parse_repo()
+        text = "Config file {} reloaded, {} packages".format(self.conffileloc, len(self.pkgs_conf))
+        self.lo.log(console_txt="* " + text, log_txt=text)
+        return priorities
+
+    def reset_aur_clients(self, old: Dict) -> None:
+        """
+        Objects created on first use with options of the old config are dropped when those options
+        changed, so that they are created again with the new ones. Rate limiter stays if its rate did
+        not change, so that all AUR traffic keeps going through one limiter (and a 429 block holds)
+        :param old: attributes before config was reloaded
+        """
+        if (self.aur_limiter.rate, self.aur_limiter.burst) == (old["aur_limiter"].rate, old["aur_limiter"].burst):
+            self.aur_limiter = old["aur_limiter"]
+        with self._lazy_lock:
+            if self.aur_limiter is not old["aur_limiter"] or self.http_timeout != old["http_timeout"]:
+                self._http = None
+            if self.aur_concurrency != old["aur_concurrency"] and self._aur_executor is not None:
+                self._aur_executor.shutdown(wait=False)
+                self._aur_executor = None
+        cache_options = ("cachedir", "aur_cache_ttl", "aur_cache_negative_ttl", "aur_cache_size")
+        if self.aur_cache is not None and any(getattr(self, key) != old[key] for key in cache_options):
+            self.aur_cache.close()
+            self.aur_cache = None
+        if self.aur_dump is not None and self.cachedir != old["cachedir"]:
+            self.aur_dump.close()
+            self.aur_dump = None
+
+    def poll_packages(self, pcks: List[str]) -> List[FailedPackage]:
+        """
+        One round of daemon: checks pcks in AUR, builds those whose AUR version moved past the
+        one in repo and updates repo db if anything got built (or its update failed last time).
+        Raises on failure instead of exiting
+        """
+        self.daemon_state = "checking"
+        # request budget is per round in daemon
+        self.aur_requests_left = get_option(self.options, "aur_request_budget", 0) or None
+        pkgs = self.check_aur_web(pcks)
+        self.polls += 1
+        failed: List[FailedPackage] = []
+        if pkgs:
+            self.daemon_state = "building"
+            self.lo.log(LogType.BOLD, console_txt="\n* Building packages...")
+            failed = self.building(pkgs)
+            if len(failed) < len(pkgs):
+                self.repo_db_pending = True
+        if self.repo_db_pending:
+            self.update_repo_file(exit_on_failure=False)
+            self.repo_db_pending = False
+        for fp in failed:
+            text = f"  {fp.name:<22} {fp.reason}"
+            self.lo.log(console_txt=" " + text, log_txt=text)
+        return failed
+
+    def poll_round(self, due: List[str]) -> None:
+        """Round of daemon for packages due, failure is logged and they are checked again when due next time"""
+        try:
+            self.poll_packages(due)
+        except Exception as e:
+            text = "Daemon round failed: {}".format(str(e) or e.__class__.__name__)
+            self.lo.log(LogType.ERROR, console_txt="* " + text, log_txt=text)
+        self.schedule.checked(due, time.time())
+        self.lo.flush()
+
+    def run_daemon(self) -> None:
+        """
+        Keeps running instead of being started by cron: packages from config are checked in AUR when
+        due per their poll priority, repo content stays in memory and config file is reloaded when it
+        changes. Status is served on status_socket (repokeeper --status)
+        """
+        from repokeeper.daemon import FileWatcher, PollSchedule, StatusServer
+        self.schedule = PollSchedule(self.poll_intervals)
+        try:
+            self.schedule.update(get_conf_priorities(self.conffileloc), time.time())
+        except ValueError as e:
+            self.lo.log(LogType.ERROR, console_txt=str(e), log_txt=str(e), err_code=10)
+        self.daemon_state = "starting"
+        self.polls = 0
+        watcher = FileWatcher(self.conffileloc)
+        self.config_watch = watcher.method
+        try:
+            server = StatusServer(self.status_socket, self.get_daemon_status).start()
+        except OSError as e:
+            watcher.close()
+            self.lo.log(LogType.ERROR, console_txt=str(e), log_txt=str(e), err_code=12)
+        text = "Daemon started, {} packages, config file watched by {}, status socket {}".format(
+            len(self.schedule.priorities), watcher.method, self.status_socket)
+        self.lo.log(LogType.BOLD, console_txt="* " + text, log_txt=text)
+        try:
+            while True:
+                due = self.schedule.due(time.time())
+                if due:
+                    self.poll_round(due)
+                self.daemon_state = "idle"
+                next_due = self.schedule.next_due()
+                if watcher.wait(max(0.0, next_due - time.time()) if next_due is not None else 3600.0):
+                    priorities = self.reload_config()
+                    if priorities is not None:
+                        self.schedule.intervals = self.poll_intervals
+                        self.schedule.update(priorities, time.time())
+        finally:
+            server.close()
+            watcher.close()
+
+    def get_daemon_status(self) -> Dict:
+        """Served on status socket, called from its thread"""
+        def fmt(ts: Optional[float]) -> Optional[str]:
+            return time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(ts)) if ts else None
+
+        schedule, repo_content = self.schedule, self.repo_content
+        packages = {}
+        for name, priority in list(schedule.priorities.items()):
+            newest = repo_content.get_newest(name)
+            packages[name] = {"priority": priority, "last_check": fmt(schedule.last_check.get(name)),
+                              "next_check": fmt(schedule.next_check.get(name)),
+                              "aur_version": self.aur_versions.get(name),
+                              "repo_version": newest.full_version if newest else None,
+                              "last_result": self.report.packages.get(name, {}).get("result")}
+        return {"pid": os.getpid(), "version": get_version(), "state": self.daemon_state,
+                "started": fmt(self.report.started), "config": self.conffileloc, "config_watch": self.config_watch,
+                "polls": self.polls, "packages": packages, "counters": self.report.to_dict()["counters"]}
+
+    def install_dependencies(self, files: List[str]) -> None:
+        """
+        Installs archives of AUR dependencies built in this run, so that packages needing them find
+        them installed (sync databases are not refreshed, that would be a partial upgrade)
+        """
+        if not files:
+            return
+        with self.pacman_lock:
+            rc = subprocess.call(["sudo", "pacman", "-U", "--asdeps", "--needed", "--noconfirm"] + files)
+        if rc != 0:
+            raise ValueError("pacman -U returned: {}".format(rc))
+
+    def install_missing_dependencies(self, pkg_to_build: PackageToBuild, compiledir: str) -> None:
+        """
+        Installs from sync dbs (as dependencies) what is needed to build the package and is not installed
+        yet. Done here instead of makepkg --syncdeps, so that builds running at once do not start pacman
+        at the same time
+        """
+        from repokeeper.scheduler import get_srcinfo_dependencies
+        deps = get_srcinfo_dependencies(os.path.join(compiledir, ".SRCINFO"))
+        if deps is None:
+            deps = pkg_to_build.dependencies + pkg_to_build.build_dependencies
+        if not deps:
+            return
+        with self.pacman_lock:
+            # pacman -T lists dependencies that are not satisfied, with return code 127
+            check = subprocess.run(["pacman", "-T"] + deps, stdout=subprocess.PIPE, universal_newlines=True)
+            if check.returncode not in (0, 127):
+                raise ValueError("pacman -T returned: {}".format(check.returncode))
+            missing = check.stdout.split()
+            if not missing:
+                return
+            self.lo.log(log_txt=" {} needs: {}".format(pkg_to_build.name, " ".join(missing)))
+            rc = subprocess.call(["sudo", "pacman", "-S", "--asdeps", "--needed", "--noconfirm"] + missing)
+        if rc != 0:
+            raise ValueError("pacman -S returned: {}".format(rc))
+
+    def publish_dependency(self, pkg_to_build: PackageToBuild) -> Optional[str]:
+        """
+        Makes freshly built package available to packages depending on it: updates repo db
+        and (with syncdeps, when building locally) installs it as dependency
+        :return: None on success, reason of failure otherwise
+        """
+        with self.repo_lock:
+            try:
+                self.parse_repo()
+                self.refresh_repo_db()
+                newest = self.repo_content.get_newest(pkg_to_build.name)
+                if self.syncdeps and self.coordinator is None and newest is not None:
+                    self.install_dependencies([newest.file])
+            except Exception as e:
+                text = " ERROR: Publishing of {} failed with: {}".format(pkg_to_build.name, str(e))
+                self.lo.log(console_txt=text, log_txt=text)
+                return "publishing failed: {}".format(str(e))
+        text = " {} published into repo for its dependents".format(pkg_to_build.name)
+        self.lo.log(console_txt=text, log_txt=text)
+        return None
 
     def folder_check(self) -> None:
         if self.repodir == "unset":
@@ -430,21 +1138,140 @@ class Repo_Base(object):
         else:
             self.lo.log(console_txt="* Build/temp. directory: " + self.builddir)
 
-    def update_repo_file(self) -> None:
-        repo_file = os.path.join(self.repodir, self.reponame + ".db.tar.gz")
-        self.lo.log(LogType.BOLD, console_txt="\n\n* Updating local repo db file: {}".format(repo_file))
+    def get_repo_db_changes(self, repo_file: str) -> Tuple[List[str], List[str]]:
+        """
+        Compares repo db with newest archives in repo dir
+        :return: archives to be added (or updated) in db, names of packages to be removed from db
+        """
+        current: Dict[str, str] = {}
         if os.path.isfile(repo_file):
-            os.remove(repo_file)
-        else:
-            self.lo.log(LogType.WARNING, console_txt="Warning - {} was not removed - not found".format(repo_file))
-        # creating new one
+            try:
+                from repokeeper.syncdb import read_repo_db_files
+                current = read_repo_db_files(repo_file)
+            except Exception as e:
+                text = "Warning - failed to read {}, it will be regenerated: {}".format(repo_file, str(e))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+                os.remove(repo_file)
+        desired: Dict[str, str] = {item.file_basename: item.file for item in self.repo_content.db_versions}
+        to_add = [file for name, file in desired.items() if current.get(name) != os.path.basename(file)]
+        to_remove = [name for name in current if name not in desired]
+        return to_add, to_remove
+
+    def write_native_repo_db(self) -> bool:
+        """
+        Writes repo db from archive index, archives not yet indexed are parsed (once)
+        :return: False if it failed and repo-add should be used instead
+        """
         try:
-            pr = subprocess.Popen("repo-add " + repo_file + " " + os.path.join(self.repodir, self.package_regexp),
-                                  shell=True)
-            rc = pr.wait()
+            from repokeeper.repodb import write_repo_db
+            entries = {item.file: self.pkg_index.get(item.file) for item in self.repo_content.db_versions}
+            write_repo_db(self.repodir, self.reponame, entries)
+            self.pkg_index.forget_missing(self.repodir)
+            text = "   repo db written with {} packages".format(len(entries))
+            self.lo.log(console_txt=text, log_txt=text)
+            return True
+        except Exception as e:
+            text = "   native repo db writer failed ({}), using repo-add".format(str(e))
+            self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+            return False
+
+    def run_repo_add(self, repo_file: str, to_add: List[str], to_remove: List[str]) -> None:
+        for cmd, args in (("repo-add", sorted(to_add)), ("repo-remove", sorted(to_remove))):
+            if not args:
+                continue
+            self.lo.log(log_txt="{} {}".format(cmd, " ".join(args)), level="debug")
+            rc = subprocess.call([cmd, repo_file] + args)
             if rc != 0:
-                self.lo.log(LogType.WARNING, console_txt="ERROR: repo-add returned: {}".format(rc))
-                raise ValueError("Building failed with RC: {}".format(rc))
+                self.lo.log(LogType.WARNING, console_txt="ERROR: {} returned: {}".format(cmd, rc))
+                raise ValueError("{} failed with RC: {}".format(cmd, rc))
+
+    def refresh_repo_db(self) -> None:
+        """Brings repo db in line with newest archives in repo dir, raises on failure"""
+        repo_file = os.path.join(self.repodir, self.reponame + ".db.tar.gz")
+        to_add, to_remove = self.get_repo_db_changes(repo_file)
+        if not to_add and not to_remove:
+            self.lo.log(console_txt="   repo db is up to date, no changes needed", log_txt="Repo db up to date")
+        elif self.pkg_index is not None and self.write_native_repo_db():
+            pass
+        else:
+            self.run_repo_add(repo_file, to_add, to_remove)
+
+    def get_pkginfo(self, file: str) -> Dict[str, List[str]]:
+        if self.pkg_index is not None:
+            return self.pkg_index.get(file)["pkginfo"]
+        from repokeeper.repodb import read_pkginfo
+        return read_pkginfo(file)
+
+    def get_prune_plan(self) -> List[str]:
+        """
+        Archives to be deleted per retention options: versions over keep_versions or older than
+        keep_days (newest version is always kept) and with prune_orphans all archives of packages
+        that are not in config and no package in config needs them
+        """
+        from repokeeper.retention import find_orphans, get_dependency_names, select_superseded
+        res: List[str] = []
+        if self.keep_versions > 0 or self.keep_days > 0:
+            now = time.time()
+            for name in sorted(self.repo_content.list_pck_names):
+                versions = [[item.file for item in group] for group in self.repo_content.get_versions(name)]
+                res += select_superseded(versions, self.keep_versions, self.keep_days * 86400, now)
+        if self.prune_orphans and self.pkgs_conf:
+            try:
+                packages = {item.file_basename: self.get_pkginfo(item.file) for item in self.repo_content.db_versions}
+            except Exception as e:
+                text = "   dependencies of packages in repo not known ({}), no package is pruned as orphan".format(str(e))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+                return sorted(set(res))
+            # packages in config but not in repo (failed build...) still need their dependencies
+            missing = [name for name in self.pkgs_conf if name not in packages]
+            unknown = [name for name in missing if name not in self.aur_dependencies]
+            if unknown:
+                text = "   dependencies of {} (not in repo) not known, no package is pruned as orphan".format(
+                    ", ".join(unknown))
+                self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+                return sorted(set(res))
+            extra = set(dep for name in missing for dep in get_dependency_names(self.aur_dependencies[name]))
+            for name in find_orphans(self.pkgs_conf, packages, extra):
+                res += [item.file for group in self.repo_content.get_versions(name) for item in group]
+        return sorted(set(res))
+
+    def prune_files(self, files: List[str], dryrun: bool = False) -> None:
+        """Deletes archives (and their signatures), with dryrun only lists them"""
+        if not files:
+            return
+        self.lo.log(LogType.BOLD, console_txt="* Retention policy {} {} archives:".format(
+            "would remove" if dryrun else "removes", len(files)))
+        for file in files:
+            text = "   {} {}".format("would remove" if dryrun else "removing", os.path.basename(file))
+            self.lo.log(console_txt=text, log_txt=text)
+            if dryrun:
+                continue
+            for path in (file, file + ".sig"):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    text = "   removing {} failed: {}".format(path, str(e))
+                    self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
+        if not dryrun:
+            self.report.incr("pruned_archives", len(files))
+
+    def update_repo_file(self, exit_on_failure: bool = True) -> None:
+        """
+        Adds newly built archives into repo db and removes entries of archives that are gone. Archives
+        dropped by retention policy are left out of db and deleted only once the new db is in place
+        :param exit_on_failure: False in daemon, failure is raised then
+        """
+        repo_file = os.path.join(self.repodir, self.reponame + ".db.tar.gz")
+        self.lo.log(LogType.BOLD, console_txt="\n\n* Updating local repo db file: {}".format(repo_file))
+        self.parse_repo()
+        to_prune = self.get_prune_plan()
+        try:
+            with self.report.phase("db_update"):
+                if to_prune:
+                    self.repo_content.remove(to_prune)
+                self.refresh_repo_db()
+            self.prune_files(to_prune)
             self.lo.log(console_txt="   ")
             self.lo.log(LogType.BOLD, console_txt="* To use the repo you need following two lines in /etc/pacman.conf")
             self.lo.log(LogType.CUSTOM,
@@ -453,17 +1280,53 @@ class Repo_Base(object):
 
         except Exception as e:
             text = "   repodb file creation failed with {}".format(str(e))
-            self.lo.log(LogType.ERROR, console_txt=text, log_txt=text, err_code=11)
+            self.lo.log(LogType.ERROR, console_txt=text, log_txt=text, err_code=11 if exit_on_failure else -1)
+            raise
+
+    def write_report(self, path: str) -> None:
+        """Writes run report, with counters of HTTP client and caches collected at this moment"""
+        counters = {"http_requests": self._http.requests if self._http else 0,
+                    "http_bytes_downloaded": self._http.bytes_downloaded if self._http else 0}
+        if self.aur_cache is not None:
+            counters.update(aur_cache_hits=self.aur_cache.hits, aur_cache_misses=self.aur_cache.misses)
+        if self.pkg_index is not None:
+            counters.update(pkg_index_hits=self.pkg_index.hits, pkg_index_parsed=self.pkg_index.parsed)
+        for counter, value in counters.items():
+            self.report.counters[counter] = value
+        try:
+            self.report.write(path)
+        except OSError as e:
+            text = "Writing report into {} failed: {}".format(path, str(e))
+            self.lo.log(LogType.WARNING, console_txt=text, log_txt=text)
 
 
 def main():
-    print_version, dry_run, no_dependencies, list_only = get_args()
-    if print_version:
+    args = get_args()
+    if args.version:
         Logger().log(console_txt = get_version(), err_code = 0)
+    if args.offline and not (args.dryrun or args.list):
+        Logger().log(LogType.ERROR, console_txt="--offline can be used only with --dryrun or --list", err_code=2)
+    if args.daemon and (args.dryrun or args.list or args.offline or args.worker):
+        Logger().log(LogType.ERROR, console_txt="--daemon can not be used with --dryrun, --list, --offline or --worker",
+                     err_code=2)
+    if args.status:
+        import json
+        from repokeeper.daemon import query_status
+        try:
+            status = query_status(get_status_socket(get_conf_options(args.config)))
+        except (OSError, ValueError) as e:
+            Logger().log(LogType.ERROR, console_txt="Daemon is not running: {}".format(str(e)), err_code=12)
+        Logger().log(console_txt=json.dumps(status, indent=2, sort_keys=True), err_code=0)
+
+    rp = Repo_Base(skip_dependencies=args.nodeps, offline=args.offline, retry_failed=args.retry_failed,
+                   read_only=args.list or bool(args.worker), conffile=args.config)
 
-    rp = Repo_Base(skip_dependencies=no_dependencies)
+    if args.profile:
+        if args.profile not in rp.build_profiles:
+            rp.lo.log(LogType.ERROR, console_txt="Unknown build profile: {}".format(args.profile), err_code=2)
+        rp.build_profile = args.profile
 
-    if list_only:
+    if args.list:
         rp.lo.log(logtype=LogType.HIGHLIGHT, console_txt = "\nContent of repository:")
         for item in rp.repo_content.list():
             rp.lo.log(console_txt =f"  {item}")
@@ -475,9 +1338,21 @@ def main():
     rp.lo.log(console_txt=" [REPOKEEPER v. {}]".format(get_version()))
     rp.lo.log(log_txt=f"\n\n{'# ' * 10}  starting at {time.strftime('%d %b %Y %H:%M:%S', time.localtime())}   {'# ' * 10}")
 
+    if args.worker:
+        rp.run_worker(args.worker, args.slots)
+        return
+
     # testing existence of repordir and builddir
     rp.folder_check()
 
+    if args.coordinator and not args.dryrun:
+        # workers can connect while AUR is being checked
+        rp.start_coordinator(args.coordinator)
+
+    if args.daemon:
+        rp.run_daemon()
+        return
+
     # checking what is in AUR and what version
     if len(rp.pkgs_conf) > 0:
         pkgs_to_built = rp.check_aur_web()  # also print out output from aur check
@@ -485,7 +1360,10 @@ def main():
         pkgs_to_built = {}
 
     print(" ")
-    if dry_run:
+    if args.dryrun:
+        rp.prune_files(rp.get_prune_plan(), dryrun=True)
+        if args.report:
+            rp.write_report(args.report)
         text="Dry-run mode, quitting..."
         rp.lo.log(LogType.BOLD, console_txt="* "+text, log_txt=text, err_code=0)
     if len(pkgs_to_built) > 0:
@@ -495,16 +1373,12 @@ def main():
         rp.lo.log(log_txt="\nNo packages to be build")
 
     # iterating and updating packages in pkgs_to_built list
-    time.sleep(1)
-
     failed_packages = rp.building(pkgs_to_built)
+    if rp.coordinator is not None:
+        rp.coordinator.stop()
 
     # updating repository
-    time.sleep(1)
-    rp.update_repo_file()
-
-    # parsing local repo once more to identify outdated packages
-    rp.parse_repo() # refresh the information
+    rp.update_repo_file()  # also refreshes information about repo content
 
     #printing content of repo into log file
     rp.lo.log(console_txt = f"\nCheck log file {rp.lo.logfile} for list of all packages and versions in repo\n",
@@ -533,6 +1407,18 @@ dependencies, so delete them on your own responsibility (just copy&paste it en b
             text = f"  {fp.name:<22} {fp.reason}"
             rp.lo.log(console_txt=" "+text, log_txt=text)
 
+    if rp.failure_ledger.entries:
+        text = "Failed builds that are not retried until (use --retry-failed to build them anyway):"
+        rp.lo.log(logtype=LogType.WARNING, console_txt="* "+text, log_txt=text)
+        for name, entry in sorted(rp.failure_ledger.entries.items()):
+            text = "  {:<22} {:<16} {} failure(s), {}".format(name, str(entry["version"]), entry["failures"],
+                time.strftime("%d %b %Y %H:%M", time.localtime(rp.failure_ledger.next_retry(name))))
+            rp.lo.log(console_txt=" "+text, log_txt=text)
+
+    if args.report:
+        rp.write_report(args.report)
+        rp.lo.log(console_txt=f"* Run report written into {args.report}")
+
     rp.lo.log(log_txt="")
     rp.lo.log(log_txt="All done at {}, quitting ".format(time.strftime("%d %b %Y %H:%M:%S", time.localtime())))
 
@@ -0,0 +1,63 @@
+import json, os, threading, time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class RunReport(object):
+    """
+    Timings of run phases (and of build steps per package) and counters, written as JSON
+    at the end of run so runs can be compared
+    """
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.packages: Dict[str, Dict] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, package: Optional[str] = None) -> Iterator[None]:
+        """Measures the with block, per package if package is given, repeated phases are summed up"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - start
+            with self._lock:
+                if package is None:
+                    phase = self.phases.setdefault(name, {"count": 0, "seconds": 0.0})
+                    phase["count"] += 1
+                    phase["seconds"] += duration
+                else:
+                    steps = self.packages.setdefault(package, {})
+                    steps[name] = steps.get(name, 0.0) + duration
+
+    def set_package_result(self, package: str, result: str) -> None:
+        with self._lock:
+            self.packages.setdefault(package, {})["result"] = result
+
+    def set_package_info(self, package: str, **info) -> None:
+        with self._lock:
+            self.packages.setdefault(package, {}).update(info)
+
+    def incr(self, counter: str, count: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + count
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+                    "duration": round(time.time() - self.started, 3),
+                    "phases": {name: {"count": p["count"], "seconds": round(p["seconds"], 3)}
+                               for name, p in self.phases.items()},
+                    "packages": {name: {k: round(v, 3) if isinstance(v, float) else v for k, v in steps.items()}
+                                 for name, steps in self.packages.items()},
+                    "counters": dict(sorted(self.counters.items()))}
+
+    def write(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+            fh.write("\n")
+        os.replace(tmp, path)
@@ -0,0 +1,54 @@
+import os
+from typing import Dict, Iterable, List, Set
+from repokeeper.syncdb import strip_version_constraint
+
+# .PKGINFO fields whose packages have to stay in repo as long as the package needing them does
+DEPENDENCY_FIELDS = ("depend", "makedepend", "checkdepend", "optdepend")
+
+
+def select_superseded(versions: List[List[str]], keep_versions: int, max_age: float, now: float) -> List[str]:
+    """
+    :param versions: archives of one package grouped by version, oldest version first
+    :param keep_versions: how many newest versions are kept, 0 = no limit
+    :param max_age: older versions whose archives are older (mtime, seconds) are dropped, 0 = no limit
+    :return: archives to be deleted, never those of the newest version
+    """
+    res: List[str] = []
+    for pos, files in enumerate(versions[:-1]):
+        too_many = keep_versions > 0 and pos < len(versions) - keep_versions
+        too_old = max_age > 0 and all(now - os.path.getmtime(f) > max_age for f in files)
+        if too_many or too_old:
+            res.extend(files)
+    return res
+
+
+def get_dependency_names(pkginfo: Dict[str, List[str]]) -> Set[str]:
+    return set(strip_version_constraint(dep.split(":", 1)[0] if field == "optdepend" else dep)
+               for field in DEPENDENCY_FIELDS for dep in pkginfo.get(field, []))
+
+
+def find_orphans(in_config: Iterable[str], packages: Dict[str, Dict[str, List[str]]],
+                 extra_dependencies: Iterable[str] = ()) -> Set[str]:
+    """
+    :param packages: name: .PKGINFO of its newest archive, for all packages in repo
+    :param extra_dependencies: needed by packages in config that are not in repo (yet)
+    :return: names of packages that are neither in config nor (even indirectly) needed by those that are
+    """
+    providers: Dict[str, Set[str]] = {}
+    for name, pkginfo in packages.items():
+        providers.setdefault(name, set()).add(name)
+        for provided in pkginfo.get("provides", []):
+            providers.setdefault(strip_version_constraint(provided), set()).add(name)
+
+    needed: Set[str] = set()
+    todo = [name for name in in_config if name in packages]
+    for dependency in extra_dependencies:
+        todo.extend(providers.get(dependency, ()))
+    while todo:
+        name = todo.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        for dependency in get_dependency_names(packages[name]):
+            todo.extend(providers.get(dependency, ()))
+    return set(packages) - needed
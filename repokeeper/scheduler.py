@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set
+
+from repokeeper.syncdb import strip_version_constraint
+
+
+def get_build_dependencies(pkgs: List) -> Dict[str, Set[str]]:
+    """
+    :param pkgs: PackageToBuild objects
+    :return: name: names of other packages from pkgs it (build) depends on
+    """
+    names = set(pkg.name for pkg in pkgs)
+    res: Dict[str, Set[str]] = {}
+    for pkg in pkgs:
+        deps = set(map(strip_version_constraint, pkg.dependencies + pkg.build_dependencies))
+        res[pkg.name] = (deps & names) - {pkg.name}
+    return res
+
+
+def get_srcinfo_dependencies(path: str, arch: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Everything makepkg needs installed to build the package per its .SRCINFO: depends, makedepends
+    and checkdepends of all its split packages, also the ones for given (default: this) arch
+    :return: None if there is no .SRCINFO
+    """
+    arch = arch or os.uname().machine
+    keys = set(key + suffix for key in ("depends", "makedepends", "checkdepends") for suffix in ("", "_" + arch))
+    try:
+        with open(path) as fh:
+            lines = fh.read().splitlines()
+    except OSError:
+        return None
+    res: List[str] = []
+    for line in lines:
+        key, sep, value = line.strip().partition(" = ")
+        if sep and key in keys and value not in res:
+            res.append(value)
+    return res
+
+
+def get_mem_available() -> Optional[int]:
+    """Available memory in bytes per /proc/meminfo, None if unknown"""
+    try:
+        with open("/proc/meminfo") as mi:
+            for line in mi:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def get_build_jobs(requested: int, mem_per_job: int) -> int:
+    """
+    Number of builds to run at once, limited by number of CPUs and available memory
+    :param mem_per_job: memory (bytes) one build is expected to need
+    """
+    jobs = min(max(1, requested), os.cpu_count() or 1)
+    mem_available = get_mem_available()
+    if mem_available is not None and mem_per_job > 0:
+        jobs = min(jobs, max(1, mem_available // mem_per_job))
+    return jobs
+
+
+def run_build_dag(pkgs: List, build: Callable[[object], Optional[str]], jobs: int) -> Dict[str, str]:
+    """
+    Builds packages so that every package is built only after packages it depends on, independent
+    packages are built concurrently (up to jobs at once). If build fails, packages depending on it
+    are not built at all.
+    :param pkgs: PackageToBuild objects, in preferred order
+    :param build: callable building one package, returns None on success or reason of failure
+    :return: name: reason for every package that failed or was cancelled
+    """
+    deps = get_build_dependencies(pkgs)
+    pending = list(pkgs)
+    built: Set[str] = set()
+    failed: Dict[str, str] = {}
+    running: Dict[Future, object] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        while pending or running:
+            cancelled = True
+            while cancelled:
+                cancelled = False
+                for pkg in list(pending):
+                    failed_deps = sorted(deps[pkg.name] & set(failed))
+                    if failed_deps:
+                        failed[pkg.name] = f"dependency {failed_deps[0]} failed"
+                        pending.remove(pkg)
+                        cancelled = True
+
+            ready = [pkg for pkg in pending if deps[pkg.name] <= built]
+            if not ready and not running and pending:
+                # circular dependency, let makepkg sort it out
+                ready = pending[:1]
+            for pkg in ready[:max(0, jobs - len(running))]:
+                pending.remove(pkg)
+                running[executor.submit(build, pkg)] = pkg
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                pkg = running.pop(future)
+                try:
+                    reason = future.result()
+                except Exception as e:
+                    reason = str(e)
+                if reason is None:
+                    built.add(pkg.name)
+                else:
+                    failed[pkg.name] = reason
+    return failed
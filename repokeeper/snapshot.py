@@ -0,0 +1,40 @@
+import os, posixpath, tarfile
+from typing import BinaryIO, Optional
+
+# AUR snapshots are PKGBUILD and few small files, anything bigger is refused
+SNAPSHOT_SIZE_LIMIT = 50 * 1024 * 1024
+
+
+def extract_snapshot(fileobj: BinaryIO, workdir: str, pkgbase: str, size_limit: int = SNAPSHOT_SIZE_LIMIT) -> Optional[str]:
+    """
+    Extracts (possibly compressed) tar stream of AUR snapshot into workdir, member by member as it
+    is read. Only members inside <pkgbase>/ are extracted, paths escaping it are refused.
+    :return: directory with PKGBUILD (<workdir>/<pkgbase>), None if snapshot had no PKGBUILD
+    """
+    compiledir = None
+    total_size = 0
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            name = posixpath.normpath(member.name)
+            if name.startswith("/") or name == ".." or name.startswith("../"):
+                raise ValueError("Snapshot of {} contains unsafe path: {}".format(pkgbase, member.name))
+            if name.split("/")[0] != pkgbase:
+                continue
+            if member.issym() or member.islnk():
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(name), member.linkname)
+                                            if member.issym() else member.linkname)
+                if member.linkname.startswith("/") or target.split("/")[0] != pkgbase:
+                    raise ValueError("Snapshot of {} contains unsafe link: {}".format(pkgbase, member.name))
+            elif not (member.isfile() or member.isdir()):
+                continue
+            total_size += member.size
+            if total_size > size_limit:
+                raise ValueError("Snapshot of {} is bigger than {} bytes".format(pkgbase, size_limit))
+            member.name = name
+            if hasattr(tarfile, "data_filter"):
+                tar.extract(member, workdir, filter="data")
+            else:
+                tar.extract(member, workdir)
+            if name == pkgbase + "/PKGBUILD":
+                compiledir = os.path.join(workdir, pkgbase)
+    return compiledir
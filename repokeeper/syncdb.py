@@ -0,0 +1,93 @@
+import glob, json, os, re, tarfile
+from typing import Dict, Iterable, Iterator, List, Set
+
+SYNC_DB_GLOB = "/var/lib/pacman/sync/*.db"
+
+
+def strip_version_constraint(dependency: str) -> str:
+    """'foo>=1.2' -> 'foo'"""
+    return re.split(r"[<>=]", dependency, 1)[0].strip()
+
+
+def iter_db_desc(db_file: str) -> Iterator[Dict[str, List[str]]]:
+    """Yields content of each desc file in pacman db as {'%NAME%': ['foo'], ...}"""
+    with tarfile.open(db_file, "r:*") as tar:
+        for member in tar:
+            if not member.isfile() or not member.name.endswith("/desc"):
+                continue
+            desc: Dict[str, List[str]] = {}
+            section = None
+            for line in tar.extractfile(member).read().decode('utf-8', 'replace').splitlines():
+                if line.startswith("%") and line.endswith("%"):
+                    section = line
+                    desc[section] = []
+                elif line and section is not None:
+                    desc[section].append(line)
+            yield desc
+
+
+def read_sync_db(db_file: str) -> Set[str]:
+    """Returns names of all packages in pacman sync db, including what they provide"""
+    names: Set[str] = set()
+    for desc in iter_db_desc(db_file):
+        for name in desc.get("%NAME%", []) + desc.get("%PROVIDES%", []):
+            names.add(strip_version_constraint(name))
+    return names
+
+
+def read_repo_db_files(db_file: str) -> Dict[str, str]:
+    """Returns package name: archive file name for each entry of repo db"""
+    return {desc["%NAME%"][0]: desc["%FILENAME%"][0] for desc in iter_db_desc(db_file)
+            if desc.get("%NAME%") and desc.get("%FILENAME%")}
+
+
+class SyncDbIndex(object):
+    """
+    Names of packages available in official (sync) repositories, dependencies found here
+    do not need to be looked for in AUR
+    """
+
+    def __init__(self, names: Set[str]) -> None:
+        self.names = names
+
+    def __contains__(self, dependency: str) -> bool:
+        return strip_version_constraint(dependency) in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def load(cls, cache_file: str, db_glob: str = SYNC_DB_GLOB, exclude: Iterable[str] = ()) -> "SyncDbIndex":
+        """
+        Returns index from cache_file if it was built from the same db files (compared by mtime),
+        otherwise reads the db files and stores the result into cache_file
+        :param exclude: names of repositories to ignore (like the one maintained by repokeeper)
+        """
+        dbs: Dict[str, float] = {}
+        for db_file in sorted(glob.glob(db_glob)):
+            if os.path.basename(db_file)[:-len(".db")] not in exclude:
+                dbs[db_file] = os.path.getmtime(db_file)
+
+        try:
+            with open(cache_file) as cf:
+                cached = json.load(cf)
+            if cached["dbs"] == dbs:
+                return cls(set(cached["names"]))
+        except (OSError, ValueError, KeyError):
+            pass
+
+        names: Set[str] = set()
+        for db_file in dbs:
+            try:
+                names.update(read_sync_db(db_file))
+            except (OSError, tarfile.TarError):
+                continue
+
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file + ".tmp", "w") as cf:
+                json.dump({"dbs": dbs, "names": sorted(names)}, cf)
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError:
+            pass
+        return cls(names)
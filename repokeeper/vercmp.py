@@ -0,0 +1,94 @@
+from functools import cmp_to_key
+from typing import Optional, Tuple
+
+# port of pacman's alpm_pkg_vercmp (lib/libalpm/version.c), so versions are ordered the way pacman orders them
+
+
+def _isdigit(ch: str) -> bool:
+    return "0" <= ch <= "9"
+
+
+def _isalpha(ch: str) -> bool:
+    return "a" <= ch <= "z" or "A" <= ch <= "Z"
+
+
+def _isalnum(ch: str) -> bool:
+    return _isdigit(ch) or _isalpha(ch)
+
+
+def rpmvercmp(a: str, b: str) -> int:
+    """Compares two version segments (no epoch/release), returns -1, 0 or 1"""
+    if a == b:
+        return 0
+    one = two = 0  # positions in a and b
+    ptr1 = ptr2 = 0
+    while one < len(a) and two < len(b):
+        while one < len(a) and not _isalnum(a[one]):
+            one += 1
+        while two < len(b) and not _isalnum(b[two]):
+            two += 1
+        if one >= len(a) or two >= len(b):
+            break
+        # different length of separators, the longer one wins
+        if one - ptr1 != two - ptr2:
+            return -1 if one - ptr1 < two - ptr2 else 1
+
+        ptr1, ptr2 = one, two
+        isnum = _isdigit(a[ptr1])
+        same_kind = _isdigit if isnum else _isalpha
+        while ptr1 < len(a) and same_kind(a[ptr1]):
+            ptr1 += 1
+        while ptr2 < len(b) and same_kind(b[ptr2]):
+            ptr2 += 1
+
+        # numeric segment is always newer than alpha one
+        if two == ptr2:
+            return 1 if isnum else -1
+
+        seg1, seg2 = a[one:ptr1], b[two:ptr2]
+        if isnum:
+            seg1, seg2 = seg1.lstrip("0"), seg2.lstrip("0")
+            if len(seg1) != len(seg2):
+                return 1 if len(seg1) > len(seg2) else -1
+        if seg1 != seg2:
+            return -1 if seg1 < seg2 else 1
+        one, two = ptr1, ptr2
+
+    if one >= len(a) and two >= len(b):
+        return 0
+    # remaining alpha string never beats an empty one
+    if (one >= len(a) and not _isalpha(b[two])) or (one < len(a) and _isalpha(a[one])):
+        return -1
+    return 1
+
+
+def parse_evr(evr: str) -> Tuple[str, str, Optional[str]]:
+    """'1:2.0-3' -> ('1', '2.0', '3'), epoch defaults to '0', release to None"""
+    epoch = "0"
+    pos = 0
+    while pos < len(evr) and _isdigit(evr[pos]):
+        pos += 1
+    if pos < len(evr) and evr[pos] == ":":
+        epoch = evr[:pos] or "0"
+        evr = evr[pos + 1:]
+    if "-" in evr:
+        version, release = evr.rsplit("-", 1)
+        return epoch, version, release
+    return epoch, evr, None
+
+
+def vercmp(a: str, b: str) -> int:
+    """Compares full versions ([epoch:]pkgver[-pkgrel]) same as pacman's vercmp, returns -1, 0 or 1"""
+    if a == b:
+        return 0
+    epoch1, ver1, rel1 = parse_evr(a)
+    epoch2, ver2, rel2 = parse_evr(b)
+    ret = rpmvercmp(epoch1, epoch2)
+    if ret == 0:
+        ret = rpmvercmp(ver1, ver2)
+        if ret == 0 and rel1 is not None and rel2 is not None:
+            ret = rpmvercmp(rel1, rel2)
+    return ret
+
+
+version_key = cmp_to_key(vercmp)
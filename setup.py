@@ -16,7 +16,6 @@ setup(
     install_requires=[
         'config_parser',
         'signal',
-        'packaging',
         'argsparse'
     ],
     entry_points={
@@ -0,0 +1,14 @@
+from repokeeper.repokeeper import Repo_Base
+from repokeeper.syncdb import SyncDbIndex
+from mock import patch
+
+
+def make_repo_base(pkgs_conf, cachedir, options=None, skip_dependencies=False, offline=False,
+                   repodir="/nonexistent/repo", builddir="/nonexistent/build"):
+    """Repo_Base with given config, without reading any config file or the real sync dbs"""
+    options = dict(options or {}, cachedir=cachedir)
+    with patch('repokeeper.repokeeper.get_conf_content', return_value=(pkgs_conf, repodir, builddir, "local-rk")), \
+            patch('repokeeper.repokeeper.get_conf_options', return_value=options):
+        rb = Repo_Base(skip_dependencies=skip_dependencies, offline=offline)
+    rb.sync_index = SyncDbIndex({"glibc", "python"})
+    return rb
@@ -0,0 +1,114 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from repokeeper.aur_dump import AurDumpIndex, iter_json_array, update_dump_index
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+
+def info(name, depends=(), makedepends=(), optdepends=()):
+    return {"Name": name, "PackageBase": name, "Version": "1.0-1", "URLPath": f"/{name}.tar.gz",
+            "Depends": list(depends), "MakeDepends": list(makedepends), "OptDepends": list(optdepends),
+            "Description": "x" * 100, "Votes": 1}
+
+
+class Test_AurDump(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.dumpdir = os.path.join(self.tmp, "cache", "aur-dump")
+        os.makedirs(self.dumpdir)
+
+    def write_dump(self, entries):
+        with gzip.open(os.path.join(self.dumpdir, "packages-meta-ext-v1.json.gz"), "wt") as fh:
+            fh.write("[\n" + ",\n".join(json.dumps(entry) for entry in entries) + "\n]\n")
+
+    def test_streaming_parser(self):
+        items = [info("pkg-{}".format(i), ["dep ä"]) for i in range(50)]
+        text = json.dumps(items, indent=1)
+        # items split across every possible chunk boundary
+        for chunk_size in (1, 7, 100, 1 << 16):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), items)
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] "))), [])
+        for broken in ("", "{}", '[{"Name": "a"}', '[{"Name": "a"'):
+            self.assertRaises(ValueError, list, iter_json_array(io.StringIO(broken), 4))
+
+    def test_index(self):
+        index = AurDumpIndex(os.path.join(self.tmp, "index.sqlite"))
+        self.assertEqual(index.rebuild([info("foo", ["bar"]), info("bar")], "v1"), 2)
+        found = index.get_many(["foo", "missing"])
+        self.assertEqual(list(found), ["foo"])
+        self.assertEqual(found["foo"]["Depends"], ["bar"])
+        self.assertNotIn("Description", found["foo"])
+        # failed rebuild keeps old content
+        self.assertRaises(KeyError, index.rebuild, [info("baz"), {"Version": "1"}], "v2")
+        self.assertEqual(sorted(index.get_many(["foo", "bar", "baz"])), ["bar", "foo"])
+        self.assertEqual(index.get_meta("source"), "v1")
+
+    def test_update_once_per_max_age(self):
+        self.write_dump([info("foo")])
+        index = AurDumpIndex(os.path.join(self.tmp, "index.sqlite"))
+        http = MagicMock()
+        url = "http://aur/packages-meta-ext-v1.json.gz"
+        self.assertTrue(update_dump_index(index, http, url, self.dumpdir, 3600))
+        http.download.assert_called_once_with(url, self.dumpdir)
+        # not checked again within max_age, dump not changed: index not rebuilt
+        self.assertFalse(update_dump_index(index, http, url, self.dumpdir, 3600))
+        self.assertEqual(http.download.call_count, 1)
+        self.write_dump([info("foo"), info("bar")])
+        self.assertTrue(update_dump_index(index, http, url, self.dumpdir, 0, offline=True))
+        self.assertEqual(http.download.call_count, 1)
+        self.assertEqual(len(index), 2)
+        # index built with other fields is rebuilt from the same dump
+        index.set_meta("fields", "Name,Version")
+        self.assertTrue(update_dump_index(index, http, url, self.dumpdir, 3600))
+        self.assertFalse(update_dump_index(index, http, url, self.dumpdir, 3600))
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_planning_without_rpc(self):
+        self.write_dump([info("app", ["lib", "glibc"], ["tool"], ["extra: for extras"]), info("lib"),
+                         info("tool", [], ["lib"])])
+        rb = make_repo_base(["app", "missing"], os.path.join(self.tmp, "cache"), options={"metadata_source": "dump"})
+        with patch('repokeeper.http_client.HttpClient.download') as download, \
+                patch('repokeeper.http_client.HttpClient.get_json') as get_json:
+            pkgs = rb.check_aur_web()
+            download.assert_called_once()
+            get_json.assert_not_called()
+        self.assertEqual(sorted(pkg.name for pkg in pkgs), ["app", "lib", "tool"])
+        # optional and check dependencies are known for retention too
+        self.assertEqual(rb.aur_dependencies["app"]["optdepend"], ["extra: for extras"])
+        self.assertEqual(rb.report.counters["aur_dump_lookups"], 4)
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_fallback_to_rpc(self):
+        rb = make_repo_base(["app"], os.path.join(self.tmp, "cache"), options={"metadata_source": "dump"}, offline=True)
+        self.assertEqual(rb.fetch_pcks_info_from_aur_web(["app"]), {})
+        self.assertIsNone(rb.load_aur_dump())
+        # dump is tried again later, config stays as it is
+        self.assertEqual(rb.metadata_source, "dump")
+        self.assertGreater(rb.aur_dump_retry_at, 0)
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_failed_download_keeps_dump(self):
+        self.write_dump([info("app")])
+        rb = make_repo_base(["app"], os.path.join(self.tmp, "cache"), options={"metadata_source": "dump"})
+        with patch('repokeeper.http_client.HttpClient.download') as download, \
+                patch('repokeeper.http_client.HttpClient.get_json') as get_json:
+            self.assertEqual(list(rb.fetch_pcks_info_from_aur_web(["app"])), ["app"])
+            rb.aur_dump.set_meta("checked", "0")  # dump is due to be downloaded again
+            download.side_effect = OSError("connection reset")
+            self.assertEqual(list(rb.fetch_pcks_info_from_aur_web(["app"])), ["app"])
+            self.assertEqual(list(rb.fetch_pcks_info_from_aur_web(["app"])), ["app"])
+            get_json.assert_not_called()
+        # not downloaded again right after the failure
+        self.assertEqual(download.call_count, 2)
+        rb.aur_dump.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
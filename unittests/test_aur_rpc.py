@@ -0,0 +1,105 @@
+import tempfile
+import unittest
+from urllib.parse import unquote
+from repokeeper.repokeeper import split_rpc_args, get_rpc_url
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+
+def fake_response(results):
+    return {"version": 5, "type": "multiinfo", "resultcount": len(results), "results": results}
+
+
+def fake_aur(packages):
+    """Returns HttpClient.get_json replacement answering from packages dict (name: (depends, makedepends))"""
+    def get_json(url):
+        names = [unquote(arg) for arg in url.split("&arg[]=")[1:]]
+        return fake_response([{"Name": name, "Version": "1.0-1", "URLPath": f"/{name}.tar.gz",
+                               "Depends": packages[name][0], "MakeDepends": packages[name][1]}
+                              for name in names if name in packages])
+    return patch('repokeeper.http_client.HttpClient.get_json', side_effect=get_json)
+
+
+@patch('repokeeper.repokeeper.Logger.log', MagicMock())
+class Test_AurRpc(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cachedir = tmp.name
+
+    def test_urls_chunking(self):
+        names = [f"package-{i:04d}" for i in range(500)]
+        base_url = "http://aur/rpc?v=5&type=info"
+        chunks = split_rpc_args(names, base_url=base_url, max_len=300)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(get_rpc_url(chunk, base_url)), 300)
+        self.assertEqual(sum(chunks, []), names)
+
+    def test_urls_quoting(self):
+        self.assertEqual(len(split_rpc_args(["gtk+", "a b"])), 1)
+        self.assertTrue(get_rpc_url(["gtk+", "a b"]).endswith("&arg[]=gtk%2B&arg[]=a%20b"))
+
+    @patch('repokeeper.http_client.HttpClient.get_json')
+    def test_partial_results(self, fake_get_json):
+        fake_get_json.return_value = fake_response([{"Name": "foo", "Version": "1.0-1"}])
+        rb = make_repo_base([], self.cachedir)
+        res = rb.fetch_pcks_info_from_aur_web(["foo", "missing", "foo"])
+        self.assertEqual(fake_get_json.call_count, 1)
+        self.assertEqual(list(res.keys()), ["foo"])
+
+    def test_dependency_frontier(self):
+        aur = {"app": (["lib-a", "glibc>=2.35"], ["tool"]),
+               "lib-a": (["lib-b"], []),
+               "tool": (["lib-b", "app"], []),
+               "lib-b": ([], ["lib-c"]),
+               "lib-c": ([], [])}
+        with fake_aur(aur) as fake_get_json:
+            rb = make_repo_base(["app"], self.cachedir)
+            res = rb.check_aur_web()
+        self.assertEqual(sorted(p.name for p in res), ["app", "lib-a", "lib-b", "lib-c", "tool"])
+        queried = "".join(call.args[0] for call in fake_get_json.call_args_list)
+        self.assertNotIn("glibc", queried)
+        # one query for config, one per dependency level
+        self.assertEqual(fake_get_json.call_count, 4)
+
+    def test_request_budget(self):
+        aur = {"app": (["lib-a"], []), "lib-a": (["lib-b"], []), "lib-b": ([], [])}
+        with fake_aur(aur) as fake_get_json:
+            rb = make_repo_base(["app"], self.cachedir, options={"aur_request_budget": "2"})
+            res = rb.check_aur_web()
+        self.assertEqual(fake_get_json.call_count, 2)
+        self.assertEqual([p.name for p in res], ["app", "lib-a"])
+
+    def test_budget_skipped_not_reported_missing(self):
+        names = [f"package-{i:04d}" for i in range(400)]
+        with fake_aur({name: ([], []) for name in names}), patch('repokeeper.repokeeper.Logger.log') as fake_log:
+            rb = make_repo_base(names, self.cachedir, options={"aur_request_budget": "1"}, skip_dependencies=True)
+            res = rb.check_aur_web()
+        logged = [call.kwargs.get("log_txt") or "" for call in fake_log.call_args_list]
+        self.assertTrue(0 < len(res) < len(names))
+        self.assertEqual(sum("not checked, AUR request budget exhausted" in text for text in logged),
+                         len(names) - len(res))
+        self.assertFalse(any("not found in AUR" in text for text in logged))
+
+    def test_cache_and_offline(self):
+        aur = {"app": (["lib-a"], []), "lib-a": ([], [])}
+        with fake_aur(aur) as fake_get_json:
+            rb = make_repo_base(["app", "typo"], self.cachedir)
+            first = rb.check_aur_web()
+            rb.aur_cache.close()
+            self.assertEqual(fake_get_json.call_count, 2)
+            # second run is served from cache entirely, including the not found name
+            rb = make_repo_base(["app", "typo"], self.cachedir)
+            second = rb.check_aur_web()
+            rb.aur_cache.close()
+            self.assertEqual(fake_get_json.call_count, 2)
+        self.assertEqual([p.name for p in first], [p.name for p in second])
+
+        with fake_aur(aur) as fake_get_json:
+            rb = make_repo_base(["app"], self.cachedir, options={"aur_cache_ttl": "0"}, offline=True)
+            offline = rb.check_aur_web()
+            rb.aur_cache.close()
+            self.assertEqual(fake_get_json.call_count, 0)
+        self.assertEqual([p.name for p in offline], ["app", "lib-a"])
@@ -0,0 +1,66 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_aur import FakeAur, make_packages
+from fixtures import generate_repo
+from repokeeper.http_client import HttpClient
+from repokeeper.repodb import read_package
+
+
+class Test_Benchmarks(unittest.TestCase):
+    """The benchmark harness has to keep working as repokeeper changes"""
+
+    def test_fake_aur(self):
+        in_config, packages = make_packages("chain", 3)
+        self.assertEqual(in_config, ["bench-pkg-00000"])
+        aur = FakeAur(packages).start()
+        self.addCleanup(aur.stop)
+        http = HttpClient()
+        data = http.get_json(aur.url + "/rpc/?v=5&type=info&arg[]=bench-pkg-00000&arg[]=missing")
+        self.assertEqual([r["Name"] for r in data["results"]], ["bench-pkg-00000"])
+        self.assertEqual(data["results"][0]["Depends"], ["bench-pkg-00001", "glibc"])
+        self.assertEqual(http.get(aur.url + data["results"][0]["URLPath"]).status, 200)
+        http.close()
+
+    def test_fake_aur_dump(self):
+        in_config, packages = make_packages("flat", 3)
+        aur = FakeAur(packages).start()
+        self.addCleanup(aur.stop)
+        http = HttpClient()
+        with tempfile.TemporaryDirectory() as cachedir:
+            for _ in range(2):  # second download is conditional, answered by 304
+                path = http.download(aur.url + "/packages-meta-ext-v1.json.gz", cachedir)
+            with gzip.open(path, "rt") as fh:
+                self.assertEqual([entry["Name"] for entry in json.load(fh)], in_config)
+        self.assertEqual(aur.requests, 2)
+        http.close()
+
+    def test_generated_repo(self):
+        with tempfile.TemporaryDirectory() as repodir:
+            generate_repo(repodir, 2, versions=2)
+            self.assertEqual(len(os.listdir(repodir)), 4)
+            info = read_package(os.path.join(repodir, "repo-pkg-00001-2.0-1-any.pkg.tar.zst"))
+            self.assertEqual(info["pkginfo"]["pkgname"], ["repo-pkg-00001"])
+
+    def test_run_benchmark(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            report = os.path.join(tmp, "bench.json")
+            subprocess.check_call([sys.executable, os.path.join(BENCHMARKS_DIR, "run_benchmark.py"), "--shape", "chain",
+                                   "--aur-packages", "2", "--repo-packages", "3", "--latency", "0",
+                                   "--report", report], stdout=subprocess.DEVNULL)
+            with open(report) as fh:
+                results = json.load(fh)["results"]
+        self.assertEqual(results["cold"]["built"], 2)
+        self.assertEqual(results["warm"]["built"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
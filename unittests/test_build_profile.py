@@ -0,0 +1,128 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from repokeeper.build_profile import BuildProfile, ProfileStats
+from repokeeper.config_parser import get_conf_profiles
+from repokeeper.repokeeper import PackageToBuild
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+SOURCE_DROPINS = 'for conf in /etc/makepkg.conf.d/*.conf; do if [[ -r $conf ]]; then source "$conf"; fi; done'
+SOURCE_USER = ('if [[ -r "${XDG_CONFIG_HOME:-$HOME/.config}/pacman/makepkg.conf" ]]; then '
+               'source "${XDG_CONFIG_HOME:-$HOME/.config}/pacman/makepkg.conf"; '
+               'elif [[ -r "$HOME/.makepkg.conf" ]]; then source "$HOME/.makepkg.conf"; fi')
+
+
+class Test_BuildProfile(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def test_makepkg_conf(self):
+        profile = BuildProfile("fast", makeflags="-j6", compiler_cache="ccache", compress_level=3, compress_threads=0)
+        self.assertEqual(profile.makepkg_conf(builddir="/dev/shm/rk/foo").splitlines(), [
+            "# build profile fast, generated by repokeeper", "source /etc/makepkg.conf", SOURCE_DROPINS, SOURCE_USER,
+            "MAKEFLAGS=-j6", "BUILDENV+=(ccache)", "COMPRESSZST=(zstd -c -z -q -T0 -3 -)", "BUILDDIR=/dev/shm/rk/foo"])
+        # nothing set: only system, drop-in and user makepkg.conf
+        self.assertEqual(BuildProfile("plain").makepkg_conf().splitlines()[1:],
+                         ["source /etc/makepkg.conf", SOURCE_DROPINS, SOURCE_USER])
+        with patch('os.cpu_count', return_value=8):
+            self.assertEqual(BuildProfile("auto", makeflags="auto").get_makeflags(jobs=3), "-j2")
+        self.assertIn("--ultra -22", BuildProfile("max", compress_level=22).makepkg_conf())
+
+    @unittest.skipUnless(shutil.which("bash"), "bash needed")
+    def test_makepkg_conf_sources_like_makepkg(self):
+        base_conf = os.path.join(self.tmp, "makepkg.conf")
+        with open(base_conf, "w") as fh:
+            fh.write("PACKAGER=system\nBUILDENV=(!sign)\nMAKEFLAGS=-j1\n")
+        os.makedirs(base_conf + ".d")
+        with open(os.path.join(base_conf + ".d", "rust.conf"), "w") as fh:
+            fh.write("RUSTFLAGS=dropin\n")
+        os.makedirs(os.path.join(self.tmp, ".config", "pacman"))
+        with open(os.path.join(self.tmp, ".makepkg.conf"), "w") as fh:
+            fh.write("PACKAGER=home\n")
+        conf = os.path.join(self.tmp, "generated.conf")
+        with open(conf, "w") as fh:
+            fh.write(BuildProfile("fast", makeflags="-j6", base_conf=base_conf).makepkg_conf())
+        env = {"HOME": self.tmp, "PATH": os.environ.get("PATH", "")}
+        show = 'source "$1"; echo "$PACKAGER $RUSTFLAGS $MAKEFLAGS"'
+        self.assertEqual(subprocess.check_output(["bash", "-c", show, "-", conf], env=env).decode().strip(),
+                         "home dropin -j6")
+        # XDG config wins over ~/.makepkg.conf
+        with open(os.path.join(self.tmp, ".config", "pacman", "makepkg.conf"), "w") as fh:
+            fh.write("PACKAGER=xdg\nGPGKEY=ABC\n")
+        self.assertEqual(subprocess.check_output(["bash", "-c", show, "-", conf], env=env).decode().split()[0], "xdg")
+
+    def test_from_options(self):
+        conffile = os.path.join(self.tmp, "repokeeper.conf")
+        with open(conffile, "w") as fh:
+            fh.write("[packages]\nfoo\n\n[profile:big]\nmakeflags=auto\ntmpfs_dir=/dev/shm\ntmpfs_min_memory=4096\n"
+                     "packages=foo bar\n\n[profile:bad]\ncompiler_cache=distcc\n")
+        profiles = get_conf_profiles(conffile)
+        self.assertEqual(sorted(profiles), ["bad", "big"])
+        big = BuildProfile.from_options("big", profiles["big"])
+        self.assertEqual((big.makeflags, big.tmpfs_min_memory, big.packages), ("auto", 4096, ["foo", "bar"]))
+        self.assertRaises(ValueError, BuildProfile.from_options, "bad", profiles["bad"])
+
+    def test_tmpfs_needs_memory(self):
+        profile = BuildProfile("tmp", tmpfs_dir=self.tmp, tmpfs_min_memory=100)
+        self.assertTrue(profile.use_tmpfs(200 * 1024 * 1024))
+        self.assertFalse(profile.use_tmpfs(50 * 1024 * 1024))
+        self.assertFalse(profile.use_tmpfs(None))
+        self.assertFalse(BuildProfile("none").use_tmpfs(200 * 1024 * 1024))
+
+    def test_stats_persisted(self):
+        path = os.path.join(self.tmp, "stats.json")
+        ProfileStats(path).record("foo", "fast", 2.0, 100, True)
+        stats = ProfileStats(path)
+        stats.record("foo", "fast", 1.0, 90, True)
+        entry = ProfileStats(path).entries["foo"]["fast"]
+        self.assertEqual((entry["builds"], entry["seconds_total"], entry["seconds_last"], entry["archive_bytes"]),
+                         (2, 3.0, 1.0, 90))
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_build_with_profile(self):
+        repodir, builddir = os.path.join(self.tmp, "repo"), os.path.join(self.tmp, "build")
+        os.makedirs(repodir)
+        rb = make_repo_base(["foo"], os.path.join(self.tmp, "cache"), repodir=repodir, builddir=builddir)
+        rb.build_profiles = {"fast": BuildProfile("fast", makeflags="-j3", tmpfs_dir=self.tmp),
+                             "slow": BuildProfile("slow", packages=["bar"])}
+        rb.build_profile = "fast"
+        self.assertEqual(rb.get_build_profile("other").name, "fast")
+        self.assertEqual(rb.get_build_profile("bar").name, "slow")
+        rb.build_profile = ""
+        self.assertIsNone(rb.get_build_profile("foo"))
+        rb.build_profile = "fast"
+
+        def fetch_sources(pkg_to_build, workdir):
+            os.makedirs(os.path.join(workdir, "foo"))
+            open(os.path.join(workdir, "foo", "PKGBUILD"), "w").close()
+            return os.path.join(workdir, "foo")
+
+        def makepkg(cmd, log_file, echo, cwd, **kwargs):
+            conf = cmd.split("--config ")[1]
+            with open(conf) as fh:
+                calls.append(fh.read())
+            with open(os.path.join(cwd, "foo-1.0-1-any.pkg.tar.zst"), "w") as fh:
+                fh.write("archive")
+            return 0
+
+        calls = []
+        with patch.object(rb, "fetch_sources", side_effect=fetch_sources), \
+                patch('repokeeper.repokeeper.run_logged', side_effect=makepkg), \
+                patch('repokeeper.scheduler.get_mem_available', return_value=1 << 30):
+            self.assertIsNone(rb.build_package(PackageToBuild("foo", "", [], [], "foo", "1.0-1"), 1))
+        self.assertIn("MAKEFLAGS=-j3", calls[0])
+        tmpfs_dir = os.path.join(self.tmp, "repokeeper-{}".format(os.getuid()), "foo")
+        self.assertIn("BUILDDIR=" + tmpfs_dir, calls[0])
+        self.assertFalse(os.path.exists(tmpfs_dir))
+        self.assertEqual(rb.report.packages["foo"]["profile"], "fast")
+        self.assertEqual(rb.profile_stats.entries["foo"]["fast"]["archive_bytes"], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
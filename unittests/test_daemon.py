@@ -0,0 +1,174 @@
+import os
+import tempfile
+import threading
+import unittest
+from repokeeper.config_parser import get_conf_priorities
+from repokeeper.daemon import FileWatcher, PollSchedule, StatusServer, query_status
+from repokeeper.repokeeper import Repo_Base
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+
+class Test_Daemon(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def test_poll_schedule(self):
+        schedule = PollSchedule({"high": 10, "normal": 100, "low": 1000})
+        schedule.update({"b": "normal", "a": "low", "c": "high"}, 0)
+        self.assertEqual(schedule.due(0), ["c", "b", "a"])
+        schedule.checked(["a", "b", "c"], 0)
+        self.assertEqual(schedule.due(50), ["c"])
+        self.assertEqual(schedule.next_due(), 10)
+        # package moved to higher priority is due sooner, new one right away, dropped one is forgotten
+        schedule.update({"a": "high", "b": "normal", "d": "low"}, 5)
+        self.assertEqual(schedule.due(5), ["d"])
+        self.assertEqual(schedule.due(15), ["a", "d"])
+        self.assertNotIn("c", schedule.next_check)
+
+    def test_conf_priorities(self):
+        conffile = os.path.join(self.tmp, "repokeeper.conf")
+        with open(conffile, "w") as fh:
+            fh.write("[packages]\nfoo\nbar high\nbaz   low\n\n[options]\nrepodir=/repo\nbuilddir=/build\n")
+        self.assertEqual(get_conf_priorities(conffile), {"foo": "normal", "bar": "high", "baz": "low"})
+        with open(conffile, "w") as fh:
+            fh.write("[packages]\nqux urgent\n")
+        self.assertRaises(ValueError, get_conf_priorities, conffile)
+
+    def check_watcher(self, use_inotify):
+        path = os.path.join(self.tmp, "repokeeper.conf")
+        with open(path, "w") as fh:
+            fh.write("[packages]\n")
+        watcher = FileWatcher(path, poll_interval=0.05, use_inotify=use_inotify)
+        self.addCleanup(watcher.close)
+        self.assertFalse(watcher.wait(0.1))
+        with open(os.path.join(self.tmp, "other"), "w") as fh:
+            fh.write("x")
+        self.assertFalse(watcher.wait(0.1))
+        # editor writing new file and renaming it over the old one
+        timer = threading.Timer(0.1, lambda: (open(path + ".new", "w").write("[packages]\nfoo\n"),
+                                              os.replace(path + ".new", path)))
+        timer.start()
+        self.assertTrue(watcher.wait(5))
+        timer.join()
+        return watcher.method
+
+    def test_file_watcher(self):
+        self.assertEqual(self.check_watcher(use_inotify=False), "polling")
+        self.check_watcher(use_inotify=True)
+
+    def test_status_server(self):
+        path = os.path.join(self.tmp, "status.sock")
+        server = StatusServer(path, lambda: {"state": "idle"}).start()
+        self.assertEqual(query_status(path), {"state": "idle"})
+        self.assertRaises(OSError, StatusServer, path, dict)
+        server.close()
+        self.assertFalse(os.path.exists(path))
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_only_moved_packages_are_built(self):
+        repodir = os.path.join(self.tmp, "repo")
+        os.makedirs(repodir)
+        open(os.path.join(repodir, "foo-1.0-1-any.pkg.tar.zst"), "w").close()
+        rb = make_repo_base(["foo"], os.path.join(self.tmp, "cache"), {"db_writer": "repo-add"}, skip_dependencies=True,
+                            repodir=repodir)
+        rb.polls = 0
+        infos = {"foo": {"Name": "foo", "Version": "1.0-1", "URLPath": "/foo.tar.gz"}}
+        with patch.object(rb, "fetch_pcks_info_from_aur_web", return_value=infos), \
+                patch.object(rb, "building", return_value=[]) as building, \
+                patch.object(rb, "update_repo_file") as update_repo_file:
+            self.assertEqual(rb.poll_packages(["foo"]), [])
+            building.assert_not_called()
+            update_repo_file.assert_not_called()
+            infos["foo"]["Version"] = "1.1-1"
+            rb.poll_packages(["foo"])
+            self.assertEqual([pkg.name for pkg in building.call_args[0][0]], ["foo"])
+            update_repo_file.assert_called_once_with(exit_on_failure=False)
+        self.assertEqual(rb.aur_versions, {"foo": "1.1-1"})
+        self.assertEqual(rb.polls, 2)
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_failed_round_keeps_daemon_running(self):
+        repodir = os.path.join(self.tmp, "repo")
+        os.makedirs(repodir)
+        rb = make_repo_base(["foo"], os.path.join(self.tmp, "cache"), {"db_writer": "repo-add"}, skip_dependencies=True,
+                            repodir=repodir)
+        rb.polls = 0
+        rb.schedule = PollSchedule({"high": 10, "normal": 100, "low": 1000})
+        rb.schedule.update({"foo": "normal"}, 0)
+        infos = {"foo": {"Name": "foo", "Version": "1.0-1", "URLPath": "/foo.tar.gz"}}
+        with patch.object(rb, "fetch_pcks_info_from_aur_web", return_value=infos), \
+                patch.object(rb, "building", return_value=[]), \
+                patch.object(rb, "refresh_repo_db", side_effect=[ValueError("repo-add failed"), None]) as refresh:
+            rb.poll_round(["foo"])  # repo db failure does not exit
+            self.assertTrue(rb.repo_db_pending)
+            self.assertGreater(rb.schedule.next_check["foo"], 0)
+            # nothing new to build, db update is tried again
+            open(os.path.join(repodir, "foo-1.0-1-any.pkg.tar.zst"), "w").close()
+            rb.poll_round(["foo"])
+        self.assertEqual(refresh.call_count, 2)
+        self.assertFalse(rb.repo_db_pending)
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    @patch('repokeeper.repokeeper.Logger.configure', MagicMock())
+    def test_invalid_config_not_reloaded(self):
+        conffile = os.path.join(self.tmp, "repokeeper.conf")
+        config = "[packages]\n{}\n\n[options]\nrepodir={}\nbuilddir=/build\ncachedir={}\ndb_writer=repo-add\n{}"
+        with open(conffile, "w") as fh:
+            fh.write(config.format("foo", "/repo", self.tmp, ""))
+        rb = Repo_Base(conffile=conffile)
+        with open(conffile, "w") as fh:
+            fh.write(config.format("bar", "/elsewhere", self.tmp, "metadata_source=bogus\n"))
+        self.assertIsNone(rb.reload_config())
+        self.assertEqual((rb.pkgs_conf, rb.repodir, rb.metadata_source, rb.options["repodir"]),
+                         (["foo"], "/repo", "rpc", "/repo"))
+        with open(conffile, "w") as fh:
+            fh.write(config.format("bar high", "/elsewhere", self.tmp, ""))
+        self.assertEqual(rb.reload_config(), {"bar": "high"})
+        self.assertEqual((rb.pkgs_conf, rb.repodir), (["bar"], "/elsewhere"))
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    @patch('repokeeper.repokeeper.Logger.configure')
+    def test_paths_expanded(self, configure):
+        conffile = os.path.join(self.tmp, "repokeeper.conf")
+        with open(conffile, "w") as fh:
+            fh.write("[packages]\nfoo\n\n[options]\nrepodir=~/repo\nbuilddir=~/build\ncachedir=~/cache\n"
+                     "logfile=~/repokeeper.log\ndb_writer=repo-add\n")
+        with patch.dict(os.environ, {"HOME": self.tmp}):
+            rb = Repo_Base(conffile=conffile)
+        home = lambda *parts: os.path.join(self.tmp, *parts)
+        self.assertEqual((rb.repodir, rb.builddir, rb.cachedir, rb.srcdest, rb.build_logdir, rb.status_socket),
+                         (home("repo"), home("build"), home("cache"), home("cache", "sources"),
+                          home("cache", "build-logs"), home("cache", "repokeeper.sock")))
+        self.assertEqual(configure.call_args[0][0], home("repokeeper.log"))
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    @patch('repokeeper.repokeeper.Logger.configure', MagicMock())
+    def test_reload_resets_aur_clients(self):
+        conffile = os.path.join(self.tmp, "repokeeper.conf")
+        config = "[packages]\nfoo\n\n[options]\nrepodir=/repo\nbuilddir=/build\ncachedir={}\ndb_writer=repo-add\n{}"
+        with open(conffile, "w") as fh:
+            fh.write(config.format(self.tmp, "aur_rate=2\n"))
+        rb = Repo_Base(conffile=conffile)
+        http, executor, limiter, cache = rb.http, rb.aur_executor, rb.aur_limiter, rb.load_aur_cache()
+        self.addCleanup(lambda: rb.aur_executor.shutdown())
+        # options of AUR clients unchanged: they are kept
+        self.assertIsNotNone(rb.reload_config())
+        self.assertEqual((rb.http, rb.aur_executor, rb.aur_limiter, rb.load_aur_cache()),
+                         (http, executor, limiter, cache))
+        with open(conffile, "w") as fh:
+            fh.write(config.format(self.tmp, "aur_rate=5\naur_concurrency=2\naur_cache_ttl=60\n"))
+        self.assertIsNotNone(rb.reload_config())
+        self.assertIsNot(rb.http, http)
+        self.assertIs(rb.http.limiter, rb.aur_limiter)
+        self.assertEqual(rb.aur_limiter.rate, 5)
+        self.assertEqual(rb.aur_executor._max_workers, 2)
+        self.assertEqual(rb.load_aur_cache().ttl, 60)
+        rb.aur_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
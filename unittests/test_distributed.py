@@ -0,0 +1,185 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from repokeeper.distributed import Coordinator, parse_address, run_worker
+from repokeeper.repokeeper import PackageToBuild
+from repokeeper.scheduler import run_build_dag
+
+SECRET = "s3cret"
+
+
+def fake_build(built_by, name, started=None, release=None):
+    """Build function of worker, writes archive and signature of the package"""
+    def build(job, outbox):
+        built_by.setdefault(name, []).append(job["name"])
+        if started is not None:
+            started.release()
+            release.wait(10)
+        if job["name"] == "broken":
+            return "makepkg RC: 2", []
+        files = []
+        for suffix in ("", ".sig"):
+            files.append(os.path.join(outbox, "{}-1.0-1-any.pkg.tar.zst{}".format(job["name"], suffix)))
+            with open(files[-1], "w") as fh:
+                fh.write("built by " + name)
+        return None, files
+    return build
+
+
+class Test_Distributed(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.repodir = os.path.join(self.tmp, "repo")
+        os.makedirs(self.repodir)
+        self.coordinator = Coordinator(("127.0.0.1", 0), self.repodir, SECRET, retries=2, worker_timeout=5, heartbeat=0.2)
+        self.coordinator.start()
+        self.addCleanup(self.coordinator.stop)
+        self.built_by = {}
+
+    def start_worker(self, name, slots, build=None):
+        thread = threading.Thread(target=run_worker, args=(self.coordinator.address, slots,
+                                                           build or fake_build(self.built_by, name),
+                                                           os.path.join(self.tmp, name), SECRET, name, 0.2),
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for_capacity(self, capacity):
+        for _ in range(100):
+            if self.coordinator.capacity >= capacity:
+                return
+            threading.Event().wait(0.05)
+        self.fail("workers did not connect")
+
+    def job(self, name):
+        return {"name": name, "url": "", "dependencies": [], "build_dependencies": [], "pkgbase": name,
+                "version": "1.0-1"}
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("builder:8000"), ("builder", 8000))
+        self.assertEqual(parse_address("8000"), ("127.0.0.1", 8000))
+        self.assertEqual(parse_address("0.0.0.0:8000"), ("0.0.0.0", 8000))
+        self.assertEqual(parse_address("builder"), ("builder", 7755))
+
+    def test_build_dag_on_workers(self):
+        workers = [self.start_worker("w{}".format(i), 1) for i in range(3)]
+        self.wait_for_capacity(3)
+        pkgs = [PackageToBuild("app", "", ["lib"], []), PackageToBuild("lib", "", [], []),
+                PackageToBuild("tool", "", [], []), PackageToBuild("broken", "", [], []),
+                PackageToBuild("needs-broken", "", ["broken"], [])]
+        failed = run_build_dag(pkgs, lambda pkg: self.coordinator.build(dict(vars(pkg))), len(pkgs))
+
+        self.assertEqual(failed, {"broken": "makepkg RC: 2", "needs-broken": "dependency broken failed"})
+        self.coordinator.stop()
+        self.assertEqual(sorted(os.listdir(self.repodir)), sorted(
+            "{}-1.0-1-any.pkg.tar.zst{}".format(name, suffix) for name in ("app", "lib", "tool") for suffix in ("", ".sig")))
+        for worker in workers:
+            worker.join(5)
+            self.assertFalse(worker.is_alive())
+
+    def test_capacity_aware_assignment(self):
+        started, release = threading.Semaphore(0), threading.Event()
+        self.start_worker("big", 2, fake_build(self.built_by, "big", started, release))
+        self.wait_for_capacity(2)
+        self.start_worker("small", 1, fake_build(self.built_by, "small", started, release))
+        self.wait_for_capacity(3)
+        threads = [threading.Thread(target=self.coordinator.build, args=(self.job("p{}".format(i)),)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for _ in range(3):
+            self.assertTrue(started.acquire(timeout=5))
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(self.built_by["big"]), 2)
+        self.assertEqual(len(self.built_by["small"]), 1)
+
+    def test_dead_worker_job_is_rescheduled(self):
+        # worker that takes the job and dies
+        dead = socket.create_connection(self.coordinator.address)
+        dead.sendall(json.dumps({"type": "hello", "name": "dead", "slots": 5, "secret": SECRET}).encode() + b"\n")
+        self.wait_for_capacity(5)
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(reason=self.coordinator.build(self.job("foo"))))
+        thread.start()
+        job = json.loads(dead.makefile("rb").readline())
+        self.assertEqual(job["package"]["name"], "foo")
+        self.start_worker("alive", 1)
+        dead.close()
+        thread.join(5)
+        self.assertIsNone(result["reason"])
+        self.assertEqual(self.built_by, {"alive": ["foo"]})
+
+    def test_silent_worker_is_dropped(self):
+        silent = socket.create_connection(self.coordinator.address)
+        self.addCleanup(silent.close)
+        silent.sendall(json.dumps({"type": "hello", "name": "silent", "slots": 1, "secret": SECRET}).encode() + b"\n")
+        self.wait_for_capacity(1)
+        self.start_worker("alive", 1)
+        self.wait_for_capacity(2)
+        self.coordinator.build(self.job("foo"))  # goes to either worker
+        reasons = [self.coordinator.build(self.job("bar")), self.coordinator.build(self.job("baz"))]
+        self.assertEqual(reasons, [None, None])
+        self.assertEqual(self.coordinator.capacity, 1)
+
+    def test_wrong_secret_rejected(self):
+        with self.assertRaises(PermissionError):
+            run_worker(self.coordinator.address, 1, fake_build(self.built_by, "intruder"),
+                       os.path.join(self.tmp, "intruder"), "guess", "intruder", 0.2, connect_timeout=5)
+        self.assertEqual(self.coordinator.capacity, 0)
+
+    def test_dependencies_sent_with_job(self):
+        received = {}
+
+        def build(job, outbox):
+            received.update((os.path.basename(path), open(path).read()) for path in job["dependency_files"])
+            return fake_build(self.built_by, "worker")(job, outbox)
+        dependency = os.path.join(self.repodir, "lib-1.0-1-any.pkg.tar.zst")
+        with open(dependency, "w") as fh:
+            fh.write("library")
+        self.start_worker("worker", 1, build)
+        self.assertIsNone(self.coordinator.build(self.job("app"), [dependency]))
+        self.assertEqual(received, {"lib-1.0-1-any.pkg.tar.zst": "library"})
+        self.assertEqual(sorted(name for name in os.listdir(self.repodir) if not name.startswith(".")),
+                         ["app-1.0-1-any.pkg.tar.zst", "app-1.0-1-any.pkg.tar.zst.sig", "lib-1.0-1-any.pkg.tar.zst"])
+
+    def test_only_package_files_accepted(self):
+        def build(job, outbox):
+            files = [os.path.join(outbox, name) for name in ("foo-1.0-1-any.pkg.tar.zst", "local-rk.db.tar.gz")]
+            for path in files:
+                with open(path, "w") as fh:
+                    fh.write("evil")
+            return None, files
+        self.start_worker("evil", 1, build)
+        self.wait_for_capacity(1)
+        # worker is dropped, job fails as there is nobody else
+        self.coordinator.worker_timeout = 0.5
+        self.assertIsNotNone(self.coordinator.build(self.job("foo")))
+        self.assertEqual([name for name in os.listdir(self.repodir) if not name.startswith(".")], [])
+
+    def test_result_of_unknown_job_rejected(self):
+        def evil_worker():
+            with socket.create_connection(self.coordinator.address) as sock, sock.makefile("rb") as rfile:
+                sock.sendall(json.dumps({"type": "hello", "name": "evil", "slots": 1, "secret": SECRET}).encode() + b"\n")
+                rfile.readline()  # job
+                result = {"type": "result", "id": "../../escaped", "reason": None,
+                          "files": [{"name": "foo-1.0-1-any.pkg.tar.zst", "size": 4}]}
+                sock.sendall(json.dumps(result).encode() + b"\n" + b"evil")
+                rfile.readline()  # until coordinator hangs up
+        thread = threading.Thread(target=evil_worker, daemon=True)
+        thread.start()
+        self.wait_for_capacity(1)
+        self.coordinator.worker_timeout = 0.5
+        self.assertIsNotNone(self.coordinator.build(self.job("foo")))
+        thread.join(5)
+        self.assertEqual([os.path.join(root, name) for root, dirs, files in os.walk(self.tmp) for name in files], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+from repokeeper.failure_ledger import FailureLedger
+from mock import patch
+
+
+class Test_FailureLedger(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "cache", "failed.json")
+
+    @patch('repokeeper.failure_ledger.time.time')
+    def test_backoff(self, fake_time):
+        fake_time.return_value = 1000
+        ledger = FailureLedger(self.path, 100, 1000)
+        ledger.record_failure("foo", "1.0-1", "abc", "makepkg RC: 4")
+        self.assertIsNotNone(ledger.should_skip("foo", "1.0-1", "abc"))
+        # new version or changed PKGBUILD is built right away
+        self.assertIsNone(ledger.should_skip("foo", "1.0-2", "abc"))
+        self.assertIsNone(ledger.should_skip("foo", "1.0-1", "def"))
+        fake_time.return_value = 1100
+        self.assertIsNone(ledger.should_skip("foo", "1.0-1", "abc"))
+
+        # second failure doubles the wait, state survives reload
+        ledger.record_failure("foo", "1.0-1", "abc", "makepkg RC: 4")
+        ledger = FailureLedger(self.path, 100, 1000)
+        self.assertEqual(ledger.entries["foo"]["failures"], 2)
+        fake_time.return_value = 1250
+        self.assertIsNotNone(ledger.should_skip("foo", "1.0-1", "abc"))
+        fake_time.return_value = 1300
+        self.assertIsNone(ledger.should_skip("foo", "1.0-1", "abc"))
+
+        ledger.record_success("foo")
+        self.assertEqual(FailureLedger(self.path, 100, 1000).entries, {})
@@ -0,0 +1,100 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from repokeeper.http_client import HttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        server.paths.append(self.path)
+        if self.path == "/json":
+            self.send_body(200, gzip.compress(json.dumps({"ok": True}).encode()), [("Content-Encoding", "gzip")])
+        elif self.path == "/busy":
+            server.busy += 1
+            if server.busy == 1:
+                self.send_body(429, b"", [("Retry-After", "0")])
+            else:
+                self.send_body(200, b"{}")
+        elif self.path == "/moved":
+            self.send_body(301, b"", [("Location", "/json")])
+        elif self.path == "/foo.tar.gz":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_body(304, b"")
+            else:
+                self.send_body(200, b"archive", [("ETag", '"v1"')])
+        else:
+            self.send_body(404, b"not found")
+
+
+class Test_HttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.connections, self.server.paths, self.server.busy = set(), [], 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.client = HttpClient(timeout=5)
+        self.addCleanup(self.client.close)
+
+    def test_keep_alive_and_gzip(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get_json(self.url + "/json"), {"ok": True})
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.client.requests, 5)
+
+    def test_retry_and_redirect(self):
+        self.assertEqual(self.client.get_json(self.url + "/busy"), {})
+        self.assertEqual(self.server.busy, 2)
+        self.assertEqual(self.client.get(self.url + "/moved").json(), {"ok": True})
+        with self.assertRaises(HTTPError) as cm:
+            self.client.get(self.url + "/missing")
+        self.assertEqual(cm.exception.code, 404)
+
+    def test_conditional_download(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.client.download(self.url + "/foo.tar.gz", tmp)
+            self.assertEqual(path, os.path.join(tmp, "foo.tar.gz"))
+            mtime = os.path.getmtime(path)
+            self.assertEqual(self.client.download(self.url + "/foo.tar.gz", tmp), path)
+            self.assertEqual(os.path.getmtime(path), mtime)
+            with open(path, "rb") as fh:
+                self.assertEqual(fh.read(), b"archive")
+        self.assertEqual(self.client.bytes_downloaded, len(b"archive"))
+
+    def test_download_stream(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.client.download_stream(self.url + "/foo.tar.gz", tmp) as stream:
+                self.assertEqual(stream.read(3), b"arc")
+                self.assertEqual(stream.read(), b"hive")
+            with self.client.download_stream(self.url + "/foo.tar.gz", tmp) as stream:
+                self.assertEqual(stream.read(), b"archive")
+            self.assertEqual(self.server.paths, ["/foo.tar.gz", "/foo.tar.gz"])
+            # interrupted download leaves no cached copy behind
+            os.remove(os.path.join(tmp, "foo.tar.gz"))
+            with self.assertRaises(RuntimeError):
+                with self.client.download_stream(self.url + "/foo.tar.gz", tmp) as stream:
+                    stream.read(1)
+                    raise RuntimeError()
+            self.assertEqual(os.listdir(tmp), ["foo.tar.gz.meta"])
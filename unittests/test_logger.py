@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from repokeeper.logger import Logger, LogType, get_log_tail, run_logged
+
+
+class Test_Logger(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.logfile = os.path.join(tmp.name, "repokeeper.log")
+        self.addCleanup(Logger().configure)
+
+    def test_singleton(self):
+        self.assertIs(Logger(), Logger())
+
+    def test_levels_and_buffering(self):
+        lo = Logger()
+        lo.configure(self.logfile, level="info")
+        lo.log(log_txt="debug line", level="debug")
+        lo.log(log_txt="info line")
+        lo.log(LogType.WARNING, log_txt="warning line")
+        lo.flush()
+        with open(self.logfile) as fh:
+            self.assertEqual(fh.read(), "info line\nwarning line\n")
+
+    def test_rotation(self):
+        lo = Logger()
+        lo.configure(self.logfile, max_size=100, backups=2)
+        for i in range(30):
+            lo.log(log_txt="line {:02d}".format(i))
+        lo.close()
+        self.assertTrue(os.path.isfile(self.logfile + ".1"))
+        self.assertTrue(os.path.isfile(self.logfile + ".2"))
+        self.assertFalse(os.path.exists(self.logfile + ".3"))
+        with open(self.logfile) as fh:
+            self.assertTrue(fh.read().endswith("line 29\n"))
+
+    def test_json_lines(self):
+        lo = Logger()
+        lo.configure(self.logfile, json_lines=True)
+        lo.log(LogType.ERROR, log_txt="build failed")
+        with open(self.logfile) as fh:
+            record = json.loads(fh.readline())
+        self.assertEqual(record["level"], "error")
+        self.assertEqual(record["message"], "build failed")
+
+    def test_run_logged(self):
+        build_log = os.path.join(os.path.dirname(self.logfile), "logs", "foo.log")
+        rc = run_logged([sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"],
+                        build_log)
+        self.assertEqual(rc, 3)
+        self.assertEqual(sorted(get_log_tail(build_log)), ["err", "out"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import errno
+import os
+import tempfile
+import unittest
+from repokeeper.publish import publish_file
+from mock import patch
+
+
+class Test_Publish(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.builddir = os.path.join(tmp.name, "build")
+        self.repodir = os.path.join(tmp.name, "repo")
+        os.makedirs(self.builddir)
+        os.makedirs(self.repodir)
+        self.archive = os.path.join(self.builddir, "foo-1.0-1-x86_64.pkg.tar.zst")
+        with open(self.archive, "wb") as fh:
+            fh.write(b"archive content")
+        os.chmod(self.archive, 0o640)
+
+    def published(self):
+        with open(os.path.join(self.repodir, "foo-1.0-1-x86_64.pkg.tar.zst"), "rb") as fh:
+            return fh.read()
+
+    def test_rename(self):
+        self.assertEqual(publish_file(self.archive, self.repodir), "rename")
+        self.assertFalse(os.path.exists(self.archive))
+        self.assertEqual(self.published(), b"archive content")
+        self.assertEqual(os.listdir(self.repodir), ["foo-1.0-1-x86_64.pkg.tar.zst"])
+
+    def test_hardlink(self):
+        self.assertEqual(publish_file(self.archive, self.repodir, keep_source=True), "hardlink")
+        self.assertTrue(os.path.samefile(self.archive, os.path.join(self.repodir, "foo-1.0-1-x86_64.pkg.tar.zst")))
+
+    @patch('repokeeper.publish.os.rename', side_effect=OSError(errno.EXDEV, "Invalid cross-device link"))
+    @patch('repokeeper.publish._reflink', side_effect=OSError(errno.EOPNOTSUPP, "Operation not supported"))
+    def test_copy_fallback(self, fake_reflink, fake_rename):
+        self.assertEqual(publish_file(self.archive, self.repodir), "copy")
+        self.assertEqual(self.published(), b"archive content")
+        self.assertEqual(os.stat(os.path.join(self.repodir, "foo-1.0-1-x86_64.pkg.tar.zst")).st_mode & 0o777, 0o640)
+        self.assertEqual(os.listdir(self.repodir), ["foo-1.0-1-x86_64.pkg.tar.zst"])
+
+    @patch('repokeeper.publish.os.replace', side_effect=OSError(errno.ENOSPC, "No space left on device"))
+    def test_failure_leaves_nothing_behind(self, fake_replace):
+        with self.assertRaises(OSError):
+            publish_file(self.archive, self.repodir)
+        self.assertTrue(os.path.isfile(self.archive))
+        self.assertEqual(os.listdir(self.repodir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import time
+import unittest
+from email.utils import formatdate
+from repokeeper.ratelimit import RateLimiter, get_retry_delay
+
+
+class Test_RateLimiter(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(50, 3)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.01)
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+
+    def test_block(self):
+        limiter = RateLimiter(1000, 10)
+        limiter.block(0.05)
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_block_without_rate(self):
+        limiter = RateLimiter(0, 1)
+        start = time.monotonic()
+        for _ in range(10):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.01)
+        limiter.block(0.05)
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_retry_delay(self):
+        self.assertEqual(get_retry_delay("7", 0), 7)
+        self.assertEqual(get_retry_delay(None, 0), 1)
+        self.assertEqual(get_retry_delay(None, 3), 8)
+        self.assertEqual(get_retry_delay("garbage", 1), 2)
+        self.assertEqual(get_retry_delay(None, 10), 60)
+        self.assertAlmostEqual(get_retry_delay(formatdate(time.time() + 30, usegmt=True), 0), 30, delta=2)
@@ -0,0 +1,48 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+
+def write_repo_db(path, entries):
+    """entries: package name: archive file name"""
+    with tarfile.open(path, "w:gz") as tar:
+        for name, filename in entries.items():
+            desc = f"%FILENAME%\n{filename}\n\n%NAME%\n{name}\n\n".encode()
+            info = tarfile.TarInfo(f"{name}-1-1/desc")
+            info.size = len(desc)
+            tar.addfile(info, io.BytesIO(desc))
+
+
+@patch('repokeeper.repokeeper.Logger.log', MagicMock())
+class Test_RepoDb(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repodir = tmp.name
+        for filename in ["foo-1.0-1-x86_64.pkg.tar.zst", "foo-1.1-1-x86_64.pkg.tar.zst", "bar-2.0-1-any.pkg.tar.zst"]:
+            open(os.path.join(self.repodir, filename), "w").close()
+        self.repo_file = os.path.join(self.repodir, "local-rk.db.tar.gz")
+        self.rb = make_repo_base([], self.repodir, repodir=self.repodir)
+
+    def test_changes(self):
+        write_repo_db(self.repo_file, {"foo": "foo-1.0-1-x86_64.pkg.tar.zst", "gone": "gone-1-1-any.pkg.tar.zst",
+                                       "bar": "bar-2.0-1-any.pkg.tar.zst"})
+        to_add, to_remove = self.rb.get_repo_db_changes(self.repo_file)
+        self.assertEqual(to_add, [os.path.join(self.repodir, "foo-1.1-1-x86_64.pkg.tar.zst")])
+        self.assertEqual(to_remove, ["gone"])
+
+    def test_no_db(self):
+        to_add, to_remove = self.rb.get_repo_db_changes(self.repo_file)
+        self.assertEqual(len(to_add), 2)
+        self.assertEqual(to_remove, [])
+
+    @patch('repokeeper.repokeeper.subprocess.call')
+    def test_up_to_date(self, fake_call):
+        write_repo_db(self.repo_file, {"foo": "foo-1.1-1-x86_64.pkg.tar.zst", "bar": "bar-2.0-1-any.pkg.tar.zst"})
+        self.rb.update_repo_file()
+        fake_call.assert_not_called()
@@ -26,3 +26,23 @@ class Test_RepoObject(unittest.TestCase):
 
 
 
+
+    @patch('repokeeper.repokeeper.Logger.log')
+    @patch('repokeeper.repokeeper.glob.glob')
+    def test_version_ordering(self, fake_glob, fake_log):
+        fake_glob.return_value = ['foo-2.0.9-1-x86_64.pkg.tar.zst',
+        'foo-2.0.10-1-x86_64.pkg.tar.zst',
+        'foo-1:1.0-1-x86_64.pkg.tar.zst',
+        'bar-1.0-1-x86_64.pkg.tar.zst',
+        'bar-1.0-1-any.pkg.tar.zst']
+        ro = RepoContent('aaaaa', ['foo', 'bar'])
+        self.assertEqual(ro.get_newest('foo').full_version, '1:1.0-1')
+        self.assertEqual([item.full_version for item in ro.old_versions], ['2.0.9-1', '2.0.10-1'])
+        self.assertEqual(len(ro.new_versions), 3)
+        self.assertIn('bar', ro)
+        self.assertIsNone(ro.get_newest('baz'))
+        # one archive per package goes into repo db, regardless of order archives were found in
+        self.assertEqual([item.file for item in ro.db_versions], ['bar-1.0-1-x86_64.pkg.tar.zst',
+                                                                  'foo-1:1.0-1-x86_64.pkg.tar.zst'])
+        fake_glob.return_value.reverse()
+        self.assertEqual(RepoContent('aaaaa', ['foo', 'bar']).get_newest('bar').file, 'bar-1.0-1-x86_64.pkg.tar.zst')
@@ -0,0 +1,87 @@
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import unittest
+from repokeeper.repodb import PackageIndex, read_pkginfo, write_repo_db
+from repokeeper.syncdb import iter_db_desc, read_repo_db_files
+from mock import patch
+
+PKGINFO = """# Generated by makepkg
+pkgname = foo
+pkgbase = foo
+pkgver = 1:2.0-3
+pkgdesc = test package
+url = https://example.org
+builddate = 1700000000
+packager = Unknown Packager
+size = 1234
+arch = x86_64
+license = GPL
+depend = glibc
+depend = bar>=1.0
+makedepend = cmake
+"""
+
+
+def write_package(path, payload="#!/bin/sh\n", mode="w:xz"):
+    with tarfile.open(path, mode) as tar:
+        for name, content in ((".PKGINFO", PKGINFO), (".MTREE", "x"), ("usr/bin/foo", payload)):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content.encode()))
+        usr = tarfile.TarInfo("usr")
+        usr.type = tarfile.DIRTYPE
+        tar.addfile(usr)
+
+
+class Test_RepoDbWriter(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.archive = os.path.join(self.tmp, "foo-1:2.0-3-x86_64.pkg.tar.xz")
+        write_package(self.archive)
+        self.index = PackageIndex(os.path.join(self.tmp, "cache", "index.sqlite"))
+        self.addCleanup(self.index.close)
+
+    def test_index(self):
+        self.assertIsNone(self.index.get_cached(self.archive))
+        info = self.index.get(self.archive)
+        self.assertEqual(info["pkginfo"]["depend"], ["glibc", "bar>=1.0"])
+        self.assertEqual(info["files"], ["usr/", "usr/bin/foo"])
+        self.assertEqual(self.index.get_cached(self.archive), info)
+        # changed archive is not served from index
+        with open(self.archive, "ab") as fh:
+            fh.write(b"\0" * 512)
+        self.assertIsNone(self.index.get_cached(self.archive))
+
+    def test_read_pkginfo(self):
+        with patch('repokeeper.repodb.file_checksums') as checksums:
+            self.assertEqual(read_pkginfo(self.archive)["depend"], ["glibc", "bar>=1.0"])
+        checksums.assert_not_called()
+
+    @unittest.skipUnless(shutil.which("zstd"), "zstd needed")
+    @patch('repokeeper.repodb.zstandard', None)
+    def test_read_pkginfo_stops_early(self):
+        # zstd binary writing the rest of a big archive into closed pipe is not a failure
+        tar_file = os.path.join(self.tmp, "big.tar")
+        write_package(tar_file, "x" * (8 << 20), mode="w")
+        subprocess.check_call(["zstd", "-q", tar_file, "-o", self.archive + ".zst"])
+        self.assertEqual(read_pkginfo(self.archive + ".zst")["pkgname"], ["foo"])
+
+    def test_write_db(self):
+        write_repo_db(self.tmp, "local-rk", {self.archive: self.index.get(self.archive)})
+        db = os.path.join(self.tmp, "local-rk.db.tar.gz")
+        self.assertEqual(read_repo_db_files(db), {"foo": os.path.basename(self.archive)})
+        desc = list(iter_db_desc(db))[0]
+        self.assertEqual(desc["%VERSION%"], ["1:2.0-3"])
+        self.assertEqual(desc["%DEPENDS%"], ["glibc", "bar>=1.0"])
+        self.assertEqual(desc["%CSIZE%"], [str(os.path.getsize(self.archive))])
+        self.assertEqual(os.readlink(os.path.join(self.tmp, "local-rk.db")), "local-rk.db.tar.gz")
+        with tarfile.open(os.path.join(self.tmp, "local-rk.files.tar.gz")) as tar:
+            files = tar.extractfile("foo-1:2.0-3/files").read().decode()
+        self.assertEqual(files, "%FILES%\nusr/\nusr/bin/foo\n\n")
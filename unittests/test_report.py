@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+import unittest
+from repokeeper.report import RunReport
+from unittests.helpers import make_repo_base
+from unittests.test_aur_rpc import fake_aur
+from mock import patch, MagicMock
+
+
+@patch('repokeeper.repokeeper.Logger.log', MagicMock())
+class Test_RunReport(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmpdir = tmp.name
+
+    def test_phases_and_packages(self):
+        report = RunReport()
+        for _ in range(2):
+            with report.phase("parse_repo"):
+                pass
+        with self.assertRaises(ValueError):
+            with report.phase("makepkg", "foo"):
+                raise ValueError("failed")
+        report.set_package_result("foo", "makepkg RC: 1")
+        report.incr("aur_queries", 3)
+
+        data = report.to_dict()
+        self.assertEqual(data["phases"]["parse_repo"]["count"], 2)
+        self.assertIn("makepkg", data["packages"]["foo"])
+        self.assertEqual(data["packages"]["foo"]["result"], "makepkg RC: 1")
+        self.assertEqual(data["counters"], {"aur_queries": 3})
+
+    def test_report_of_aur_check(self):
+        rb = make_repo_base(["foo", "bar"], os.path.join(self.tmpdir, "cache"))
+        with fake_aur({"foo": (["baz"], []), "bar": ([], []), "baz": ([], [])}):
+            self.assertEqual(len(rb.check_aur_web()), 3)
+        with fake_aur({}):
+            rb.check_aur_web()  # served from AUR cache
+        report_file = os.path.join(self.tmpdir, "report.json")
+        rb.write_report(report_file)
+
+        with open(report_file) as fh:
+            data = json.load(fh)
+        for phase in ("config", "parse_repo", "aur_check", "dependency_resolution"):
+            self.assertIn(phase, data["phases"])
+        self.assertEqual(data["phases"]["aur_check"]["count"], 2)
+        self.assertEqual(data["counters"]["aur_queries"], 2)
+        self.assertEqual(data["counters"]["aur_cache_hits"], 3)
+        self.assertEqual(data["counters"]["aur_cache_misses"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
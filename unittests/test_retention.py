@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+import unittest
+from repokeeper.retention import find_orphans, select_superseded
+from unittests.helpers import make_repo_base
+from unittests.test_repo_db import write_repo_db
+from mock import patch, MagicMock
+
+
+@patch('repokeeper.repokeeper.Logger.log', MagicMock())
+class Test_Retention(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.repodir = tmp.name
+        self.files = {}
+        for filename in ["foo-1.0-1-x86_64.pkg.tar.zst", "foo-1.1-1-x86_64.pkg.tar.zst", "foo-1.1-1-i686.pkg.tar.zst",
+                         "foo-1.2-1-x86_64.pkg.tar.zst", "bar-2.0-1-any.pkg.tar.zst", "baz-1.0-1-any.pkg.tar.zst"]:
+            self.files[filename] = os.path.join(self.repodir, filename)
+            open(self.files[filename], "w").close()
+        open(self.files["foo-1.0-1-x86_64.pkg.tar.zst"] + ".sig", "w").close()
+
+    def test_select_superseded(self):
+        versions = [["a-1"], ["a-2", "a-2-i686"], ["a-3"]]
+        with patch('repokeeper.retention.os.path.getmtime', return_value=time.time()):
+            self.assertEqual(select_superseded(versions, 2, 0, time.time()), ["a-1"])
+            self.assertEqual(select_superseded(versions, 0, 0, time.time()), [])
+        with patch('repokeeper.retention.os.path.getmtime', return_value=time.time() - 10 * 86400):
+            # newest version is kept regardless of its age
+            self.assertEqual(select_superseded(versions, 0, 86400, time.time()), ["a-1", "a-2", "a-2-i686"])
+
+    def test_find_orphans(self):
+        packages = {"app": {"depend": ["libfoo>=1.0", "glibc"], "optdepend": ["extra: for extra stuff"]},
+                    "libfoo-git": {"provides": ["libfoo=1.1"]},
+                    "extra": {"makedepend": ["tool"]},
+                    "tool": {},
+                    "leftover": {"depend": ["tool"]}}
+        self.assertEqual(find_orphans(["app"], packages), {"leftover"})
+        # configured package not in repo still needs its dependencies
+        self.assertEqual(find_orphans(["app", "other"], packages, ["leftover"]), set())
+
+    @patch('repokeeper.repokeeper.subprocess.call')
+    def test_prune_with_db_update(self, fake_call):
+        rb = make_repo_base(["foo", "bar"], self.repodir, options={"keep_versions": "1", "prune_orphans": "yes",
+                                                                  "db_writer": "repo-add"}, repodir=self.repodir)
+        write_repo_db(os.path.join(self.repodir, "local-rk.db.tar.gz"), {
+            "foo": "foo-1.2-1-x86_64.pkg.tar.zst", "bar": "bar-2.0-1-any.pkg.tar.zst",
+            "baz": "baz-1.0-1-any.pkg.tar.zst"})
+        fake_call.return_value = 0
+        with patch.object(rb, 'get_pkginfo', return_value={}):
+            rb.update_repo_file()
+
+        # db entry of orphan is removed first, then the files are deleted
+        fake_call.assert_called_once_with(["repo-remove", os.path.join(self.repodir, "local-rk.db.tar.gz"), "baz"])
+        self.assertEqual(sorted(f for f in os.listdir(self.repodir) if "pkg.tar" in f),
+                         ["bar-2.0-1-any.pkg.tar.zst", "foo-1.2-1-x86_64.pkg.tar.zst"])
+        self.assertEqual(rb.repo_content.list_pck_names, {"foo", "bar"})
+
+    def test_missing_package_keeps_dependencies(self):
+        rb = make_repo_base(["foo", "qux"], self.repodir, options={"prune_orphans": "yes"}, repodir=self.repodir)
+        with patch.object(rb, 'get_pkginfo', return_value={}):
+            # qux is not in repo and its dependencies are not known
+            self.assertEqual(rb.get_prune_plan(), [])
+            rb.aur_dependencies["qux"] = {"depend": ["baz>=1.0"], "makedepend": [], "checkdepend": [], "optdepend": []}
+            self.assertEqual(rb.get_prune_plan(), [self.files["bar-2.0-1-any.pkg.tar.zst"]])
+
+    def test_dryrun_preview_keeps_files(self):
+        rb = make_repo_base(["foo"], self.repodir, options={"keep_versions": "2"}, repodir=self.repodir)
+        to_prune = rb.get_prune_plan()
+        self.assertEqual(to_prune, [self.files["foo-1.0-1-x86_64.pkg.tar.zst"]])
+        rb.prune_files(to_prune, dryrun=True)
+        self.assertTrue(os.path.isfile(self.files["foo-1.0-1-x86_64.pkg.tar.zst"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from repokeeper.repokeeper import PackageToBuild
+from repokeeper.scheduler import get_build_dependencies, run_build_dag
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+
+def pkg(name, deps=(), build_deps=()):
+    return PackageToBuild(name, f"http://aur/{name}.tar.gz", list(deps), list(build_deps))
+
+
+class Test_Scheduler(unittest.TestCase):
+
+    def setUp(self):
+        # app needs lib-a (versioned) and tool, both need lib-b; other is independent
+        self.pkgs = [pkg("app", ["lib-a>=1.0", "glibc"], ["tool"]), pkg("other"), pkg("lib-a", ["lib-b"]),
+                     pkg("tool", [], ["lib-b"]), pkg("lib-b")]
+
+    def test_dependencies(self):
+        deps = get_build_dependencies(self.pkgs)
+        self.assertEqual(deps["app"], {"lib-a", "tool"})
+        self.assertEqual(deps["lib-b"], set())
+
+    def test_order_and_concurrency(self):
+        lock = threading.Lock()
+        finished, running, max_running = [], [0], [0]
+
+        def build(p):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+                finished.append(p.name)
+
+        failed = run_build_dag(self.pkgs, build, 3)
+        self.assertEqual(failed, {})
+        self.assertLess(finished.index("lib-b"), finished.index("lib-a"))
+        self.assertLess(finished.index("lib-b"), finished.index("tool"))
+        self.assertEqual(finished[-1], "app")
+        self.assertGreater(max_running[0], 1)
+        self.assertLessEqual(max_running[0], 3)
+
+    def test_failure_cancels_dependents_only(self):
+        built = []
+
+        def build(p):
+            if p.name == "lib-a":
+                return "makepkg RC: 4"
+            built.append(p.name)
+
+        failed = run_build_dag(self.pkgs, build, 1)
+        self.assertEqual(failed, {"lib-a": "makepkg RC: 4", "app": "dependency lib-a failed"})
+        self.assertEqual(sorted(built), ["lib-b", "other", "tool"])
+
+    def test_cycle(self):
+        built = []
+        failed = run_build_dag([pkg("a", ["b"]), pkg("b", ["a"])], lambda p: built.append(p.name), 2)
+        self.assertEqual(failed, {})
+        self.assertEqual(built, ["a", "b"])
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_dependencies_published_first(self):
+        events = []
+        with tempfile.TemporaryDirectory() as tmp:
+            rb = make_repo_base([], tmp)
+            with patch.object(rb, "build_package", side_effect=lambda p, count: events.append("build " + p.name)), \
+                    patch.object(rb, "publish_dependency", side_effect=lambda p: events.append("publish " + p.name)):
+                failed = rb.building(self.pkgs)
+        self.assertEqual(failed, [])
+        self.assertLess(events.index("publish lib-b"), events.index("build lib-a"))
+        self.assertLess(events.index("publish lib-a"), events.index("build app"))
+        self.assertNotIn("publish app", events)
+        self.assertNotIn("publish other", events)
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    @patch('repokeeper.scheduler.get_build_jobs', return_value=3)
+    def test_concurrent_builds_run_one_pacman(self, fake_jobs):
+        running, max_running, installed, commands = [0], [0], [], []
+        lock = threading.Lock()
+
+        def pacman(args, **kwargs):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            if args[1] == "-T":
+                return MagicMock(returncode=127, stdout="\n".join(args[2:]) + "\n")
+            installed.extend(args[6:])
+            return 0
+
+        def fetch_sources(pkg_to_build, workdir):
+            compiledir = os.path.join(workdir, pkg_to_build.name)
+            os.makedirs(compiledir)
+            open(os.path.join(compiledir, "PKGBUILD"), "w").close()
+            with open(os.path.join(compiledir, ".SRCINFO"), "w") as fh:
+                fh.write("pkgbase = {0}\n\tmakedepends = tool-{0}\n\npkgname = {0}\n\tdepends = lib-{0}\n".format(
+                    pkg_to_build.name))
+            return compiledir
+
+        with tempfile.TemporaryDirectory() as tmp:
+            rb = make_repo_base([], tmp, {"syncdeps": "yes", "build_jobs": "3"}, builddir=tmp)
+            with patch.object(rb, "fetch_sources", side_effect=fetch_sources), \
+                    patch('repokeeper.repokeeper.subprocess.run', side_effect=pacman), \
+                    patch('repokeeper.repokeeper.subprocess.call', side_effect=pacman), \
+                    patch('repokeeper.repokeeper.run_logged', side_effect=lambda cmd, *a, **kw: commands.append(cmd) or 0):
+                rb.building([pkg("p{}".format(i)) for i in range(3)])
+        self.assertEqual(max_running[0], 1)
+        self.assertEqual(sorted(installed), ["lib-p0", "lib-p1", "lib-p2", "tool-p0", "tool-p1", "tool-p2"])
+        self.assertEqual(commands, ["makepkg"] * 3)
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    @patch('repokeeper.repokeeper.subprocess.call', return_value=0)
+    def test_published_dependency_installed(self, fake_call):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "lib-b-1.0-1-any.pkg.tar.zst")
+            open(archive, "w").close()
+            rb = make_repo_base([], tmp, {"syncdeps": "yes"}, repodir=tmp)
+            with patch.object(rb, "refresh_repo_db"):
+                self.assertIsNone(rb.publish_dependency(pkg("lib-b")))
+        # archive is installed, sync dbs are not refreshed (no partial upgrade)
+        fake_call.assert_called_once_with(["sudo", "pacman", "-U", "--asdeps", "--needed", "--noconfirm", archive])
+
+    @patch('repokeeper.repokeeper.Logger.log', MagicMock())
+    def test_dependencies_sent_to_workers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("lib-a", "lib-b"):
+                open(os.path.join(tmp, name + "-1.0-1-any.pkg.tar.zst"), "w").close()
+            rb = make_repo_base([], tmp, repodir=tmp)
+            rb.coordinator = MagicMock()
+            rb.coordinator.build.return_value = None
+            with patch.object(rb, "publish_dependency", return_value=None):
+                self.assertEqual(rb.building(self.pkgs), [])
+            sent = {call[0][0]["name"]: [os.path.basename(f) for f in call[0][1]]
+                    for call in rb.coordinator.build.call_args_list}
+        # indirect dependencies go along too, so that worker can install them
+        self.assertEqual(sent["app"], ["lib-a-1.0-1-any.pkg.tar.zst", "lib-b-1.0-1-any.pkg.tar.zst"])
+        self.assertEqual(sent["lib-a"], ["lib-b-1.0-1-any.pkg.tar.zst"])
+        self.assertEqual(sent["other"], [])
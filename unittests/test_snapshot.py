@@ -0,0 +1,57 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from repokeeper.snapshot import extract_snapshot
+
+
+def make_tar(members):
+    """members: list of (name, content or None for dir, linkname or None)"""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, content, linkname in members:
+            info = tarfile.TarInfo(name)
+            if linkname is not None:
+                info.type = tarfile.SYMTYPE
+                info.linkname = linkname
+                tar.addfile(info)
+            elif content is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+    buf.seek(0)
+    return buf
+
+
+class Test_Snapshot(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.workdir = tmp.name
+
+    def test_extract(self):
+        stream = make_tar([("foo", None, None), ("foo/PKGBUILD", b"pkgname=foo\n", None),
+                           ("foo/fix.patch", b"x", None), ("foo/link", None, "fix.patch"), ("other/file", b"x", None)])
+        compiledir = extract_snapshot(stream, self.workdir, "foo")
+        self.assertEqual(compiledir, os.path.join(self.workdir, "foo"))
+        self.assertTrue(os.path.isfile(os.path.join(compiledir, "fix.patch")))
+        self.assertTrue(os.path.islink(os.path.join(compiledir, "link")))
+        self.assertFalse(os.path.exists(os.path.join(self.workdir, "other")))
+
+    def test_unsafe(self):
+        for members in ([("foo/../../evil", b"x", None)], [("/etc/evil", b"x", None)],
+                        [("foo/link", None, "/etc/passwd")], [("foo/link", None, "../../etc")]):
+            with self.assertRaises(ValueError):
+                extract_snapshot(make_tar(members), self.workdir, "foo")
+        self.assertEqual(os.listdir(self.workdir), [])
+
+    def test_size_limit(self):
+        with self.assertRaises(ValueError):
+            extract_snapshot(make_tar([("foo/PKGBUILD", b"x" * 100, None)]), self.workdir, "foo", size_limit=50)
+
+    def test_no_pkgbuild(self):
+        self.assertIsNone(extract_snapshot(make_tar([("foo/README", b"x", None)]), self.workdir, "foo"))
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from repokeeper.repokeeper import PackageToBuild
+from unittests.helpers import make_repo_base
+from mock import patch, MagicMock
+
+
+def git(*args):
+    subprocess.check_call(["git", "-c", "user.name=t", "-c", "user.email=t@t"] + list(args),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@patch('repokeeper.repokeeper.Logger.log', MagicMock())
+class Test_Sources(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        # stand-in for aur.archlinux.org/foo.git
+        self.remote = os.path.join(self.tmp, "remote", "foo.git")
+        git("init", "--quiet", self.remote)
+        self.commit("pkgver=1.0\n")
+        self.rb = make_repo_base([], os.path.join(self.tmp, "cache"), options={"aur_url": os.path.join(self.tmp, "remote")})
+        self.pkg = PackageToBuild("foo", "http://aur/foo.tar.gz", [], [], "foo", "1.0-1")
+
+    def commit(self, pkgbuild):
+        with open(os.path.join(self.remote, "PKGBUILD"), "w") as fh:
+            fh.write(pkgbuild)
+        git("-C", self.remote, "add", "PKGBUILD")
+        git("-C", self.remote, "commit", "--quiet", "-m", "update")
+
+    def fetch(self):
+        workdir = tempfile.mkdtemp(dir=self.tmp)
+        with patch('repokeeper.http_client.HttpClient.download') as fake_download:
+            self.rb.fetch_sources(self.pkg, workdir)
+            fake_download.assert_not_called()
+        with open(os.path.join(workdir, "foo", "PKGBUILD")) as fh:
+            return fh.read()
+
+    def test_clone_reused(self):
+        self.assertEqual(self.fetch(), "pkgver=1.0\n")
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp, "cache", "aur-git", "foo", ".git")))
+        self.commit("pkgver=1.1\n")
+        self.assertEqual(self.fetch(), "pkgver=1.1\n")
+
+
+@patch('repokeeper.repokeeper.Logger.log', MagicMock())
+class Test_Compiledir(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.rb = make_repo_base([], tmp.name, builddir=tmp.name)
+        self.builddir = tmp.name
+
+    def write_pkgbuild(self, path, content):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "PKGBUILD"), "w") as fh:
+            fh.write(content)
+
+    def test_snapshot_layout(self):
+        self.write_pkgbuild(os.path.join(self.builddir, "foo-bin", "foo"), "pkgname=(foo-bin foo-doc)\n")
+        self.assertEqual(self.rb.get_compiledir("foo-bin", pkgbase="foo"), os.path.join(self.builddir, "foo-bin", "foo"))
+
+    def test_scan_by_name(self):
+        workdir = os.path.join(self.builddir, "work")
+        self.write_pkgbuild(os.path.join(workdir, "aaa"), "pkgname=foo-extra\n")
+        self.write_pkgbuild(os.path.join(workdir, "bbb"), "pkgname=('foo-doc' 'foo')\n")
+        self.assertEqual(self.rb.get_compiledir("foo", workdir), os.path.join(workdir, "bbb"))
+
+    def test_missing(self):
+        with self.assertRaises(ValueError):
+            self.rb.get_compiledir("foo")
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import unittest
+
+# not needed by --version nor --list, imported only when AUR is queried or packages are built
+LAZY_MODULES = ["http.client", "ssl", "urllib.parse", "sqlite3", "tarfile", "concurrent.futures",
+                "repokeeper.http_client", "repokeeper.repodb", "repokeeper.aur_cache", "repokeeper.aur_dump",
+                "repokeeper.scheduler"]
+
+
+class Test_Startup(unittest.TestCase):
+
+    def test_heavy_modules_not_imported(self):
+        code = "import sys, repokeeper.repokeeper; print(' '.join(m for m in {} if m in sys.modules))".format(
+            LAZY_MODULES)
+        imported = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True).split()
+        self.assertEqual(imported, [])
+
+    def test_version_fast_path(self):
+        out = subprocess.check_output([sys.executable, "-m", "repokeeper.repokeeper", "--version"],
+                                      universal_newlines=True)
+        from repokeeper.repokeeper import get_version
+        self.assertTrue(out.startswith(get_version()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from repokeeper.syncdb import SyncDbIndex, strip_version_constraint
+
+
+def write_db(path, packages):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, provides in packages.items():
+            desc = f"%NAME%\n{name}\n\n%VERSION%\n1.0-1\n\n%PROVIDES%\n" + "\n".join(provides) + "\n\n"
+            info = tarfile.TarInfo(f"{name}-1.0-1/desc")
+            info.size = len(desc.encode())
+            tar.addfile(info, io.BytesIO(desc.encode()))
+
+
+class Test_SyncDb(unittest.TestCase):
+
+    def test_strip_version_constraint(self):
+        self.assertEqual(strip_version_constraint("foo>=1.2"), "foo")
+        self.assertEqual(strip_version_constraint("foo=1:2-3"), "foo")
+        self.assertEqual(strip_version_constraint("foo<2"), "foo")
+        self.assertEqual(strip_version_constraint("libfoo.so"), "libfoo.so")
+
+    def test_load_and_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_db(os.path.join(tmp, "core.db"), {"glibc": [], "python": ["python3=3.11"]})
+            write_db(os.path.join(tmp, "local-rk.db"), {"viber": []})
+            cache_file = os.path.join(tmp, "cache", "index.json")
+            index = SyncDbIndex.load(cache_file, os.path.join(tmp, "*.db"), exclude=["local-rk"])
+            self.assertIn("glibc>=2.35", index)
+            self.assertIn("python3", index)
+            self.assertNotIn("viber", index)
+            self.assertTrue(os.path.isfile(cache_file))
+
+            # served from cache as long as db files are untouched
+            os.remove(os.path.join(tmp, "core.db"))
+            write_db(os.path.join(tmp, "core.db"), {"cmake": []})
+            os.utime(os.path.join(tmp, "core.db"), (0, 0))
+            index = SyncDbIndex.load(cache_file, os.path.join(tmp, "*.db"), exclude=["local-rk"])
+            self.assertEqual(index.names, {"cmake"})
@@ -0,0 +1,32 @@
+import unittest
+from repokeeper.vercmp import vercmp, parse_evr
+
+# (a, b, expected) taken from pacman's test/util/vercmptest.sh
+CASES = [
+    ("1.5.0", "1.5.0", 0), ("1.5.1", "1.5.0", 1), ("1.5.1", "1.5", 1),
+    ("1.5.0-1", "1.5.0-1", 0), ("1.5.0-1", "1.5.0-2", -1), ("1.5.0-1", "1.5.1-1", -1),
+    ("1.5.0-2", "1.5.1-1", -1), ("1.5-1", "1.5.1-1", -1), ("1.5-2", "1.5.1-1", -1),
+    ("1.5-2", "1.5.1-2", -1), ("1.5", "1.5-1", 0), ("1.5-1", "1.5", 0), ("1.1-1", "1.1", 0),
+    ("1.0-1", "1.1", -1), ("1.1-1", "1.0", 1), ("1.5b-1", "1.5-1", -1), ("1.5b", "1.5", -1),
+    ("1.5b-1", "1.5", -1), ("1.5b", "1.5.1", -1), ("1.0a", "1.0alpha", -1), ("1.0alpha", "1.0b", -1),
+    ("1.0b", "1.0beta", -1), ("1.0beta", "1.0rc", -1), ("1.0rc", "1.0", -1), ("1.5.a", "1.5", 1),
+    ("1.5.b", "1.5.a", 1), ("1.5.1", "1.5.b", 1), ("1.5.b-1", "1.5.b", 0), ("1.5-1", "1.5.b", -1),
+    ("2.0", "2_0", 0), ("2.0_a", "2_0.a", 0), ("2.0a", "2.0.a", -1), ("2___a", "2_a", 1),
+    ("0:1.0", "0:1.0", 0), ("0:1.0", "0:1.1", -1), ("1:1.0", "0:1.0", 1), ("1:1.0", "0:1.1", 1),
+    ("1:1.0", "2:1.1", -1), ("1:1.0", "0:1.0-1", 1), ("1:1.0-1", "0:1.1-1", 1), ("0:1.0", "1.0", 0),
+    ("0:1.0", "1.1", -1), ("0:1.1", "1.0", 1), ("1:1.0", "1.0", 1), ("1:1.0", "1.1", 1), ("1:1.1", "1.1", 1),
+    ("2.0.10", "2.0.9", 1),
+]
+
+
+class Test_Vercmp(unittest.TestCase):
+
+    def test_pacman_cases(self):
+        for a, b, expected in CASES:
+            self.assertEqual(vercmp(a, b), expected, f"vercmp({a}, {b})")
+            self.assertEqual(vercmp(b, a), -expected, f"vercmp({b}, {a})")
+
+    def test_parse_evr(self):
+        self.assertEqual(parse_evr("1:2.0-3"), ("1", "2.0", "3"))
+        self.assertEqual(parse_evr("2.0"), ("0", "2.0", None))
+        self.assertEqual(parse_evr("r12.abc-1"), ("0", "r12.abc", "1"))